@@ -16,8 +16,13 @@ type ServerConfig struct {
 
 // OllamaConfig defines the Ollama configuration.
 type OllamaConfig struct {
-	Host  string `yaml:"host"`
-	Model string `yaml:"model"`
+	Host                string `yaml:"host"`
+	Model               string `yaml:"model"`
+	StructuredModel     string `yaml:"structured_model"`
+	MaxParallelRequests int    `yaml:"max_parallel_requests"`
+	KeepAlive           string `yaml:"keep_alive"`
+	NumCtx              int    `yaml:"num_ctx"`
+	DiskCache           bool   `yaml:"disk_cache"`
 }
 
 // AnalysisConfig defines the analysis parameters.
@@ -99,6 +104,22 @@ func LoadConfig() error {
 		cfg.Analysis.MaxDirectoryDepth = v.GetInt("analysis.max_directory_depth")
 	}
 
+	if cfg.Ollama.StructuredModel == "" {
+		cfg.Ollama.StructuredModel = v.GetString("ollama.structured_model")
+	}
+	if cfg.Ollama.MaxParallelRequests == 0 {
+		cfg.Ollama.MaxParallelRequests = v.GetInt("ollama.max_parallel_requests")
+	}
+	if cfg.Ollama.KeepAlive == "" {
+		cfg.Ollama.KeepAlive = v.GetString("ollama.keep_alive")
+	}
+	if cfg.Ollama.NumCtx == 0 {
+		cfg.Ollama.NumCtx = v.GetInt("ollama.num_ctx")
+	}
+	if !cfg.Ollama.DiskCache {
+		cfg.Ollama.DiskCache = v.GetBool("ollama.disk_cache")
+	}
+
 	// Note: Viper's Unmarshal doesn't work properly with nested structs in some cases,
 	// so we use manual assignment for the analysis section if needed
 
@@ -3,12 +3,15 @@ package main
 import (
 	"debugagent/config"
 	"encoding/json"
+	"errors"
 	"fmt"
 	"net/http"
-	"os"
 	"path/filepath"
 	"regexp"
+	"slices"
+	"sort"
 	"strings"
+	"sync"
 
 	"github.com/sirupsen/logrus"
 )
@@ -33,6 +36,7 @@ type StreamingAnalysisEngine struct {
 	ollamaClient *OllamaClient
 	request      AnalyzeRequest
 	fileResolver *FileResolver
+	eventMu      sync.Mutex // Serializes events written by concurrent plan steps
 }
 
 // NewAnalysisEngine creates a new AnalysisEngine.
@@ -43,7 +47,8 @@ func NewAnalysisEngine(req AnalyzeRequest) (*AnalysisEngine, error) {
 		return nil, fmt.Errorf("failed to create Ollama client: %w", err)
 	}
 
-	fileResolver := NewFileResolver(req.ProjectPath, kb)
+	// The knowledge base already resolved the absolute project root: the resolver reuses it
+	fileResolver := NewFileResolver(kb.ProjectPath, kb)
 
 	return &AnalysisEngine{
 		kb:           kb,
@@ -55,6 +60,7 @@ func NewAnalysisEngine(req AnalyzeRequest) (*AnalysisEngine, error) {
 
 // RunAnalysis runs the full analysis process.
 func (e *AnalysisEngine) RunAnalysis() (string, error) {
+	defer forgetSearchCandidates(e.kb.ProjectPath)
 	logrus.Info("1. Starting initial project analysis...")
 	if err := e.initialAnalysis(); err != nil {
 		// Log the error but continue, as some information may have been gathered.
@@ -83,139 +89,678 @@ func (e *AnalysisEngine) initialAnalysis() error {
 	if err != nil {
 		return fmt.Errorf("failed to get directory structure: %w", err)
 	}
-	e.kb.ProjectStructure = structure
+	e.kb.SetProjectStructure(structure)
 	e.kb.AddHistory("Directory structure analysis complete.")
 
 	// Discover available project files
 	e.fileResolver.DiscoverProjectFiles()
 
-	// Read README file
-	readmePath := filepath.Join(e.kb.ProjectPath, "README.md")
-	if _, err := os.Stat(readmePath); err == nil {
+	// Classify the project from its key files in one request, in the background while the README is read
+	overviewResult := requestProjectOverview(e.ollamaClient, buildProjectOverviewPrompt(e.kb, readKeyProjectFiles(e.kb), maxPromptChars()))
+
+	// Read README file, located from the root listing already scanned above
+	if readmeName := findRootReadme(structure); readmeName != "" {
+		readmePath := filepath.Join(e.kb.ProjectPath, readmeName)
 		content, err := readFileContent(readmePath)
 		if err != nil {
 			e.kb.AddNote(fmt.Sprintf("Error reading README: %v", err))
 		} else {
 			e.kb.AddFileContent(readmePath, content)
-			e.kb.ReadmeContent = content[:min(500, len(content))]
-			e.kb.AddHistory("README.md file read.")
+			e.kb.ReadmePath = readmeName
+			e.kb.AddHistory(fmt.Sprintf("%s file read.", readmeName))
 		}
 	}
 
-	// Identify project type
-	typePrompt := fmt.Sprintf(`
-Initial project context for %s:
-Project Structure (partial): %v
----
-Based on the structure, what is the type of this project (e.g., Go Backend, React Frontend)?
-Be brief (1 sentence).`, filepath.Base(e.kb.ProjectPath), e.kb.ProjectStructure)
-	projectType, err := e.ollamaClient.ollamaRequest("You are a software architecture expert.", typePrompt)
-	if err == nil {
-		e.kb.SetProjectType(strings.TrimSpace(projectType))
-		e.kb.AddHistory(fmt.Sprintf("Estimated project type: %s", e.kb.ProjectType))
+	// Collect the project overview
+	if result := <-overviewResult; result.Err != nil {
+		recordOverviewFailure(e.kb, result.Err)
+	} else {
+		applyProjectOverview(e.kb, parseProjectOverview(result.Response))
 	}
 	return nil
 }
 
+// recordOverviewFailure logs a failed project overview request and notes it in the knowledge
+// base: the exploration then starts without a project type or seeded plan.
+func recordOverviewFailure(kb *KnowledgeBase, err error) {
+	logrus.Warnf("Project overview request failed: %v", err)
+	kb.AddNote(fmt.Sprintf("Error during project overview: %v", err))
+}
+
 // explorationLoop runs the exploration loop.
 func (e *AnalysisEngine) explorationLoop() error {
+	var progress explorationProgress
 	for i := 0; i < config.AppConfig.Analysis.MaxExplorationIterations; i++ {
 		logrus.Infof("--- Iteration %d/%d ---", i+1, config.AppConfig.Analysis.MaxExplorationIterations)
 
-		plan, err := e.planNextSteps()
+		plan, err := e.nextPlan(i)
 		if err != nil {
 			e.kb.AddNote(fmt.Sprintf("Planning error in iteration %d: %v", i, err))
 			continue
 		}
 
-		if len(plan) == 0 || (len(plan) == 1 && plan[0] == "FINISH") {
+		steps, finish := splitFinish(plan)
+		if len(steps) == 0 {
 			logrus.Info("Empty or 'FINISH' plan received, ending exploration.")
 			break
 		}
 		e.kb.ExplorationPlan = plan
 
-		e.executePlan(plan)
+		revision, findings := e.kb.Revision(), e.kb.FindingCount()
+		e.executePlan(steps)
+		learned := e.kb.Revision() != revision
+		plateau := progress.record(e.kb.FindingCount() - findings)
+		foldIntoContext(e.kb, e.ollamaClient)
+		if finish {
+			logrus.Info("Plan ended with 'FINISH', ending exploration.")
+			break
+		}
+		// The next plan would be asked with the same context and could only repeat this one
+		if !learned {
+			logrus.Info("Plan brought no new information, ending exploration.")
+			break
+		}
+		if plateau {
+			logrus.Info("Recent plans found almost nothing new, ending exploration.")
+			break
+		}
 	}
 	return nil
 }
 
+// plateauWindow is the number of recent iterations whose median number of findings decides
+// whether the exploration has stalled.
+const plateauWindow = 3
+
+// explorationProgress records the findings (files read, analyses) of each iteration. The loop
+// stops when the median of the last plateauWindow iterations is zero: most recent plans only
+// failed or repeated themselves, and the iterations left would cost planner and step requests
+// for the same result. The median lets a single unproductive plan pass.
+type explorationProgress struct {
+	gains []int
+}
+
+// record adds the findings of an iteration and reports whether the exploration has stalled.
+func (p *explorationProgress) record(gain int) bool {
+	p.gains = append(p.gains, gain)
+	if len(p.gains) < plateauWindow {
+		return false
+	}
+	recent := slices.Clone(p.gains[len(p.gains)-plateauWindow:])
+	slices.Sort(recent)
+	return recent[plateauWindow/2] == 0
+}
+
+// splitFinish returns the steps of a plan that come before FINISH, and whether the plan ends
+// with FINISH. The planner stops at FINISH, so it can only be the last step; a plan ending with
+// it is the last one, and the exploration stops without asking the planner again.
+func splitFinish(plan []string) ([]string, bool) {
+	if n := len(plan); n > 0 && plan[n-1] == "FINISH" {
+		return plan[:n-1], true
+	}
+	return plan, false
+}
+
+// nextPlan returns the plan for the given iteration, reusing the plan seeded by the initial
+// project overview on the first iteration instead of asking the planner.
+func (e *AnalysisEngine) nextPlan(iteration int) ([]string, error) {
+	if iteration == 0 && len(e.kb.ExplorationPlan) > 0 {
+		return e.kb.ExplorationPlan, nil
+	}
+	return e.planNextSteps()
+}
+
 // planNextSteps plans the next steps in the exploration.
 func (e *AnalysisEngine) planNextSteps() ([]string, error) {
-	contextSummary := e.kb.getContextSummary(e.request.Question, config.AppConfig.Analysis.MaxPromptLength)
-	planPrompt := fmt.Sprintf(`
-Objective: Answer "%s"
-Current Context:
-%s
----
-IMPORTANT GUIDELINES:
-- DO NOT request files that are listed as "Non Disponibles" - they don't exist
-- Use available dependency files when looking for project information
-- If you need dependency info, use the files listed in "Fichiers de Dépendances Disponibles"
-- Avoid repeating failed operations from previous iterations
-
-Propose the next 3-5 logical steps. Use actions: READ_FILE <path>, ANALYZE <subject>, FINISH.
-MANDATORY output format: Simple numbered list.
-Example:
-1. READ_FILE main.go
-2. ANALYZE the application entry point
-`, e.request.Question, contextSummary)
-
-	planSystemPrompt := "You are a code exploration planner. Respond ONLY with the numbered list of actions."
-	rawPlan, err := e.ollamaClient.ollamaRequest(planSystemPrompt, planPrompt)
+	contextSummary := e.kb.getContextSummary(e.request.Question, maxPromptChars())
+	planPrompt := buildPlanPrompt(e.request.Question, contextSummary, maxPromptChars())
+
+	return requestPlan(e.ollamaClient, planPrompt)
+}
+
+// analyzeSubject asks the model to analyze a subject and records the result as a note. When a
+// nearly identical subject was already analyzed, its note already holds the answer: the model
+// is not called and the original subject is returned.
+func analyzeSubject(kb *KnowledgeBase, oc *OllamaClient, question, subject string) (string, error) {
+	if previous, ok := kb.similarAnalysis(subject); ok {
+		logrus.Infof("Reusing the analysis of '%s' for '%s'", previous, subject)
+		return previous, nil
+	}
+
+	maxPromptLength := maxPromptChars()
+	analysisPrompt := buildAnalyzePrompt(subject, kb.getContextSummary(question, maxPromptLength), maxPromptLength)
+	analysisResult, err := oc.ollamaRequest(analyzeSystemPrompt, analysisPrompt)
 	if err != nil {
-		return nil, err
+		return "", err
 	}
-	return parsePlan(rawPlan), nil
+	kb.RecordAnalysis(subject, analysisResult)
+	return "", nil
 }
 
+// planStep is a parsed plan step, split once into its action and arguments.
+type planStep struct {
+	Text   string
+	Action string
+	Args   string
+}
 
-func parsePlan(planStr string) []string {
-	lines := strings.Split(planStr, "\n")
-	plan := make([]string, 0)
-	actionRegex := regexp.MustCompile(`^\s*\d+\.\s*(READ_FILE|ANALYZE|FINISH)\s*(.*)$`)
+// splitPlanStep splits a parsed plan step into its action and arguments.
+func splitPlanStep(step string) planStep {
+	action, args, _ := strings.Cut(step, " ")
+	return planStep{Text: step, Action: action, Args: args}
+}
+
+// runPlanSteps runs the steps of a plan concurrently, in two phases. The READ_FILE and
+// SEARCH_CODE steps only gather context, so they run first, all at once. The ANALYZE steps then
+// run on top of that context; the Ollama client's semaphore bounds how many reach the model at
+// the same time. run receives the index of the step in the plan.
+func runPlanSteps(plan []string, run func(stepIndex int, step planStep)) {
+	steps := make([]planStep, len(plan))
+	var gather, analyze []int
+	for i, text := range plan {
+		steps[i] = splitPlanStep(text)
+		if steps[i].Action == "ANALYZE" {
+			analyze = append(analyze, i)
+		} else {
+			gather = append(gather, i)
+		}
+	}
 
-	for _, line := range lines {
-		line = strings.TrimSpace(line)
-		if line == "" {
+	for _, phase := range [][]int{gather, analyze} {
+		var wg sync.WaitGroup
+		for _, i := range phase {
+			wg.Add(1)
+			go func(i int) {
+				defer wg.Done()
+				run(i, steps[i])
+			}(i)
+		}
+		wg.Wait()
+	}
+}
+
+// recordReadFailure counts a failed read towards the retry limit, or blocks the file right
+// away when the failure cannot go away (directory, binary content).
+func recordReadFailure(kb *KnowledgeBase, filePath string, err error) {
+	if errors.Is(err, errBinaryFile) || errors.Is(err, errNotAFile) {
+		kb.MarkFileUnreadable(filePath)
+		return
+	}
+	kb.AddFailedFileAttempt(filePath)
+}
+
+// keyFile is a project file whose content is sent with the initial project overview request.
+type keyFile struct {
+	Path    string
+	Content string
+}
+
+// maxKeyFiles and maxKeyFileExcerpt bound the files sent with the project overview request,
+// maxSeededReads the number of files it may add to the first exploration plan.
+const (
+	maxKeyFiles       = 5
+	maxKeyFileExcerpt = 2000
+	maxSeededReads    = 3
+)
+
+// readKeyProjectFiles reads the dependency files found during discovery, in a stable order,
+// and records them in the knowledge base so the planner does not ask for them again.
+func readKeyProjectFiles(kb *KnowledgeBase) []keyFile {
+	paths := make([]string, 0, len(kb.DependencyFiles))
+	for _, path := range kb.DependencyFiles {
+		paths = append(paths, path)
+	}
+	sort.Strings(paths)
+
+	// The reads are independent: run them all at once, then keep the first successful ones in order
+	type readResult struct {
+		content string
+		err     error
+	}
+	results := make([]readResult, len(paths))
+	var wg sync.WaitGroup
+	for i, path := range paths {
+		wg.Add(1)
+		go func(i int, path string) {
+			defer wg.Done()
+			content, err := readFileContent(filepath.Join(kb.ProjectPath, path))
+			results[i] = readResult{content: content, err: err}
+		}(i, path)
+	}
+	wg.Wait()
+
+	files := make([]keyFile, 0, min(maxKeyFiles, len(paths)))
+	for i, path := range paths {
+		if len(files) == maxKeyFiles {
+			break
+		}
+		content, err := results[i].content, results[i].err
+		if err != nil {
+			kb.AddNote(fmt.Sprintf("Failed to read key file '%s': %v", path, err))
 			continue
 		}
-		matches := actionRegex.FindStringSubmatch(line)
-		if len(matches) > 1 {
-			action := strings.TrimSpace(matches[1])
-			if action == "FINISH" {
-				plan = append(plan, "FINISH")
-				break // Stop processing further lines once FINISH is found
-			}
+		kb.AddFileContent(filepath.Join(kb.ProjectPath, path), content)
+		files = append(files, keyFile{Path: path, Content: content[:min(maxKeyFileExcerpt, len(content))]})
+	}
+	return files
+}
+
+// projectOverview is the answer expected from the initial project overview request.
+type projectOverview struct {
+	ProjectType string   `json:"project_type"`
+	FilesToRead []string `json:"files_to_read"`
+}
+
+// parseProjectOverview extracts the JSON overview from the model response. If the model did
+// not answer with JSON, the whole response is used as the project type.
+func parseProjectOverview(response string) projectOverview {
+	var overview projectOverview
+	start, end := strings.IndexByte(response, '{'), strings.LastIndexByte(response, '}')
+	if start != -1 && end > start {
+		if err := json.Unmarshal([]byte(response[start:end+1]), &overview); err == nil && overview.ProjectType != "" {
+			return overview
+		}
+	}
+	return projectOverview{ProjectType: strings.TrimSpace(response)}
+}
+
+// applyProjectOverview records the project type and seeds the exploration plan with the
+// files the model suggested reading first.
+func applyProjectOverview(kb *KnowledgeBase, overview projectOverview) {
+	kb.SetProjectType(strings.TrimSpace(overview.ProjectType))
+	kb.AddHistory(fmt.Sprintf("Estimated project type: %s", kb.ProjectType))
+
+	plan := make([]string, 0, maxSeededReads)
+	for _, path := range overview.FilesToRead {
+		if len(plan) == maxSeededReads {
+			break
+		}
+		if path = strings.TrimSpace(path); path != "" {
+			plan = append(plan, "READ_FILE "+path)
+		}
+	}
+	kb.ExplorationPlan = plan
+}
+
+// requestProjectOverview sends the project overview request in the background. The prompt holds
+// the project structure and key files, so with the disk cache enabled, analyzing an unchanged
+// project again, even after a restart, skips the classification request.
+func requestProjectOverview(oc *OllamaClient, prompt string) <-chan ollamaResult {
+	resultChan := make(chan ollamaResult, 1)
+	go func() {
+		response, err := oc.structured().ollamaRequestJSON(projectOverviewSystemPrompt, prompt, maxOverviewTokens)
+		resultChan <- ollamaResult{Response: response, Err: err}
+	}()
+	return resultChan
+}
+
+// summarizeReadFiles asks for a one-sentence summary of every file read since the last call,
+// in one request per batch rather than one per file. The batches are independent and are sent
+// at once; the Ollama client's semaphore bounds how many reach the model at the same time.
+func summarizeReadFiles(kb *KnowledgeBase, oc *OllamaClient) {
+	var wg sync.WaitGroup
+	for files := kb.filesToSummarize(); files != nil; files = kb.filesToSummarize() {
+		wg.Add(1)
+		go func(files []keyFile) {
+			defer wg.Done()
+			summarizeFileBatch(kb, oc, files)
+		}(files)
+	}
+	wg.Wait()
+}
+
+// summarizeFileBatch summarizes one batch of read files and records the summaries.
+func summarizeFileBatch(kb *KnowledgeBase, oc *OllamaClient, files []keyFile) {
+	response, err := oc.structured().ollamaRequestLimited(fileSummariesSystemPrompt, buildFileSummariesPrompt(files, maxPromptChars()), maxTokensPerFileSummary*len(files))
+	if err != nil {
+		logrus.Warnf("Could not summarize read files: %v", err)
+		return
+	}
+	summaries := parseFileSummaries(response)
+	if len(summaries) != len(files) {
+		logrus.Warnf("Expected %d file summaries, got %d", len(files), len(summaries))
+	}
+	byPath := make(map[string]string, len(files))
+	for i := 0; i < min(len(files), len(summaries)); i++ {
+		if summary := strings.TrimSpace(summaries[i]); summary != "" {
+			byPath[files[i].Path] = summary
+		}
+	}
+	kb.SetFileSummaries(byPath)
+}
+
+// foldIntoContext condenses what the last plan added before the next one is asked: the files
+// read are summarized and the older notes compacted. The two use separate parts of the
+// knowledge base, so their requests run concurrently.
+func foldIntoContext(kb *KnowledgeBase, oc *OllamaClient) {
+	var wg sync.WaitGroup
+	wg.Add(1)
+	go func() {
+		defer wg.Done()
+		summarizeReadFiles(kb, oc)
+	}()
+	compactHistory(kb, oc)
+	wg.Wait()
+}
+
+// parseFileSummaries extracts the JSON array of summaries from the model response.
+func parseFileSummaries(response string) []string {
+	start, end := strings.IndexByte(response, '['), strings.LastIndexByte(response, ']')
+	if start == -1 || end <= start {
+		return nil
+	}
+	var summaries []string
+	if err := json.Unmarshal([]byte(response[start:end+1]), &summaries); err != nil {
+		return nil
+	}
+	return summaries
+}
+
+// compactHistory folds the notes and history entries that no longer fit in the context summary
+// into a short LLM-generated summary, so older findings are kept without growing the prompts.
+func compactHistory(kb *KnowledgeBase, oc *OllamaClient) {
+	olderEntries := kb.olderEntriesToSummarize()
+	if olderEntries == nil {
+		return
+	}
+
+	summary, err := oc.structured().ollamaRequestLimited(historySummarySystemPrompt, buildHistorySummaryPrompt(olderEntries, maxPromptChars()), maxHistorySummaryTokens)
+	if err != nil {
+		logrus.Warnf("Could not summarize older history: %v", err)
+		return
+	}
+	kb.SetHistorySummary(strings.TrimSpace(summary), len(olderEntries))
+}
+
+// searchArgsRegex splits SEARCH_CODE arguments into a term, quoted or not, and an optional
+// "in <directory>" scope, in a single match.
+var searchArgsRegex = regexp.MustCompile("^\\s*(?:\"([^\"]+)\"|'([^']+)'|`([^`]+)`|(.+?))(?:\\s+(?:in|dans)\\s+(\\S+))?\\s*$")
+
+// parseSearchArgs extracts the term and the optional directory of a SEARCH_CODE step.
+func parseSearchArgs(args string) (term, dir string) {
+	matches := searchArgsRegex.FindStringSubmatch(args)
+	if matches == nil {
+		return strings.TrimSpace(args), ""
+	}
+	for _, group := range matches[1:5] {
+		if group != "" {
+			term = group
+			break
+		}
+	}
+	return term, strings.Trim(matches[5], "\"'`")
+}
+
+// planActionRegex matches a numbered plan line and captures its action and arguments. It is
+// compiled once since it runs on every streamed plan line.
+var planActionRegex = regexp.MustCompile(`^\s*\d+\.\s*(READ_FILE|SEARCH_CODE|ANALYZE|FINISH)\s*(.*)$`)
+
+// pathArgsSpecialChars are the characters that make READ_FILE arguments more than a bare path.
+const pathArgsSpecialChars = " \t`'\"()[],;:"
+
+// pathQuotes are the characters the model uses to quote a path.
+const pathQuotes = "`'\""
+
+// firstQuoted returns the first non-empty text written between two quote characters of
+// pathQuotes, not necessarily the same one. It scans the arguments once, without the regex engine.
+func firstQuoted(args string) (string, bool) {
+	start := strings.IndexAny(args, pathQuotes)
+	for start != -1 {
+		rest := args[start+1:]
+		end := strings.IndexAny(rest, pathQuotes)
+		if end == -1 {
+			return "", false
+		}
+		if end > 0 {
+			return rest[:end], true
+		}
+		// Empty quotes: the closing quote may open the path
+		start++
+	}
+	return "", false
+}
 
-			if len(matches) > 2 {
-				args := strings.TrimSpace(matches[2])
-				if args != "" {
-					plan = append(plan, fmt.Sprintf("%s %s", action, args))
-				}
+// Characters that may precede and follow a bare path in READ_FILE arguments.
+const (
+	barePathOpeners = " \t\n\f\r([,;"
+	barePathClosers = " \t\n\f\r'\"`)],;:."
+)
+
+// firstBarePath returns the first whole token that looks like a file path with an extension,
+// ignoring surrounding brackets and trailing punctuation. Tokens are runs of word characters,
+// '.', '/' and '-'; only a run that starts the arguments or follows an opener is considered.
+// It scans the arguments once, without the regex engine.
+func firstBarePath(args string) (string, bool) {
+	for start := 0; start < len(args); {
+		if !isPathTokenByte(args[start]) {
+			start++
+			continue
+		}
+		end := start
+		for end < len(args) && isPathTokenByte(args[end]) {
+			end++
+		}
+		if start == 0 || strings.IndexByte(barePathOpeners, args[start-1]) != -1 {
+			closed := end == len(args) || strings.IndexByte(barePathClosers, args[end]) != -1
+			if path, ok := longestPathPrefix(args[start:end], closed); ok {
+				return path, true
 			}
 		}
+		start = end
+	}
+	return "", false
+}
+
+// longestPathPrefix returns the longest prefix of a token that is a path with an extension and
+// is followed by a closer: the whole token if closed is set, or else a prefix ending before a dot.
+func longestPathPrefix(token string, closed bool) (string, bool) {
+	end := len(token)
+	if !closed {
+		end = strings.LastIndexByte(token, '.')
+	}
+	for end > 0 {
+		if hasPathExtension(token[:end]) {
+			return token[:end], true
+		}
+		end = strings.LastIndexByte(token[:end], '.')
+	}
+	return "", false
+}
+
+// hasPathExtension reports whether a token ends with a dot followed by word characters, with
+// something before the dot.
+func hasPathExtension(token string) bool {
+	dot := strings.LastIndexByte(token, '.')
+	if dot <= 0 || dot == len(token)-1 {
+		return false
+	}
+	for i := dot + 1; i < len(token); i++ {
+		if !isWordByte(token[i]) {
+			return false
+		}
+	}
+	return true
+}
+
+// isPathTokenByte reports whether c can appear in a bare path: a word character, '.', '/' or '-'.
+func isPathTokenByte(c byte) bool {
+	return c == '.' || c == '/' || c == '-' || isWordByte(c)
+}
+
+// isWordByte reports whether c is an ASCII letter, digit or underscore.
+func isWordByte(c byte) bool {
+	return c == '_' || '0' <= c && c <= '9' || 'a' <= c && c <= 'z' || 'A' <= c && c <= 'Z'
+}
+
+// extractPathFromArgs extracts the file path from the arguments of a READ_FILE step, which
+// the model sometimes quotes or follows with a short explanation.
+func extractPathFromArgs(args string) string {
+	args = strings.TrimSpace(args)
+	// Fast path: a bare path such as "src/main.go" is returned as is
+	if !strings.ContainsAny(args, pathArgsSpecialChars) && !strings.HasSuffix(args, ".") {
+		return args
+	}
+	// Fast path: without a quote or a dot there is nothing for firstQuoted or firstBarePath to
+	// find, so the path is the first word
+	if !strings.ContainsAny(args, "`'\".") {
+		if fields := strings.Fields(args); len(fields) > 0 {
+			return fields[0]
+		}
+		return args
+	}
+	if quoted, ok := firstQuoted(args); ok {
+		return strings.TrimSpace(quoted)
+	}
+	if path, ok := firstBarePath(args); ok {
+		return path
+	}
+	if fields := strings.Fields(args); len(fields) > 0 {
+		return fields[0]
+	}
+	return args
+}
+
+func parsePlan(planStr string) []string {
+	plan := make([]string, 0)
+	for _, line := range strings.Split(planStr, "\n") {
+		step, ok := parsePlanLine(line)
+		if !ok {
+			continue
+		}
+		plan = append(plan, step)
+		if step == "FINISH" {
+			break // Stop processing further lines once FINISH is found
+		}
 	}
 	return plan
 }
 
-// executePlan executes the given exploration plan.
-func (e *AnalysisEngine) executePlan(plan []string) {
-	for _, step := range plan {
-		logrus.Infof("Executing step: %s", step)
-		parts := strings.SplitN(step, " ", 2)
-		action := parts[0]
-		args := ""
-		if len(parts) > 1 {
-			args = parts[1]
+// maxPlanLineCacheEntries bounds planLineCache; the cache is simply reset when it is full.
+const maxPlanLineCacheEntries = 1024
+
+// parsedPlanLine is a cached result of parsePlanLine.
+type parsedPlanLine struct {
+	step string
+	ok   bool
+}
+
+// planLineCache memoizes parsePlanLine by raw line, since the planner often re-emits the same
+// steps from one iteration to the next.
+var planLineCache = struct {
+	sync.Mutex
+	entries map[string]parsedPlanLine
+}{entries: make(map[string]parsedPlanLine)}
+
+// parsePlanLine parses a single line of a plan, reporting whether it holds a usable step.
+func parsePlanLine(line string) (string, bool) {
+	planLineCache.Lock()
+	defer planLineCache.Unlock()
+	if parsed, ok := planLineCache.entries[line]; ok {
+		return parsed.step, parsed.ok
+	}
+
+	step, ok := parseUncachedPlanLine(line)
+	if len(planLineCache.entries) >= maxPlanLineCacheEntries {
+		clear(planLineCache.entries)
+	}
+	planLineCache.entries[line] = parsedPlanLine{step: step, ok: ok}
+	return step, ok
+}
+
+// parseUncachedPlanLine does the actual parsing for parsePlanLine.
+func parseUncachedPlanLine(line string) (string, bool) {
+	line = strings.TrimSpace(line)
+	if line == "" {
+		return "", false
+	}
+	action, args, ok := splitPlanLine(line)
+	if !ok {
+		matches := planActionRegex.FindStringSubmatch(line)
+		if len(matches) < 3 {
+			return "", false
+		}
+		action, args = matches[1], matches[2]
+	}
+	if action == "FINISH" {
+		return "FINISH", true
+	}
+	args = strings.TrimSpace(args)
+	if args == "" {
+		return "", false
+	}
+	return action + " " + args, true
+}
+
+// planVerbs holds the actions a plan step may start with.
+var planVerbs = map[string]bool{"READ_FILE": true, "SEARCH_CODE": true, "ANALYZE": true, "FINISH": true}
+
+// splitPlanLine is the fast path of parsePlanLine: it strips the "N." prefix and splits the
+// verb from its arguments without the regex engine. It reports false when the line is not in
+// that simple form, in which case the caller falls back to planActionRegex.
+func splitPlanLine(line string) (string, string, bool) {
+	dot := strings.IndexByte(line, '.')
+	if dot <= 0 {
+		return "", "", false
+	}
+	for i := 0; i < dot; i++ {
+		if line[i] < '0' || line[i] > '9' {
+			return "", "", false
 		}
+	}
+	rest := strings.TrimSpace(line[dot+1:])
+	verb, args := rest, ""
+	if end := strings.IndexAny(rest, " \t"); end != -1 {
+		verb, args = rest[:end], rest[end+1:]
+	}
+	verb = strings.ToUpper(verb)
+	if !planVerbs[verb] {
+		return "", "", false
+	}
+	return verb, args, true
+}
 
-		switch action {
+// maxPlanSteps is the number of steps planGuidelines asks the planner for, at most.
+const maxPlanSteps = 5
+
+// requestPlan streams the plan from the model, parsing each step as soon as its line is
+// complete and stopping the generation once FINISH is received. Plans share the response cache:
+// asked again with the same context, the planner is not called.
+func requestPlan(oc *OllamaClient, planPrompt string) ([]string, error) {
+	oc = oc.structured()
+	key := responseCacheKey(oc.model, planSystemPrompt, planPrompt, maxPlanTokens, "")
+	if response, ok := oc.cachedResponse(key); ok {
+		return parsePlan(response), nil
+	}
+
+	plan := make([]string, 0, maxPlanSteps)
+	response, err := oc.ollamaStreamLines(planSystemPrompt, planPrompt, maxPlanTokens, func(line string) bool {
+		step, ok := parsePlanLine(line)
+		if !ok {
+			return true
+		}
+		plan = append(plan, step)
+		return step != "FINISH"
+	})
+	if err != nil {
+		return nil, err
+	}
+	oc.storeResponse(key, response)
+	return plan, nil
+}
+
+// executePlan executes the given exploration plan.
+func (e *AnalysisEngine) executePlan(plan []string) {
+	runPlanSteps(plan, func(_ int, step planStep) {
+		logrus.Infof("Executing step: %s", step.Text)
+		switch step.Action {
 		case "READ_FILE":
-			e.executeReadFile(args)
+			e.executeReadFile(extractPathFromArgs(step.Args))
+		case "SEARCH_CODE":
+			e.executeSearchCode(parseSearchArgs(step.Args))
 		case "ANALYZE":
-			e.executeAnalyze(args)
+			e.executeAnalyze(step.Args)
 		}
-	}
+	})
 }
 
 // executeReadFile reads a file and adds its content to the knowledge base.
@@ -245,7 +790,7 @@ func (e *AnalysisEngine) executeReadFile(filePath string) {
 	content, err := readFileContent(fullPath)
 	if err != nil {
 		e.kb.AddNote(fmt.Sprintf("Failed to read resolved file '%s': %v", resolvedFile, err))
-		e.kb.AddFailedFileAttempt(resolvedFile)
+		recordReadFailure(e.kb, resolvedFile, err)
 	} else {
 		e.kb.AddFileContent(fullPath, content)
 		if resolvedFile != filePath {
@@ -254,30 +799,30 @@ func (e *AnalysisEngine) executeReadFile(filePath string) {
 	}
 }
 
+// executeSearchCode searches the project, or one of its directories, for a term and records
+// the matching files.
+func (e *AnalysisEngine) executeSearchCode(term, dir string) {
+	matches, err := searchCode(e.kb.ProjectPath, term, dir)
+	if err != nil {
+		e.kb.AddNote(fmt.Sprintf("Failed to search for '%s': %v", term, err))
+		return
+	}
+	e.kb.AddNote(formatSearchResults(term, matches))
+}
+
 // executeAnalyze analyzes a subject and adds the result to the knowledge base.
 func (e *AnalysisEngine) executeAnalyze(subject string) {
-	analysisPrompt := fmt.Sprintf(`
-Context: %s
----
-Analyze the following question: "%s"`, e.kb.getContextSummary(e.request.Question, config.AppConfig.Analysis.MaxPromptLength), subject)
-	analysisResult, err := e.ollamaClient.ollamaRequest("You are a code analysis assistant.", analysisPrompt)
-	if err != nil {
+	if _, err := analyzeSubject(e.kb, e.ollamaClient, e.request.Question, subject); err != nil {
 		e.kb.AddNote(fmt.Sprintf("Failed to analyze '%s': %v", subject, err))
-	} else {
-		e.kb.AddNote(fmt.Sprintf("Analysis of '%s': %s", subject, analysisResult))
 	}
 }
 
 // generateFinalAnswer generates the final answer based on the collected knowledge.
 func (e *AnalysisEngine) generateFinalAnswer() (string, error) {
-	finalContext := e.kb.getContextSummary(e.request.Question, config.AppConfig.Analysis.MaxPromptLength)
-	finalPrompt := fmt.Sprintf(`
-Final collected context:
-%s
----
-Synthesize all this information to provide a complete and structured answer to the user's initial question: "%s"`, finalContext, e.request.Question)
+	finalContext := e.kb.getContextSummary(e.request.Question, maxPromptChars())
+	finalPrompt := buildFinalPrompt(e.request.Question, finalContext, maxPromptChars())
 
-	return e.ollamaClient.ollamaRequest("You are an expert AI assistant who synthesizes technical information.", finalPrompt)
+	return e.ollamaClient.ollamaRequest(finalAnswerSystemPrompt, finalPrompt)
 }
 
 // NewStreamingAnalysisEngine creates a new StreamingAnalysisEngine.
@@ -288,7 +833,8 @@ func NewStreamingAnalysisEngine(req AnalyzeRequest) (*StreamingAnalysisEngine, e
 		return nil, fmt.Errorf("failed to create Ollama client: %w", err)
 	}
 
-	fileResolver := NewFileResolver(req.ProjectPath, kb)
+	// The knowledge base already resolved the absolute project root: the resolver reuses it
+	fileResolver := NewFileResolver(kb.ProjectPath, kb)
 
 	return &StreamingAnalysisEngine{
 		kb:           kb,
@@ -309,6 +855,9 @@ func (e *StreamingAnalysisEngine) sendEvent(w http.ResponseWriter, eventType, st
 		"data":      data,
 	}
 	eventData, _ := json.Marshal(event)
+
+	e.eventMu.Lock()
+	defer e.eventMu.Unlock()
 	fmt.Fprintf(w, "data: %s\n\n", eventData)
 	if f, ok := w.(http.Flusher); ok {
 		f.Flush()
@@ -317,6 +866,7 @@ func (e *StreamingAnalysisEngine) sendEvent(w http.ResponseWriter, eventType, st
 
 // RunStreamingAnalysis runs the full analysis process with streaming updates.
 func (e *StreamingAnalysisEngine) RunStreamingAnalysis(w http.ResponseWriter) {
+	defer forgetSearchCandidates(e.kb.ProjectPath)
 	e.sendEvent(w, "progress", "initial", "Starting initial project analysis...", 0, 0, "")
 
 	if err := e.initialStreamingAnalysis(w); err != nil {
@@ -351,7 +901,7 @@ func (e *StreamingAnalysisEngine) initialStreamingAnalysis(w http.ResponseWriter
 	if err != nil {
 		return fmt.Errorf("failed to get directory structure: %w", err)
 	}
-	e.kb.ProjectStructure = structure
+	e.kb.SetProjectStructure(structure)
 	e.kb.AddHistory("Directory structure analysis complete.")
 
 	e.sendEvent(w, "step", "discovery", "Discovering available project files...", 0, 0, "")
@@ -360,18 +910,21 @@ func (e *StreamingAnalysisEngine) initialStreamingAnalysis(w http.ResponseWriter
 	e.fileResolver.DiscoverProjectFiles()
 	e.sendEvent(w, "step", "discovery", fmt.Sprintf("Found %d available files", len(e.kb.AvailableFiles)), 0, 0, "")
 
+	// Classify the project from its key files in one request, in the background while the README is read
+	overviewResult := requestProjectOverview(e.ollamaClient, buildProjectOverviewPrompt(e.kb, readKeyProjectFiles(e.kb), maxPromptChars()))
+
 	e.sendEvent(w, "step", "readme", "Reading README file...", 0, 0, "")
 
-	// Read README file
-	readmePath := filepath.Join(e.kb.ProjectPath, "README.md")
-	if _, err := os.Stat(readmePath); err == nil {
+	// Read README file, located from the root listing already scanned above
+	if readmeName := findRootReadme(structure); readmeName != "" {
+		readmePath := filepath.Join(e.kb.ProjectPath, readmeName)
 		content, err := readFileContent(readmePath)
 		if err != nil {
 			e.kb.AddNote(fmt.Sprintf("Error reading README: %v", err))
 		} else {
 			e.kb.AddFileContent(readmePath, content)
-			e.kb.ReadmeContent = content[:min(500, len(content))]
-			e.kb.AddHistory("README.md file read.")
+			e.kb.ReadmePath = readmeName
+			e.kb.AddHistory(fmt.Sprintf("%s file read.", readmeName))
 			e.sendEvent(w, "step", "readme", "README file processed successfully", 0, 0, "")
 		}
 	} else {
@@ -380,17 +933,12 @@ func (e *StreamingAnalysisEngine) initialStreamingAnalysis(w http.ResponseWriter
 
 	e.sendEvent(w, "step", "type", "Identifying project type...", 0, 0, "")
 
-	// Identify project type
-	typePrompt := fmt.Sprintf(`
-Initial project context for %s:
-Project Structure (partial): %v
----
-Based on the structure, what is the type of this project (e.g., Go Backend, React Frontend)?
-Be brief (1 sentence).`, filepath.Base(e.kb.ProjectPath), e.kb.ProjectStructure)
-	projectType, err := e.ollamaClient.ollamaRequest("You are a software architecture expert.", typePrompt)
-	if err == nil {
-		e.kb.SetProjectType(strings.TrimSpace(projectType))
-		e.kb.AddHistory(fmt.Sprintf("Estimated project type: %s", e.kb.ProjectType))
+	// Collect the project overview
+	if result := <-overviewResult; result.Err != nil {
+		recordOverviewFailure(e.kb, result.Err)
+		e.sendEvent(w, "error", "type", fmt.Sprintf("Project overview failed: %v", result.Err), 0, 0, "")
+	} else {
+		applyProjectOverview(e.kb, parseProjectOverview(result.Response))
 		e.sendEvent(w, "step", "type", fmt.Sprintf("Identified as: %s", e.kb.ProjectType), 0, 0, "")
 	}
 	return nil
@@ -399,45 +947,60 @@ Be brief (1 sentence).`, filepath.Base(e.kb.ProjectPath), e.kb.ProjectStructure)
 // explorationStreamingLoop runs the exploration loop with streaming updates.
 func (e *StreamingAnalysisEngine) explorationStreamingLoop(w http.ResponseWriter) error {
 	maxIterations := config.AppConfig.Analysis.MaxExplorationIterations
+	var progress explorationProgress
 	for i := 0; i < maxIterations; i++ {
 		e.sendEvent(w, "step", "iteration", fmt.Sprintf("Planning iteration %d of %d...", i+1, maxIterations), i+1, maxIterations, "")
 
-		plan, err := e.planNextSteps()
+		plan, err := e.nextPlan(i)
 		if err != nil {
 			e.kb.AddNote(fmt.Sprintf("Planning error in iteration %d: %v", i, err))
 			e.sendEvent(w, "error", "planning", fmt.Sprintf("Planning error: %v", err), i+1, maxIterations, "")
 			continue
 		}
 
-		if len(plan) == 0 || (len(plan) == 1 && plan[0] == "FINISH") {
+		steps, finish := splitFinish(plan)
+		if len(steps) == 0 {
 			e.sendEvent(w, "step", "finish", "Analysis complete - no more steps needed", i+1, maxIterations, "")
 			break
 		}
 		e.kb.ExplorationPlan = plan
 
-		e.executeStreamingPlan(w, plan, i+1, maxIterations)
+		revision, findings := e.kb.Revision(), e.kb.FindingCount()
+		e.executeStreamingPlan(w, steps, i+1, maxIterations)
+		learned := e.kb.Revision() != revision
+		plateau := progress.record(e.kb.FindingCount() - findings)
+		foldIntoContext(e.kb, e.ollamaClient)
+		if finish {
+			e.sendEvent(w, "step", "finish", "Analysis complete - no more steps needed", i+1, maxIterations, "")
+			break
+		}
+		// The next plan would be asked with the same context and could only repeat this one
+		if !learned {
+			e.sendEvent(w, "step", "finish", "Analysis complete - the last steps brought no new information", i+1, maxIterations, "")
+			break
+		}
+		if plateau {
+			e.sendEvent(w, "step", "finish", "Analysis complete - recent steps found almost nothing new", i+1, maxIterations, "")
+			break
+		}
 	}
 	return nil
 }
 
 // executeStreamingPlan executes the given exploration plan with streaming updates.
 func (e *StreamingAnalysisEngine) executeStreamingPlan(w http.ResponseWriter, plan []string, iteration, total int) {
-	for stepIndex, step := range plan {
-		e.sendEvent(w, "step", "execute", fmt.Sprintf("Executing: %s", step), iteration, total, "")
-		parts := strings.SplitN(step, " ", 2)
-		action := parts[0]
-		args := ""
-		if len(parts) > 1 {
-			args = parts[1]
-		}
-
-		switch action {
+	runPlanSteps(plan, func(stepIndex int, step planStep) {
+		e.sendEvent(w, "step", "execute", fmt.Sprintf("Executing: %s", step.Text), iteration, total, "")
+		switch step.Action {
 		case "READ_FILE":
-			e.executeStreamingReadFile(w, args, iteration, total, stepIndex+1, len(plan))
+			e.executeStreamingReadFile(w, extractPathFromArgs(step.Args), iteration, total, stepIndex+1, len(plan))
+		case "SEARCH_CODE":
+			term, dir := parseSearchArgs(step.Args)
+			e.executeStreamingSearchCode(w, term, dir, iteration, total)
 		case "ANALYZE":
-			e.executeStreamingAnalyze(w, args, iteration, total, stepIndex+1, len(plan))
+			e.executeStreamingAnalyze(w, step.Args, iteration, total, stepIndex+1, len(plan))
 		}
-	}
+	})
 }
 
 // executeStreamingReadFile reads a file with streaming updates.
@@ -469,7 +1032,7 @@ func (e *StreamingAnalysisEngine) executeStreamingReadFile(w http.ResponseWriter
 	content, err := readFileContent(fullPath)
 	if err != nil {
 		e.kb.AddNote(fmt.Sprintf("Failed to read resolved file '%s': %v", resolvedFile, err))
-		e.kb.AddFailedFileAttempt(resolvedFile)
+		recordReadFailure(e.kb, resolvedFile, err)
 		e.sendEvent(w, "error", "read", fmt.Sprintf("Failed to read %s: %v", resolvedFile, err), iteration, total, "")
 	} else {
 		e.kb.AddFileContent(fullPath, content)
@@ -481,19 +1044,30 @@ func (e *StreamingAnalysisEngine) executeStreamingReadFile(w http.ResponseWriter
 	}
 }
 
+// executeStreamingSearchCode searches the project for a term with streaming updates.
+func (e *StreamingAnalysisEngine) executeStreamingSearchCode(w http.ResponseWriter, term, dir string, iteration, total int) {
+	e.sendEvent(w, "step", "search", fmt.Sprintf("Searching for: %s", term), iteration, total, "")
+	matches, err := searchCode(e.kb.ProjectPath, term, dir)
+	if err != nil {
+		e.kb.AddNote(fmt.Sprintf("Failed to search for '%s': %v", term, err))
+		e.sendEvent(w, "error", "search", fmt.Sprintf("Search failed for %s: %v", term, err), iteration, total, "")
+		return
+	}
+	e.kb.AddNote(formatSearchResults(term, matches))
+	e.sendEvent(w, "step", "search", fmt.Sprintf("Found %d files matching: %s", len(matches), term), iteration, total, "")
+}
+
 // executeStreamingAnalyze analyzes a subject with streaming updates.
 func (e *StreamingAnalysisEngine) executeStreamingAnalyze(w http.ResponseWriter, subject string, iteration, total, stepNum, totalSteps int) {
 	e.sendEvent(w, "step", "analyze", fmt.Sprintf("Analyzing: %s", subject), iteration, total, "")
-	analysisPrompt := fmt.Sprintf(`
-Context: %s
----
-Analyze the following question: "%s"`, e.kb.getContextSummary(e.request.Question, config.AppConfig.Analysis.MaxPromptLength), subject)
-	analysisResult, err := e.ollamaClient.ollamaRequest("You are a code analysis assistant.", analysisPrompt)
-	if err != nil {
+	reusedFrom, err := analyzeSubject(e.kb, e.ollamaClient, e.request.Question, subject)
+	switch {
+	case err != nil:
 		e.kb.AddNote(fmt.Sprintf("Failed to analyze '%s': %v", subject, err))
 		e.sendEvent(w, "error", "analyze", fmt.Sprintf("Analysis failed for %s: %v", subject, err), iteration, total, "")
-	} else {
-		e.kb.AddNote(fmt.Sprintf("Analysis of '%s': %s", subject, analysisResult))
+	case reusedFrom != "":
+		e.sendEvent(w, "step", "analyze", fmt.Sprintf("Reusing the analysis of: %s", reusedFrom), iteration, total, "")
+	default:
 		e.sendEvent(w, "step", "analyze", fmt.Sprintf("Analysis complete: %s", subject), iteration, total, "")
 	}
 }
@@ -501,42 +1075,34 @@ Analyze the following question: "%s"`, e.kb.getContextSummary(e.request.Question
 // generateStreamingFinalAnswer generates the final answer with streaming updates.
 func (e *StreamingAnalysisEngine) generateStreamingFinalAnswer(w http.ResponseWriter) (string, error) {
 	e.sendEvent(w, "step", "synthesis", "Synthesizing collected information...", 0, 0, "")
-	finalContext := e.kb.getContextSummary(e.request.Question, config.AppConfig.Analysis.MaxPromptLength)
-	finalPrompt := fmt.Sprintf(`
-Final collected context:
-%s
----
-Synthesize all this information to provide a complete and structured answer to the user's initial question: "%s"`, finalContext, e.request.Question)
+	finalContext := e.kb.getContextSummary(e.request.Question, maxPromptChars())
+	finalPrompt := buildFinalPrompt(e.request.Question, finalContext, maxPromptChars())
 
 	e.sendEvent(w, "step", "generating", "Generating final answer with AI...", 0, 0, "")
-	return e.ollamaClient.ollamaRequest("You are an expert AI assistant who synthesizes technical information.", finalPrompt)
+	// Stream the answer line by line so the client can display it while it is being generated
+	answer, err := e.ollamaClient.ollamaStreamLines(finalAnswerSystemPrompt, finalPrompt, 0, func(line string) bool {
+		e.sendEvent(w, "answer", "generating", "", 0, 0, line+"\n")
+		return true
+	})
+	if err != nil {
+		return "", err
+	}
+	return cleanResponse(answer), nil
+}
+
+// nextPlan returns the plan for the given iteration, reusing the plan seeded by the initial
+// project overview on the first iteration instead of asking the planner.
+func (e *StreamingAnalysisEngine) nextPlan(iteration int) ([]string, error) {
+	if iteration == 0 && len(e.kb.ExplorationPlan) > 0 {
+		return e.kb.ExplorationPlan, nil
+	}
+	return e.planNextSteps()
 }
 
 // planNextSteps plans the next steps in the exploration for streaming engine.
 func (e *StreamingAnalysisEngine) planNextSteps() ([]string, error) {
-	contextSummary := e.kb.getContextSummary(e.request.Question, config.AppConfig.Analysis.MaxPromptLength)
-	planPrompt := fmt.Sprintf(`
-Objective: Answer "%s"
-Current Context:
-%s
----
-IMPORTANT GUIDELINES:
-- DO NOT request files that are listed as "Non Disponibles" - they don't exist
-- Use available dependency files when looking for project information
-- If you need dependency info, use the files listed in "Fichiers de Dépendances Disponibles"
-- Avoid repeating failed operations from previous iterations
-
-Propose the next 3-5 logical steps. Use actions: READ_FILE <path>, ANALYZE <subject>, FINISH.
-MANDATORY output format: Simple numbered list.
-Example:
-1. READ_FILE main.go
-2. ANALYZE the application entry point
-`, e.request.Question, contextSummary)
-
-	planSystemPrompt := "You are a code exploration planner. Respond ONLY with the numbered list of actions."
-	rawPlan, err := e.ollamaClient.ollamaRequest(planSystemPrompt, planPrompt)
-	if err != nil {
-		return nil, err
-	}
-	return parsePlan(rawPlan), nil
+	contextSummary := e.kb.getContextSummary(e.request.Question, maxPromptChars())
+	planPrompt := buildPlanPrompt(e.request.Question, contextSummary, maxPromptChars())
+
+	return requestPlan(e.ollamaClient, planPrompt)
 }
@@ -1,7 +1,19 @@
 package main
 
 import (
+	"debugagent/config"
+	"encoding/json"
+	"errors"
+	"fmt"
+	"net/http"
+	"os"
+	"path/filepath"
 	"reflect"
+	"regexp"
+	"slices"
+	"strings"
+	"sync"
+	"sync/atomic"
 	"testing"
 )
 
@@ -43,6 +55,19 @@ func TestParsePlan(t *testing.T) {
 2.ANALYZE    subject`,
 			expected: []string{"READ_FILE main.go", "ANALYZE subject"},
 		},
+		{
+			name: "Plan with lowercase actions",
+			planStr: `
+1. read_file main.go
+2. Analyze entry point
+3. finish`,
+			expected: []string{"READ_FILE main.go", "ANALYZE entry point", "FINISH"},
+		},
+		{
+			name:     "Lines that are not steps",
+			planStr:  "Here is the plan:\n1.5 seconds\n1. READ_FILE main.go",
+			expected: []string{"READ_FILE main.go"},
+		},
 	}
 
 	for _, tc := range testCases {
@@ -54,3 +79,341 @@ func TestParsePlan(t *testing.T) {
 		})
 	}
 }
+
+func TestParseProjectOverview(t *testing.T) {
+	testCases := []struct {
+		name     string
+		response string
+		expected projectOverview
+	}{
+		{
+			name:     "JSON answer",
+			response: `{"project_type": "Go Backend", "files_to_read": ["main.go", "engine.go"]}`,
+			expected: projectOverview{ProjectType: "Go Backend", FilesToRead: []string{"main.go", "engine.go"}},
+		},
+		{
+			name:     "JSON surrounded by text",
+			response: "Here it is:\n{\"project_type\": \"React Frontend\", \"files_to_read\": []}\nDone.",
+			expected: projectOverview{ProjectType: "React Frontend", FilesToRead: []string{}},
+		},
+		{
+			name:     "Plain text answer",
+			response: "  A Go Backend.  ",
+			expected: projectOverview{ProjectType: "A Go Backend."},
+		},
+	}
+
+	for _, tc := range testCases {
+		t.Run(tc.name, func(t *testing.T) {
+			actual := parseProjectOverview(tc.response)
+			if !reflect.DeepEqual(actual, tc.expected) {
+				t.Errorf("expected: %+v, got: %+v", tc.expected, actual)
+			}
+		})
+	}
+}
+
+func TestApplyProjectOverviewSeedsPlan(t *testing.T) {
+	kb := NewKnowledgeBase("/tmp/project")
+	applyProjectOverview(kb, projectOverview{ProjectType: "Go Backend", FilesToRead: []string{"a.go", " ", "b.go", "c.go", "d.go"}})
+
+	if kb.ProjectType != "Go Backend" {
+		t.Errorf("expected project type 'Go Backend', got '%s'", kb.ProjectType)
+	}
+	expected := []string{"READ_FILE a.go", "READ_FILE b.go", "READ_FILE c.go"}
+	if !reflect.DeepEqual(kb.ExplorationPlan, expected) {
+		t.Errorf("expected plan %v, got %v", expected, kb.ExplorationPlan)
+	}
+}
+
+func TestInitialAnalysisRecordsOverviewFailure(t *testing.T) {
+	client := setupOllamaClientTest(t, func(w http.ResponseWriter, r *http.Request) {
+		w.WriteHeader(http.StatusInternalServerError)
+		json.NewEncoder(w).Encode(generateResponse{Error: "model crashed"})
+	})
+	config.AppConfig.Analysis.MaxDirectoryDepth = 2
+	kb := NewKnowledgeBase(t.TempDir())
+	engine := &AnalysisEngine{kb: kb, ollamaClient: client, fileResolver: NewFileResolver(kb.ProjectPath, kb)}
+
+	if err := engine.initialAnalysis(); err != nil {
+		t.Fatalf("initialAnalysis() returned an error: %v", err)
+	}
+	if !slices.ContainsFunc(kb.AnalysisNotes, func(note string) bool { return strings.Contains(note, "model crashed") }) {
+		t.Errorf("expected the overview failure to be noted, got %v", kb.AnalysisNotes)
+	}
+}
+
+func TestRunAnalysisReusesCachedResponsesAcrossUploads(t *testing.T) {
+	t.Setenv("XDG_CACHE_HOME", t.TempDir())
+	t.Setenv("HOME", t.TempDir())
+	var requests atomic.Int32
+	client := setupOllamaClientTest(t, func(w http.ResponseWriter, r *http.Request) {
+		requests.Add(1)
+		var req generateRequest
+		json.NewDecoder(r.Body).Decode(&req)
+		response := "The project prints a greeting."
+		switch req.System {
+		case projectOverviewSystemPrompt:
+			response = `{"project_type": "Go Backend", "plan": ["READ_FILE main.go"]}`
+		case planSystemPrompt:
+			response = "1. READ_FILE main.go\n2. FINISH"
+		case fileSummariesSystemPrompt:
+			response = `["Prints a greeting."]`
+		}
+		json.NewEncoder(w).Encode(generateResponse{Response: response, Done: true})
+	})
+	client.cacheDir = responseCacheDir()
+	config.AppConfig.Analysis.MaxExplorationIterations = 3
+	config.AppConfig.Analysis.MaxDirectoryDepth = 2
+	config.AppConfig.Analysis.MaxFileReadSize = 1000
+	config.AppConfig.Analysis.MaxFileRetryAttempts = 2
+
+	// Each upload is extracted to a new temporary directory
+	analyze := func() string {
+		projectPath := t.TempDir()
+		if err := os.WriteFile(filepath.Join(projectPath, "main.go"), []byte("package main\n\nfunc main() { println(\"hi\") }\n"), 0644); err != nil {
+			t.Fatalf("Failed to create main.go: %v", err)
+		}
+		kb := NewKnowledgeBase(projectPath)
+		engine := &AnalysisEngine{kb: kb, ollamaClient: client, request: AnalyzeRequest{ProjectPath: projectPath, Question: "What does it do?"}, fileResolver: NewFileResolver(kb.ProjectPath, kb)}
+		answer, err := engine.RunAnalysis()
+		if err != nil {
+			t.Fatalf("RunAnalysis() returned an error: %v", err)
+		}
+		return answer
+	}
+
+	first := analyze()
+	sent := requests.Load()
+	// A restart loses the in-memory responses: the second run must be served from the disk cache
+	ollamaResponses = newResponseCache()
+	if second := analyze(); second != first {
+		t.Errorf("expected the same answer twice, got %q and %q", first, second)
+	}
+	if requests.Load() != sent {
+		t.Errorf("expected the second upload to be answered from the cache, got %d new requests", requests.Load()-sent)
+	}
+}
+
+func TestExtractPathFromArgs(t *testing.T) {
+	testCases := map[string]string{
+		"main.go":                               "main.go",
+		`"path/to/my file.go"`:                  "path/to/my file.go",
+		"`src/app.js` (entry point)":            "src/app.js",
+		"config/config.go to see the options":   "config/config.go",
+		"Makefile":                              "Makefile",
+		"Dockerfile for the build":              "Dockerfile",
+		"main.go.":                              "main.go",
+		"the entry point (cmd/server/main.go).": "cmd/server/main.go",
+		"main.go, then the handlers":            "main.go",
+		"foo@bar.go is not a path, app.py is":   "app.py",
+	}
+	for args, expected := range testCases {
+		if actual := extractPathFromArgs(args); actual != expected {
+			t.Errorf("extractPathFromArgs(%q): expected %q, got %q", args, expected, actual)
+		}
+	}
+}
+
+func TestFirstQuoted(t *testing.T) {
+	// firstQuoted must match what the former "[`'\"]([^`'\"]+)[`'\"]" regex captured
+	reference := regexp.MustCompile("[`'\"]([^`'\"]+)[`'\"]")
+	for _, args := range []string{"`a.go`", "'' \"b.go\"", "\"'c.go'", "x 'y", "no quotes", "``", "\"\"x.go'", "`src/app.js` (entry)"} {
+		got, ok := firstQuoted(args)
+		want := reference.FindStringSubmatch(args)
+		if ok != (want != nil) || (ok && got != want[1]) {
+			t.Errorf("firstQuoted(%q) = %q, %v; want %v", args, got, ok, want)
+		}
+	}
+}
+
+func TestFirstBarePath(t *testing.T) {
+	// firstBarePath must match what the former bare path regex captured
+	reference := regexp.MustCompile("(?:^|[\\s(\\[,;])([\\w./-]+\\.\\w+)(?:[\\s'\"`)\\],;:.]|$)")
+	for _, args := range []string{
+		"main.go", "main.go.", "see main.go, then", "foo@bar.go is not a path, app.py is", "(cmd/main.go)",
+		"a.b.c", "a.b@", "a.b.@", ".go", "x. y.z", "v1.2-beta/notes", "path/to/file.tar.gz:", "[a.go]x",
+		"no path here", "dir/.env", "a-b.c_d", "é.go", "a.go/b", "a.", "",
+	} {
+		got, ok := firstBarePath(args)
+		want := reference.FindStringSubmatch(args)
+		if ok != (want != nil) || (ok && got != want[1]) {
+			t.Errorf("firstBarePath(%q) = %q, %v; want %v", args, got, ok, want)
+		}
+	}
+}
+
+func TestParsePlanSearchCode(t *testing.T) {
+	actual := parsePlan("1. SEARCH_CODE \"handleRequest\"\n2. FINISH")
+	expected := []string{`SEARCH_CODE "handleRequest"`, "FINISH"}
+	if !reflect.DeepEqual(actual, expected) {
+		t.Errorf("expected: %v, got: %v", expected, actual)
+	}
+}
+
+func TestParseSearchArgs(t *testing.T) {
+	testCases := []struct {
+		args, term, dir string
+	}{
+		{`"handleRequest"`, "handleRequest", ""},
+		{"handleRequest", "handleRequest", ""},
+		{`"handle request" in src/api`, "handle request", "src/api"},
+		{"`TODO` dans backend", "TODO", "backend"},
+		{"parseConfig in 'config/'", "parseConfig", "config/"},
+		{"  spaced term  ", "spaced term", ""},
+	}
+	for _, tc := range testCases {
+		term, dir := parseSearchArgs(tc.args)
+		if term != tc.term || dir != tc.dir {
+			t.Errorf("parseSearchArgs(%q): expected (%q, %q), got (%q, %q)", tc.args, tc.term, tc.dir, term, dir)
+		}
+	}
+}
+
+func TestParseFileSummaries(t *testing.T) {
+	actual := parseFileSummaries("Sure:\n[\"Entry point.\", \"Helpers.\"]")
+	expected := []string{"Entry point.", "Helpers."}
+	if !reflect.DeepEqual(actual, expected) {
+		t.Errorf("expected: %v, got: %v", expected, actual)
+	}
+	if actual := parseFileSummaries("not json"); actual != nil {
+		t.Errorf("expected nil for a non-JSON response, got %v", actual)
+	}
+}
+
+func TestParsePlanLineIsMemoized(t *testing.T) {
+	line := "1. READ_FILE memo_test.go"
+	if step, ok := parsePlanLine(line); !ok || step != "READ_FILE memo_test.go" {
+		t.Fatalf("unexpected parse result: %q, %v", step, ok)
+	}
+	if _, cached := planLineCache.entries[line]; !cached {
+		t.Error("expected the parsed line to be cached")
+	}
+	if step, ok := parsePlanLine(line); !ok || step != "READ_FILE memo_test.go" {
+		t.Errorf("unexpected cached result: %q, %v", step, ok)
+	}
+}
+
+func TestRecordReadFailure(t *testing.T) {
+	kb := NewKnowledgeBase("/tmp/project")
+
+	recordReadFailure(kb, "flaky.go", errors.New("i/o timeout"))
+	if kb.IsFileAttemptExceeded("flaky.go", 2) {
+		t.Error("expected a transient failure to count as a single attempt")
+	}
+
+	recordReadFailure(kb, "logo.png", fmt.Errorf("read: %w", errBinaryFile))
+	if !kb.IsFileAttemptExceeded("logo.png", 100) {
+		t.Error("expected a binary file to be blocked right away")
+	}
+}
+
+func TestRunPlanStepsGathersBeforeAnalyzing(t *testing.T) {
+	plan := []string{"ANALYZE the entry point", "READ_FILE main.go", "SEARCH_CODE handler", "ANALYZE the handlers"}
+
+	var mu sync.Mutex
+	var order []string
+	runPlanSteps(plan, func(stepIndex int, step planStep) {
+		if plan[stepIndex] != step.Text {
+			t.Errorf("step %d: expected %q, got %q", stepIndex, plan[stepIndex], step.Text)
+		}
+		mu.Lock()
+		order = append(order, step.Action)
+		mu.Unlock()
+	})
+
+	if len(order) != len(plan) {
+		t.Fatalf("expected %d steps to run, got %v", len(plan), order)
+	}
+	for _, action := range order[:2] {
+		if action == "ANALYZE" {
+			t.Errorf("expected READ_FILE and SEARCH_CODE to run before ANALYZE, got %v", order)
+		}
+	}
+}
+
+func TestGetContextSummaryConcurrentWithWrites(t *testing.T) {
+	kb := NewKnowledgeBase("/tmp/project")
+	var wg sync.WaitGroup
+	for i := 0; i < 8; i++ {
+		wg.Add(2)
+		go func(i int) {
+			defer wg.Done()
+			kb.AddFileContent(fmt.Sprintf("/tmp/project/file%d.go", i), "package main")
+			kb.AddNote(fmt.Sprintf("note %d", i))
+		}(i)
+		go func() {
+			defer wg.Done()
+			kb.getContextSummary("question", 8000)
+		}()
+	}
+	wg.Wait()
+	if len(kb.FileContents) != 8 || len(kb.AnalysisNotes) != 8 {
+		t.Errorf("expected 8 files and 8 notes, got %d and %d", len(kb.FileContents), len(kb.AnalysisNotes))
+	}
+}
+
+func TestReadKeyProjectFiles(t *testing.T) {
+	kb := setupKnowledgeBase(t)
+	config.AppConfig.Analysis.MaxFileReadSize = 1000
+	os.WriteFile(filepath.Join(kb.ProjectPath, "package.json"), []byte(`{"name": "app"}`), 0644)
+	os.WriteFile(filepath.Join(kb.ProjectPath, "go.mod"), []byte("module app"), 0644)
+	kb.AddDependencyFile("npm", "package.json")
+	kb.AddDependencyFile("go", "go.mod")
+	kb.AddDependencyFile("composer", "composer.json")
+
+	files := readKeyProjectFiles(kb)
+	expected := []keyFile{{Path: "go.mod", Content: "module app"}, {Path: "package.json", Content: `{"name": "app"}`}}
+	if !reflect.DeepEqual(files, expected) {
+		t.Errorf("expected %v, got %v", expected, files)
+	}
+	if _, ok := kb.FileContents["go.mod"]; !ok {
+		t.Error("readKeyProjectFiles() should record the files it read")
+	}
+	if len(kb.AnalysisNotes) != 1 || !strings.Contains(kb.AnalysisNotes[0], "composer.json") {
+		t.Errorf("expected a note about the missing composer.json, got %v", kb.AnalysisNotes)
+	}
+}
+
+func TestExplorationProgress(t *testing.T) {
+	testCases := []struct {
+		gains []int
+		stop  bool
+	}{
+		{[]int{0, 0}, false},
+		{[]int{3, 0, 0}, true},
+		{[]int{0, 2, 0}, true},
+		{[]int{0, 2, 1}, false},
+		{[]int{4, 1, 0, 1}, false},
+		{[]int{4, 1, 0, 0}, true},
+	}
+	for _, tc := range testCases {
+		var progress explorationProgress
+		stop := false
+		for _, gain := range tc.gains {
+			stop = progress.record(gain)
+		}
+		if stop != tc.stop {
+			t.Errorf("record(%v) = %v, want %v", tc.gains, stop, tc.stop)
+		}
+	}
+}
+
+func TestSplitFinish(t *testing.T) {
+	testCases := []struct {
+		plan   []string
+		steps  []string
+		finish bool
+	}{
+		{nil, nil, false},
+		{[]string{"FINISH"}, []string{}, true},
+		{[]string{"READ_FILE main.go", "FINISH"}, []string{"READ_FILE main.go"}, true},
+		{[]string{"READ_FILE main.go", "ANALYZE main"}, []string{"READ_FILE main.go", "ANALYZE main"}, false},
+	}
+	for _, tc := range testCases {
+		steps, finish := splitFinish(tc.plan)
+		if len(steps) != len(tc.steps) || (len(steps) > 0 && !reflect.DeepEqual(steps, tc.steps)) || finish != tc.finish {
+			t.Errorf("splitFinish(%v) = %v, %v; want %v, %v", tc.plan, steps, finish, tc.steps, tc.finish)
+		}
+	}
+}
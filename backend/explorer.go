@@ -1,20 +1,33 @@
 package main
 
 import (
+	"bytes"
 	"debugagent/config"
+	"errors"
 	"fmt"
-	"io/ioutil"
+	"io"
 	"os"
 	"path/filepath"
+	"strconv"
 	"strings"
+	"sync"
+	"unicode/utf8"
 
 	"github.com/sirupsen/logrus"
 )
 
+// Erreurs de lecture définitives: relire le même fichier échouerait de la même façon.
 var (
-	ignoreDirs       map[string]bool
-	ignoreExtensions map[string]bool
-	ignorePrefixes   []string
+	errNotAFile   = errors.New("pas un fichier")
+	errBinaryFile = errors.New("fichier binaire")
+)
+
+var (
+	ignoreDirs         map[string]bool
+	ignoreExtensions   map[string]bool
+	ignorePrefixes     []string
+	ignorePrefixStarts [256]bool // Premiers octets des préfixes ignorés, voir isIgnoredName
+	explorerConfigOnce sync.Once
 )
 
 func initializeExplorerConfig() {
@@ -23,113 +36,293 @@ func initializeExplorerConfig() {
 	for _, dir := range cfg.IgnoreDirs {
 		ignoreDirs[dir] = true
 	}
+	// Les extensions sont stockées en minuscules, comme celles comparées par isIgnoredExtension
 	ignoreExtensions = make(map[string]bool)
 	for _, ext := range cfg.IgnoreExtensions {
-		ignoreExtensions[ext] = true
+		ignoreExtensions[strings.ToLower(ext)] = true
+	}
+	// Un préfixe vide exclurait tout le projet: il est écarté
+	ignorePrefixes = nil
+	ignorePrefixStarts = [256]bool{}
+	for _, prefix := range cfg.IgnorePrefixes {
+		if prefix != "" {
+			ignorePrefixes = append(ignorePrefixes, prefix)
+			ignorePrefixStarts[prefix[0]] = true
+		}
 	}
-	ignorePrefixes = cfg.IgnorePrefixes
 }
 
 // getDirectoryStructure récupère la structure récursivement, en filtrant et limitant la profondeur.
 func getDirectoryStructure(rootDir string, maxDepth int, currentDepth int) (map[string]interface{}, error) {
-	if ignoreDirs == nil {
-		initializeExplorerConfig()
-	}
+	// Les ensembles d'exclusion sont construits une seule fois, et non à chaque appel récursif
+	explorerConfigOnce.Do(initializeExplorerConfig)
+	return scanDirectory(filepath.Clean(rootDir), maxDepth, currentDepth)
+}
+
+// maxScanWorkers est le nombre de sous-dossiers listés en parallèle par scanDirectory.
+const maxScanWorkers = 8
+
+// scanSlots borne les listings parallèles de scanDirectory, tous niveaux confondus.
+var scanSlots = make(chan struct{}, maxScanWorkers)
+
+// scanDirectory parcourt un dossier propre (voir filepath.Clean) et ses sous-dossiers avec les
+// ensembles d'exclusion déjà initialisés.
+// Les sous-dossiers sont parcourus en parallèle tant qu'un emplacement est libre, et sinon
+// directement: un parcours n'attend jamais un emplacement qu'il pourrait lui-même occuper.
+func scanDirectory(rootDir string, maxDepth int, currentDepth int) (map[string]interface{}, error) {
 	structure := make(map[string]interface{})
 	if currentDepth >= maxDepth {
 		structure["..."] = fmt.Sprintf("(limite de profondeur %d atteinte)", maxDepth)
 		return structure, nil
 	}
 
-	files, err := ioutil.ReadDir(rootDir)
+	// ReadDir ne fait pas de stat par entrée: le type vient directement du listing du dossier
+	entries, err := readDirUnsorted(rootDir)
 	if err != nil {
 		return nil, fmt.Errorf("impossible de lister le dossier '%s': %w", rootDir, err)
 	}
 
-	for _, file := range files {
-		fileName := file.Name()
+	// Les chemins des sous-dossiers sont déjà propres: une concaténation suffit, sans filepath.Join
+	dirPrefix := rootDir
+	if !strings.HasSuffix(dirPrefix, string(filepath.Separator)) {
+		dirPrefix += string(filepath.Separator)
+	}
+
+	var mu sync.Mutex
+	var wg sync.WaitGroup
+	set := func(name string, value interface{}) {
+		mu.Lock()
+		structure[name] = value
+		mu.Unlock()
+	}
+
+	for _, entry := range entries {
+		fileName := entry.Name()
 
 		// Ignorer les répertoires et préfixes
-		if ignoreDirs[fileName] {
-			continue
-		}
-		isIgnoredPrefix := false
-		for _, prefix := range ignorePrefixes {
-			if strings.HasPrefix(fileName, prefix) {
-				isIgnoredPrefix = true
-				break
-			}
-		}
-		if isIgnoredPrefix {
+		if isIgnoredName(fileName) {
 			continue
 		}
 
-		if file.IsDir() {
-			subStructure, err := getDirectoryStructure(filepath.Join(rootDir, fileName), maxDepth, currentDepth+1)
-			if err != nil {
-				structure[fileName+"/"] = fmt.Sprintf("Erreur d'accès: %v", err)
-			} else {
-				structure[fileName+"/"] = subStructure
+		if entry.IsDir() {
+			subDir := dirPrefix + fileName
+			select {
+			case scanSlots <- struct{}{}:
+				wg.Add(1)
+				go func(subDir, name string) {
+					defer wg.Done()
+					defer func() { <-scanSlots }()
+					set(name, subdirectoryStructure(subDir, maxDepth, currentDepth+1))
+				}(subDir, fileName+"/")
+			default:
+				set(fileName+"/", subdirectoryStructure(subDir, maxDepth, currentDepth+1))
 			}
 		} else {
 			// Ignorer les extensions
-			ext := strings.ToLower(filepath.Ext(fileName))
-			if ignoreExtensions[ext] {
+			if isIgnoredExtension(fileName) {
+				continue
+			}
+			// Un seul stat, uniquement pour les fichiers conservés
+			info, err := entry.Info()
+			if err != nil {
+				set(fileName, fmt.Sprintf("Erreur d'accès: %v", err))
 				continue
 			}
-			structure[fileName] = fmt.Sprintf("%d bytes", file.Size())
+			set(fileName, strconv.FormatInt(info.Size(), 10)+" bytes")
 		}
 	}
+	wg.Wait()
 	return structure, nil
 }
 
-// readFileContent lit le contenu d'un fichier avec gestion d'erreurs et de taille.
-func readFileContent(absFilepath string) (string, error) {
-	fileInfo, err := os.Stat(absFilepath)
+// subdirectoryStructure renvoie la structure d'un sous-dossier, ou l'erreur qui empêche de le lister.
+func subdirectoryStructure(dir string, maxDepth int, depth int) interface{} {
+	subStructure, err := scanDirectory(dir, maxDepth, depth)
 	if err != nil {
-		return "", fmt.Errorf("fichier non trouvé ou erreur de stat: %w", err)
+		return fmt.Sprintf("Erreur d'accès: %v", err)
+	}
+	return subStructure
+}
+
+// readDirUnsorted liste un dossier comme os.ReadDir, sans trier les entrées par nom: la
+// structure construite est une map, l'ordre du listing n'a pas d'importance.
+func readDirUnsorted(dir string) ([]os.DirEntry, error) {
+	f, err := os.Open(dir)
+	if err != nil {
+		return nil, err
 	}
+	defer f.Close()
+	return f.ReadDir(-1)
+}
 
-	if fileInfo.IsDir() {
-		return "", fmt.Errorf("le chemin '%s' est un dossier, pas un fichier", absFilepath)
+// isIgnoredName indique si un fichier ou dossier est exclu par les dossiers ou préfixes ignorés.
+// La plupart des noms ne commencent par aucun préfixe ignoré: un seul octet suffit à l'établir.
+func isIgnoredName(name string) bool {
+	if ignoreDirs[name] {
+		return true
 	}
+	if name == "" || !ignorePrefixStarts[name[0]] {
+		return false
+	}
+	for _, prefix := range ignorePrefixes {
+		if strings.HasPrefix(name, prefix) {
+			return true
+		}
+	}
+	return false
+}
+
+// maxLoweredExtension est la longueur d'extension mise en minuscules dans un tampon sur la pile.
+const maxLoweredExtension = 32
 
-	// Vérifier si le fichier est binaire
-	buffer := make([]byte, 1024)
+// isIgnoredExtension indique si l'extension d'un fichier fait partie des extensions ignorées.
+func isIgnoredExtension(name string) bool {
+	return hasExtensionIn(ignoreExtensions, name)
+}
+
+// isKnownTextFile indique si l'extension d'un fichier garantit un contenu texte, ce qui dispense
+// de la détection binaire.
+func isKnownTextFile(name string) bool {
+	return hasExtensionIn(knownTextExtensions, name)
+}
+
+// hasExtensionIn indique si l'extension d'un fichier, sans tenir compte de la casse, fait partie
+// d'un ensemble d'extensions en minuscules. Appelée pour chaque fichier du projet: l'extension est
+// mise en minuscules dans un tampon local et la recherche se fait sans allouer de chaîne.
+func hasExtensionIn(extensions map[string]bool, name string) bool {
+	ext := filepath.Ext(name)
+	if ext == "" {
+		return false
+	}
+	if len(ext) > maxLoweredExtension {
+		return extensions[strings.ToLower(ext)]
+	}
+	var lower [maxLoweredExtension]byte
+	for i := 0; i < len(ext); i++ {
+		c := ext[i]
+		if c >= utf8.RuneSelf {
+			return extensions[strings.ToLower(ext)]
+		}
+		if 'A' <= c && c <= 'Z' {
+			c += 'a' - 'A'
+		}
+		lower[i] = c
+	}
+	return extensions[string(lower[:len(ext)])]
+}
+
+// findRootReadme renvoie le nom du README à la racine d'une structure déjà scannée, en
+// privilégiant un fichier Markdown. Renvoie une chaîne vide si aucun README n'est présent.
+func findRootReadme(structure map[string]interface{}) string {
+	best := ""
+	for name := range structure {
+		if strings.HasSuffix(name, "/") || !strings.HasPrefix(strings.ToLower(name), "readme") {
+			continue
+		}
+		if best == "" || readmeRank(name) < readmeRank(best) || (readmeRank(name) == readmeRank(best) && name < best) {
+			best = name
+		}
+	}
+	return best
+}
+
+// readmeRank classe les README: Markdown d'abord, puis les autres formats.
+func readmeRank(name string) int {
+	if strings.EqualFold(filepath.Ext(name), ".md") {
+		return 0
+	}
+	return 1
+}
+
+// knownTextExtensions liste les extensions pour lesquelles la détection binaire est inutile.
+var knownTextExtensions = map[string]bool{
+	".go": true, ".py": true, ".js": true, ".jsx": true, ".ts": true, ".tsx": true,
+	".md": true, ".txt": true, ".json": true, ".yaml": true, ".yml": true, ".toml": true,
+	".ini": true, ".cfg": true, ".php": true, ".rs": true, ".java": true, ".c": true,
+	".cpp": true, ".h": true, ".hpp": true, ".cs": true, ".rb": true, ".sh": true,
+	".html": true, ".css": true, ".xml": true, ".sql": true, ".scss": true, ".vue": true,
+	".kt": true, ".swift": true, ".rst": true, ".mod": true,
+}
+
+// binarySniffLength est la longueur du début de fichier examinée par looksBinary.
+const binarySniffLength = 1024
+
+// looksBinary indique si le début du contenu contient un octet nul.
+func looksBinary(content []byte) bool {
+	return bytes.IndexByte(content[:min(binarySniffLength, len(content))], 0) != -1
+}
+
+// readFileContent lit le contenu d'un fichier avec gestion d'erreurs et de taille. Le fichier est
+// ouvert une seule fois.
+func readFileContent(absFilepath string) (string, error) {
 	file, err := os.Open(absFilepath)
 	if err != nil {
-		return "", fmt.Errorf("impossible d'ouvrir le fichier pour vérification binaire: %w", err)
+		return "", fmt.Errorf("fichier non trouvé ou erreur de stat: %w", err)
+	}
+	defer file.Close()
+
+	fileInfo, err := file.Stat()
+	if err != nil {
+		return "", fmt.Errorf("fichier non trouvé ou erreur de stat: %w", err)
+	}
+	if fileInfo.IsDir() {
+		return "", fmt.Errorf("le chemin '%s' est un dossier: %w", absFilepath, errNotAFile)
 	}
-	n, _ := file.Read(buffer)
-	file.Close()
 
-	for i := 0; i < n; i++ {
-		if buffer[i] == 0 {
-			return "", fmt.Errorf("le fichier '%s' semble être binaire", filepath.Base(absFilepath))
+	return readOpenedFile(file, filepath.Base(absFilepath), fileInfo.Size(), int64(config.AppConfig.Analysis.MaxFileReadSize))
+}
+
+// truncatedFileMarker sépare le début et la fin d'un fichier lu partiellement.
+const truncatedFileMarker = "\n\n[... content truncated (file too large) ...]\n\n"
+
+// readOpenedFile lit un fichier déjà ouvert, partiellement s'il dépasse maxSize, et rejette les
+// fichiers binaires. Le contenu est copié directement dans la chaîne renvoyée, sans tampon
+// intermédiaire de la taille du fichier.
+func readOpenedFile(file *os.File, fileName string, size, maxSize int64) (string, error) {
+	// Le début du fichier suffit à écarter un fichier binaire, avant toute lecture complète
+	if !isKnownTextFile(fileName) {
+		var sniff [binarySniffLength]byte
+		n, err := file.ReadAt(sniff[:min(int64(len(sniff)), size)], 0)
+		if err != nil && err != io.EOF {
+			return "", fmt.Errorf("error reading file: %w", err)
+		}
+		if looksBinary(sniff[:n]) {
+			return "", fmt.Errorf("le fichier '%s' semble être binaire: %w", fileName, errBinaryFile)
 		}
 	}
 
 	// Lire le contenu du fichier
-	size := fileInfo.Size()
-	maxSize := int64(config.AppConfig.Analysis.MaxFileReadSize)
 	if size > maxSize {
-		logrus.Warnf("File '%s' (%d bytes) is too large. Reading partially.", filepath.Base(absFilepath), size)
-		content, err := os.ReadFile(absFilepath)
+		logrus.Warnf("File '%s' (%d bytes) is too large. Reading partially.", fileName, size)
+		content, err := readHeadAndTail(file, size, maxSize/2)
 		if err != nil {
 			return "", fmt.Errorf("error reading partial file: %w", err)
 		}
-
-		startContent := string(content[:int(maxSize)/2])
-		endContent := string(content[len(content)-(int(maxSize)/2):])
-
-		return fmt.Sprintf("%s\n\n[... content truncated (file too large) ...]\n\n%s", startContent, endContent), nil
+		return content, nil
 	}
 
-	logrus.Infof("Reading complete file '%s' (%d bytes).", filepath.Base(absFilepath), size)
-	content, err := os.ReadFile(absFilepath)
-	if err != nil {
+	var content strings.Builder
+	content.Grow(int(size))
+	// Le fichier a pu raccourcir depuis le stat: seuls les octets présents sont copiés
+	if _, err := io.Copy(&content, io.NewSectionReader(file, 0, size)); err != nil {
 		return "", fmt.Errorf("error reading complete file: %w", err)
 	}
+	logrus.Debugf("Reading complete file '%s' (%d bytes).", fileName, size)
 
-	return string(content), nil
+	return content.String(), nil
+}
+
+// readHeadAndTail lit uniquement les premiers et derniers octets d'un fichier, sans charger le
+// reste, et les renvoie séparés par truncatedFileMarker.
+func readHeadAndTail(file *os.File, size, partSize int64) (string, error) {
+	var content strings.Builder
+	content.Grow(int(2*partSize) + len(truncatedFileMarker))
+	if _, err := io.Copy(&content, io.NewSectionReader(file, 0, partSize)); err != nil {
+		return "", err
+	}
+	content.WriteString(truncatedFileMarker)
+	if _, err := io.Copy(&content, io.NewSectionReader(file, size-partSize, partSize)); err != nil {
+		return "", err
+	}
+	return content.String(), nil
 }
@@ -0,0 +1,209 @@
+package main
+
+import (
+	"debugagent/config"
+	"errors"
+	"fmt"
+	"os"
+	"path/filepath"
+	"strings"
+	"testing"
+)
+
+func setupExplorerTest(t *testing.T) string {
+	projectPath, err := os.MkdirTemp("", "explorer-test")
+	if err != nil {
+		t.Fatalf("Failed to create temp dir: %v", err)
+	}
+	t.Cleanup(func() { os.RemoveAll(projectPath) })
+
+	config.AppConfig = &config.Config{
+		Analysis: config.AnalysisConfig{
+			MaxFileReadSize: 1000,
+		},
+		Explorer: config.ExplorerConfig{
+			IgnoreDirs:       []string{"node_modules"},
+			IgnorePrefixes:   []string{"."},
+			IgnoreExtensions: []string{".LOG"},
+		},
+	}
+	initializeExplorerConfig()
+
+	files := map[string]string{
+		"main.go":                 "package main",
+		"debug.log":               "ignored",
+		".env":                    "ignored",
+		"src/app.js":              "console.log('hi')",
+		"node_modules/dep/dep.js": "ignored",
+	}
+	for name, content := range files {
+		path := filepath.Join(projectPath, name)
+		if err := os.MkdirAll(filepath.Dir(path), 0755); err != nil {
+			t.Fatalf("Failed to create dir for %s: %v", name, err)
+		}
+		if err := os.WriteFile(path, []byte(content), 0644); err != nil {
+			t.Fatalf("Failed to create test file %s: %v", name, err)
+		}
+	}
+	return projectPath
+}
+
+func TestGetDirectoryStructure(t *testing.T) {
+	projectPath := setupExplorerTest(t)
+
+	structure, err := getDirectoryStructure(projectPath, 3, 0)
+	if err != nil {
+		t.Fatalf("getDirectoryStructure() returned an error: %v", err)
+	}
+
+	if got := structure["main.go"]; got != "12 bytes" {
+		t.Errorf("expected main.go to be '12 bytes', got %v", got)
+	}
+	for _, ignored := range []string{"debug.log", ".env", "node_modules/"} {
+		if _, ok := structure[ignored]; ok {
+			t.Errorf("expected %s to be ignored", ignored)
+		}
+	}
+	src, ok := structure["src/"].(map[string]interface{})
+	if !ok {
+		t.Fatalf("expected src/ to be a nested structure, got %v", structure["src/"])
+	}
+	if _, ok := src["app.js"]; !ok {
+		t.Error("expected src/app.js to be listed")
+	}
+}
+
+func TestGetDirectoryStructureManySubdirectories(t *testing.T) {
+	projectPath := setupExplorerTest(t)
+	count := 3 * maxScanWorkers
+	for i := 0; i < count; i++ {
+		dir := filepath.Join(projectPath, "pkg", fmt.Sprintf("mod%d", i), "sub")
+		if err := os.MkdirAll(dir, 0755); err != nil {
+			t.Fatalf("Failed to create %s: %v", dir, err)
+		}
+		if err := os.WriteFile(filepath.Join(dir, "file.go"), []byte("package sub"), 0644); err != nil {
+			t.Fatalf("Failed to create file in %s: %v", dir, err)
+		}
+	}
+
+	structure, err := getDirectoryStructure(projectPath, 4, 0)
+	if err != nil {
+		t.Fatalf("getDirectoryStructure() returned an error: %v", err)
+	}
+	pkg, ok := structure["pkg/"].(map[string]interface{})
+	if !ok || len(pkg) != count {
+		t.Fatalf("expected %d modules under pkg/, got %v", count, structure["pkg/"])
+	}
+	for i := 0; i < count; i++ {
+		module, _ := pkg[fmt.Sprintf("mod%d/", i)].(map[string]interface{})
+		sub, _ := module["sub/"].(map[string]interface{})
+		if sub["file.go"] != "11 bytes" {
+			t.Errorf("mod%d: expected sub/file.go to be '11 bytes', got %v", i, module)
+		}
+	}
+}
+
+func TestIsIgnoredName(t *testing.T) {
+	setupExplorerTest(t)
+	config.AppConfig.Explorer.IgnorePrefixes = []string{".", "", "tmp_"}
+	initializeExplorerConfig()
+
+	testCases := map[string]bool{
+		"node_modules": true,
+		".git":         true,
+		"tmp_build":    true,
+		"tmp":          false,
+		"src":          false,
+		"":             false,
+	}
+	for name, expected := range testCases {
+		if got := isIgnoredName(name); got != expected {
+			t.Errorf("isIgnoredName(%q) = %v, want %v", name, got, expected)
+		}
+	}
+}
+
+func TestIsIgnoredExtension(t *testing.T) {
+	setupExplorerTest(t)
+	testCases := map[string]bool{
+		"debug.log":  true,
+		"DEBUG.Log":  true,
+		"main.go":    false,
+		"Makefile":   false,
+		"notes.lögg": false,
+		"archive." + strings.Repeat("x", maxLoweredExtension): false,
+	}
+	for name, expected := range testCases {
+		if got := isIgnoredExtension(name); got != expected {
+			t.Errorf("isIgnoredExtension(%q) = %v, want %v", name, got, expected)
+		}
+	}
+	if allocs := testing.AllocsPerRun(100, func() { isIgnoredExtension("Server.LOG") }); allocs != 0 {
+		t.Errorf("isIgnoredExtension() allocated %v times, want 0", allocs)
+	}
+}
+
+func TestIsKnownTextFile(t *testing.T) {
+	for name, expected := range map[string]bool{"main.go": true, "README.MD": true, "App.Vue": true, "image.png": false, "Makefile": false} {
+		if got := isKnownTextFile(name); got != expected {
+			t.Errorf("isKnownTextFile(%q) = %v, want %v", name, got, expected)
+		}
+	}
+}
+
+func TestReadFileContentBinaryDetection(t *testing.T) {
+	projectPath := setupExplorerTest(t)
+
+	binaryPath := filepath.Join(projectPath, "blob.bin")
+	if err := os.WriteFile(binaryPath, []byte{'a', 0, 'b'}, 0644); err != nil {
+		t.Fatalf("Failed to create binary file: %v", err)
+	}
+	if _, err := readFileContent(binaryPath); !errors.Is(err, errBinaryFile) {
+		t.Errorf("expected errBinaryFile for a binary file, got %v", err)
+	}
+	if _, err := readFileContent(filepath.Join(projectPath, "src")); !errors.Is(err, errNotAFile) {
+		t.Errorf("expected errNotAFile for a directory, got %v", err)
+	}
+
+	content, err := readFileContent(filepath.Join(projectPath, "main.go"))
+	if err != nil {
+		t.Fatalf("readFileContent() returned an error: %v", err)
+	}
+	if content != "package main" {
+		t.Errorf("expected 'package main', got %q", content)
+	}
+}
+
+func TestReadFileContentPartialRead(t *testing.T) {
+	projectPath := setupExplorerTest(t)
+
+	largePath := filepath.Join(projectPath, "large.txt")
+	content := strings.Repeat("a", 600) + strings.Repeat("m", 800) + strings.Repeat("z", 600)
+	if err := os.WriteFile(largePath, []byte(content), 0644); err != nil {
+		t.Fatalf("Failed to create large file: %v", err)
+	}
+
+	got, err := readFileContent(largePath)
+	if err != nil {
+		t.Fatalf("readFileContent() returned an error: %v", err)
+	}
+	expected := strings.Repeat("a", 500) + "\n\n[... content truncated (file too large) ...]\n\n" + strings.Repeat("z", 500)
+	if got != expected {
+		t.Errorf("unexpected partial content (%d chars)", len(got))
+	}
+}
+
+func TestFindRootReadme(t *testing.T) {
+	structure := map[string]interface{}{
+		"readme.txt": "10 bytes",
+		"README.md":  "20 bytes",
+		"readme/":    map[string]interface{}{},
+		"main.go":    "30 bytes",
+	}
+	if got := findRootReadme(structure); got != "README.md" {
+		t.Errorf("findRootReadme() = %q, want %q", got, "README.md")
+	}
+	if got := findRootReadme(map[string]interface{}{"main.go": "30 bytes"}); got != "" {
+		t.Errorf("findRootReadme() = %q, want empty string", got)
+	}
+}
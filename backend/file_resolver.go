@@ -5,16 +5,23 @@ import (
 	"fmt"
 	"os"
 	"path/filepath"
+	"sort"
 	"strings"
+	"sync"
 
 	"github.com/sirupsen/logrus"
 )
 
 // FileResolver handles intelligent file resolution and fallback strategies.
 type FileResolver struct {
-	projectPath     string
-	kb              *KnowledgeBase
+	projectPath      string
+	projectPrefix    string // projectPath with a trailing separator, for containment checks
+	kb               *KnowledgeBase
 	maxRetryAttempts int
+
+	existsMu   sync.Mutex
+	exists     map[string]bool // fileExists results by full path, to stat each candidate once
+	rootListed bool            // exists holds every file at the project root, see listRootFiles
 }
 
 // DependencyFileMapping defines fallback strategies for different file types.
@@ -46,10 +53,18 @@ func NewFileResolver(projectPath string, kb *KnowledgeBase) *FileResolver {
 		maxRetryAttempts = config.AppConfig.Analysis.MaxFileRetryAttempts
 	}
 
+	// Work on an absolute path so the containment check is purely lexical. An absolute path is
+	// only cleaned here, without querying the working directory.
+	if absPath, err := filepath.Abs(projectPath); err == nil {
+		projectPath = absPath
+	}
+
 	return &FileResolver{
 		projectPath:      projectPath,
+		projectPrefix:    projectPath + string(filepath.Separator),
 		kb:               kb,
 		maxRetryAttempts: maxRetryAttempts,
+		exists:           make(map[string]bool),
 	}
 }
 
@@ -62,11 +77,22 @@ func (fr *FileResolver) ResolveFile(requestedFile string) (string, error) {
 
 	// First, try the exact requested file
 	fullPath := filepath.Join(fr.projectPath, requestedFile)
+	if !fr.isInProject(fullPath) {
+		fr.kb.AddFailedFileAttempt(requestedFile)
+		return "", fmt.Errorf("file '%s' is outside of the project directory", requestedFile)
+	}
 	if fr.fileExists(fullPath) {
 		fr.kb.AddAvailableFile(requestedFile)
 		return requestedFile, nil
 	}
 
+	// The model often gets the case of a path wrong: look it up in the scanned structure
+	if match, ok := fr.kb.findPathIgnoreCase(requestedFile); ok && fr.fileExists(filepath.Join(fr.projectPath, match)) {
+		logrus.Infof("Found '%s' for '%s' (case differs)", match, requestedFile)
+		fr.kb.AddAvailableFile(match)
+		return match, nil
+	}
+
 	// If exact file doesn't exist, try to find alternatives
 	alternatives := fr.findAlternatives(requestedFile)
 	for _, alt := range alternatives {
@@ -128,11 +154,13 @@ func (fr *FileResolver) findAlternatives(requestedFile string) []string {
 func (fr *FileResolver) DiscoverProjectFiles() {
 	logrus.Info("Discovering available project files...")
 
+	// Every candidate lives at the project root: list it once instead of checking each name
+	rootFiles := fr.listRootFiles()
+
 	// Check for dependency files
 	for depType, files := range DependencyFileMapping {
-		for _, file := range files {
-			fullPath := filepath.Join(fr.projectPath, file)
-			if fr.fileExists(fullPath) {
+		for _, pattern := range files {
+			for _, file := range fr.matchRootFiles(rootFiles, pattern) {
 				fr.kb.AddDependencyFile(depType, file)
 				fr.kb.AddAvailableFile(file)
 			}
@@ -141,8 +169,7 @@ func (fr *FileResolver) DiscoverProjectFiles() {
 
 	// Check for common config files
 	for _, file := range CommonConfigFiles {
-		fullPath := filepath.Join(fr.projectPath, file)
-		if fr.fileExists(fullPath) {
+		if len(fr.matchRootFiles(rootFiles, file)) > 0 {
 			fr.kb.AddAvailableFile(file)
 		}
 	}
@@ -150,13 +177,86 @@ func (fr *FileResolver) DiscoverProjectFiles() {
 	logrus.Infof("File discovery complete. Found %d available files", len(fr.kb.AvailableFiles))
 }
 
-// fileExists checks if a file exists and is readable.
-func (fr *FileResolver) fileExists(filePath string) bool {
-	info, err := os.Stat(filePath)
+// listRootFiles returns the names of the files at the project root, from a single directory read,
+// and records them in the fileExists cache, which then answers for any other root path without a
+// stat. It returns nil if the root cannot be listed.
+func (fr *FileResolver) listRootFiles() []string {
+	entries, err := readDirUnsorted(fr.projectPath)
 	if err != nil {
+		logrus.Warnf("Could not list project root %s: %v", fr.projectPath, err)
+		return nil
+	}
+
+	names := make([]string, 0, len(entries))
+	for _, entry := range entries {
+		name := entry.Name()
+		// A symlink may point to a directory: only those need a stat
+		if entry.Type()&os.ModeSymlink != 0 {
+			if !fr.fileExists(filepath.Join(fr.projectPath, name)) {
+				continue
+			}
+		} else if entry.IsDir() {
+			continue
+		}
+		names = append(names, name)
+	}
+	sort.Strings(names)
+
+	fr.existsMu.Lock()
+	for _, name := range names {
+		fr.exists[filepath.Join(fr.projectPath, name)] = true
+	}
+	fr.rootListed = true
+	fr.existsMu.Unlock()
+	return names
+}
+
+// matchRootFiles returns the root files matching a candidate name, which may be a glob such as
+// "*.csproj". Without a root listing, it falls back to checking the name directly.
+func (fr *FileResolver) matchRootFiles(rootFiles []string, pattern string) []string {
+	if rootFiles == nil {
+		if fr.fileExists(filepath.Join(fr.projectPath, pattern)) {
+			return []string{pattern}
+		}
+		return nil
+	}
+
+	var matches []string
+	for _, name := range rootFiles {
+		if matched, _ := filepath.Match(pattern, name); matched {
+			matches = append(matches, name)
+		}
+	}
+	return matches
+}
+
+// isInProject reports whether a cleaned absolute path lies inside the project directory.
+func (fr *FileResolver) isInProject(fullPath string) bool {
+	return strings.HasPrefix(fullPath, fr.projectPrefix)
+}
+
+// isAtRoot reports whether a cleaned absolute path names an entry directly under the project
+// root. Like isInProject, it compares strings instead of splitting the path.
+func (fr *FileResolver) isAtRoot(fullPath string) bool {
+	return fr.isInProject(fullPath) && !strings.ContainsRune(fullPath[len(fr.projectPrefix):], filepath.Separator)
+}
+
+// fileExists checks if a file exists and is readable. Results are memoized: the same candidates
+// are checked by discovery, by every resolution and by the alternative lookups.
+func (fr *FileResolver) fileExists(filePath string) bool {
+	fr.existsMu.Lock()
+	defer fr.existsMu.Unlock()
+	if exists, ok := fr.exists[filePath]; ok {
+		return exists
+	}
+	// Every file at the root is already cached: a root path missing from the cache does not exist
+	if fr.rootListed && fr.isAtRoot(filePath) {
 		return false
 	}
-	return !info.IsDir()
+	info, err := os.Stat(filePath)
+	exists := err == nil && !info.IsDir()
+	fr.exists[filePath] = exists
+	return exists
 }
 
 // removeDuplicates removes duplicate strings from a slice.
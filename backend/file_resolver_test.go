@@ -4,6 +4,7 @@ import (
 	"debugagent/config"
 	"os"
 	"path/filepath"
+	"slices"
 	"testing"
 )
 
@@ -128,6 +129,41 @@ func TestDiscoverProjectFiles(t *testing.T) {
 	}
 }
 
+func TestDiscoverProjectFilesMatchesPatterns(t *testing.T) {
+	resolver, tempDir := setupFileResolverTest(t)
+	for _, name := range []string{"App.csproj", "Makefile"} {
+		if err := os.WriteFile(filepath.Join(tempDir, name), []byte("test content"), 0644); err != nil {
+			t.Fatalf("Failed to create test file %s: %v", name, err)
+		}
+	}
+	if err := os.Mkdir(filepath.Join(tempDir, "Gemfile"), 0755); err != nil {
+		t.Fatalf("Failed to create directory: %v", err)
+	}
+
+	resolver.DiscoverProjectFiles()
+
+	if got := resolver.kb.DependencyFiles["dotnet"]; got != "App.csproj" {
+		t.Errorf("Expected the *.csproj pattern to find App.csproj, got %q", got)
+	}
+	if _, exists := resolver.kb.DependencyFiles["ruby"]; exists {
+		t.Error("Expected a directory named Gemfile not to count as a dependency file")
+	}
+	if !slices.Contains(resolver.kb.AvailableFiles, "Makefile") {
+		t.Errorf("Expected Makefile to be available, got %v", resolver.kb.AvailableFiles)
+	}
+	if !resolver.fileExists(filepath.Join(tempDir, "go.mod")) {
+		t.Error("Expected the root listing to be reused by fileExists")
+	}
+
+	// Root paths are answered from the listing, without touching the filesystem again
+	if err := os.WriteFile(filepath.Join(tempDir, "Cargo.toml"), []byte("test content"), 0644); err != nil {
+		t.Fatalf("Failed to create test file: %v", err)
+	}
+	if resolver.fileExists(filepath.Join(tempDir, "Cargo.toml")) {
+		t.Error("Expected fileExists to answer root paths from the listing")
+	}
+}
+
 func TestGetAvailableAlternatives(t *testing.T) {
 	resolver, _ := setupFileResolverTest(t)
 
@@ -148,3 +184,67 @@ func TestGetAvailableAlternatives(t *testing.T) {
 		t.Error("Expected composer.json to be in alternatives")
 	}
 }
+
+func TestResolveFile_OutsideProject(t *testing.T) {
+	resolver, _ := setupFileResolverTest(t)
+
+	// Paths escaping the project directory must be rejected
+	if _, err := resolver.ResolveFile("../../etc/passwd"); err == nil {
+		t.Error("Expected error for a path outside the project, got nil")
+	}
+}
+
+func TestIsAtRoot(t *testing.T) {
+	resolver, tempDir := setupFileResolverTest(t)
+
+	tests := map[string]bool{
+		filepath.Join(tempDir, "go.mod"):              true,
+		filepath.Join(tempDir, "src", "main.go"):      false,
+		tempDir:                                       false,
+		filepath.Join(filepath.Dir(tempDir), "other"): false,
+	}
+	for path, want := range tests {
+		if got := resolver.isAtRoot(path); got != want {
+			t.Errorf("isAtRoot(%q) = %v, want %v", path, got, want)
+		}
+	}
+}
+
+func TestFileExistsIsMemoized(t *testing.T) {
+	resolver, tempDir := setupFileResolverTest(t)
+
+	fullPath := filepath.Join(tempDir, "go.mod")
+	if !resolver.fileExists(fullPath) {
+		t.Fatal("expected go.mod to exist")
+	}
+	if err := os.Remove(fullPath); err != nil {
+		t.Fatalf("Failed to remove go.mod: %v", err)
+	}
+	if !resolver.fileExists(fullPath) {
+		t.Error("expected the first stat result to be reused")
+	}
+	if resolver.fileExists(filepath.Join(tempDir, "missing.txt")) {
+		t.Error("expected missing.txt not to exist")
+	}
+}
+
+func TestResolveFile_CaseInsensitive(t *testing.T) {
+	resolver, tempDir := setupFileResolverTest(t)
+	os.MkdirAll(filepath.Join(tempDir, "src"), 0755)
+	os.WriteFile(filepath.Join(tempDir, "src", "App.js"), []byte("test content"), 0644)
+	resolver.kb.SetProjectStructure(map[string]interface{}{
+		"README.md": "12 bytes",
+		"src/":      map[string]interface{}{"App.js": "12 bytes"},
+	})
+
+	resolved, err := resolver.ResolveFile("SRC/app.JS")
+	if err != nil {
+		t.Fatalf("Expected no error, got: %v", err)
+	}
+	if resolved != "src/App.js" {
+		t.Errorf("Expected 'src/App.js', got: %s", resolved)
+	}
+	if _, err := resolver.ResolveFile("src/missing.js"); err == nil {
+		t.Error("Expected an error for a file absent from the structure")
+	}
+}
@@ -1,29 +1,93 @@
 package main
 
 import (
+	"bytes"
+	"compress/flate"
+	"crypto/sha256"
 	"encoding/json"
 	"fmt"
+	"io"
+	"math"
 	"path/filepath"
+	"sort"
+	"strconv"
 	"strings"
 	"sync"
+	"unicode"
 
 	"github.com/sirupsen/logrus"
 )
 
+const (
+	// maxHistoryItemsInSummary est le nombre d'entrées notes/historique recopiées telles quelles.
+	maxHistoryItemsInSummary = 6
+	// historySummarizeEvery est le nombre de nouvelles entrées anciennes qui déclenche un nouveau résumé.
+	historySummarizeEvery = 10
+	// similarSubjectThreshold est l'indice de Jaccard à partir duquel deux sujets ANALYZE sont
+	// considérés comme identiques.
+	similarSubjectThreshold = 0.75
+	// maxFilesPerSummaryBatch est le nombre maximal de fichiers résumés par une même requête.
+	maxFilesPerSummaryBatch = 8
+	// maxRelevantEntries est le nombre d'entrées anciennes liées à la question qui sont recopiées
+	// dans le résumé, en plus des entrées récentes; maxRelevantEntryLength borne leur longueur.
+	maxRelevantEntries     = 4
+	maxRelevantEntryLength = 400
+	// maxRelevantCandidates borne le nombre d'entrées anciennes examinées pour leur pertinence:
+	// les plus anciennes sont déjà couvertes par HistorySummary.
+	maxRelevantCandidates = 64
+	// maxStructureLength borne la structure du projet recopiée dans les prompts.
+	maxStructureLength = 1800
+	// maxRelPathCacheEntries borne relPaths; le cache est simplement vidé quand il est plein.
+	maxRelPathCacheEntries = 4096
+	// contextSummarySlack est la place laissée dans le prompt aux consignes autour du résumé.
+	contextSummarySlack = 500
+)
+
+// Sections qui remplacent la structure et les fichiers lus quand le résumé dépasse son budget.
+const (
+	omittedStructureBlock = "\nStructure Projet: (omise, contexte trop long)\n"
+	omittedFilesBlock     = "\nFichiers Lus: (extraits omis, contexte trop long)\n"
+)
+
 // KnowledgeBase structure pour stocker les informations collectées pendant l'analyse.
 type KnowledgeBase struct {
 	ProjectPath        string
 	ProjectStructure   map[string]interface{}
 	ProjectType        string
-	ReadmeContent      string
-	FileContents       map[string]string
+	ReadmePath         string            // Chemin relatif du README lu; voir ReadmeExcerpt
+	FileContents       map[string][]byte // Contenu des fichiers lus, compressé (voir fileContent)
 	AnalysisNotes      []string
 	ExplorationPlan    []string
 	ExplorationHistory []string
 	FailedFileAttempts map[string]int    // Track failed file read attempts with retry count
 	AvailableFiles     []string          // Track files that exist and can be read
 	DependencyFiles    map[string]string // Map dependency types to found files
+	HistorySummary     string            // Résumé LLM des notes/historique trop anciens pour le résumé
+	FileSummaries      map[string]string // Résumé LLM en une phrase de chaque fichier lu
 	mu                 sync.Mutex        // Pour gérer l'accès concurrentiel
+
+	summarizedCount  int                          // Nombre d'entrées couvertes par HistorySummary
+	notesSeen        map[string]struct{}          // Notes déjà enregistrées, pour l'élimination des doublons
+	historySeen      map[string]struct{}          // Entrées d'historique déjà enregistrées
+	projectPrefix    string                       // ProjectPath suivi d'un séparateur, pour le calcul rapide des chemins relatifs
+	relPaths         map[string]string            // Cache borné des chemins relatifs déjà calculés
+	sortedFiles      []string                     // Clés de FileContents, maintenues triées à l'insertion
+	fileExcerpts     map[string]string            // Début de chaque fichier lu, calculé une fois à l'insertion
+	contentsByHash   map[[sha256.Size]byte][]byte // Contenus compressés, partagés entre fichiers identiques
+	fileHashes       map[string][sha256.Size]byte // Hash du dernier contenu enregistré de chaque fichier lu
+	unsummarized     []string                     // Fichiers lus qui n'ont pas encore de résumé
+	pendingSummary   map[string]struct{}          // Éléments de unsummarized, pour un test d'appartenance direct
+	availableSeen    map[string]struct{}          // Éléments de AvailableFiles
+	analyses         []analysisEntry              // Sujets déjà analysés, pour ne pas relancer un sujet quasi identique
+	structureJSON    string                       // Sérialisation mise en cache de ProjectStructure
+	structureTrunc   string                       // structureJSON tronquée à maxStructureLength, mise en cache
+	structureBlock   string                       // Section "Structure Projet" du résumé, mise en cache
+	lowercasePaths   map[string]string            // Chemins des fichiers de ProjectStructure, indexés en minuscules
+	filesBlock       string                       // Section "Fichiers Lus" du résumé, invalidée par AddFileContent
+	summary          string                       // Dernier résumé de contexte, invalidé par toute modification
+	revision         int                          // Incrémenté à chaque modification d'une information résumée
+	summaryProblem   string                       // Problème utilisateur pour lequel summary a été construit
+	summaryMaxLength int                          // Longueur maximale pour laquelle summary a été construit
 }
 
 // NewKnowledgeBase crée une nouvelle instance de KnowledgeBase.
@@ -38,35 +102,237 @@ func NewKnowledgeBase(projectPath string) *KnowledgeBase {
 		ProjectPath:        absPath,
 		ProjectStructure:   make(map[string]interface{}),
 		ProjectType:        "Inconnu",
-		FileContents:       make(map[string]string),
+		FileContents:       make(map[string][]byte),
 		AnalysisNotes:      []string{},
 		ExplorationPlan:    []string{},
 		ExplorationHistory: []string{},
 		FailedFileAttempts: make(map[string]int),
 		AvailableFiles:     []string{},
 		DependencyFiles:    make(map[string]string),
+		FileSummaries:      make(map[string]string),
+		notesSeen:          make(map[string]struct{}),
+		historySeen:        make(map[string]struct{}),
+		pendingSummary:     make(map[string]struct{}),
+		availableSeen:      make(map[string]struct{}),
+		projectPrefix:      absPath + string(filepath.Separator),
+		relPaths:           make(map[string]string),
+		fileExcerpts:       make(map[string]string),
+		contentsByHash:     make(map[[sha256.Size]byte][]byte),
+		fileHashes:         make(map[string][sha256.Size]byte),
 	}
 }
 
-// getRelativePath convertit un chemin absolu en chemin relatif au projet.
-func (kb *KnowledgeBase) getRelativePath(absFilepath string) (string, error) {
-	return filepath.Rel(kb.ProjectPath, absFilepath)
+// getRelativePath convertit un chemin absolu en chemin relatif au projet. Si aucun chemin
+// relatif n'existe, le chemin absolu est renvoyé tel quel.
+func (kb *KnowledgeBase) getRelativePath(absFilepath string) string {
+	if relPath, ok := kb.relPaths[absFilepath]; ok {
+		return relPath
+	}
+
+	relPath := absFilepath
+	if cleaned := filepath.Clean(absFilepath); strings.HasPrefix(cleaned, kb.projectPrefix) {
+		// Cas courant: un chemin propre sous le projet se réduit à une simple découpe de chaîne
+		relPath = cleaned[len(kb.projectPrefix):]
+	} else if rel, err := filepath.Rel(kb.ProjectPath, absFilepath); err == nil {
+		relPath = rel
+	} else {
+		logrus.Warnf("Could not get relative path for %s: %v. Using absolute path.", absFilepath, err)
+	}
+	if len(kb.relPaths) >= maxRelPathCacheEntries {
+		clear(kb.relPaths)
+	}
+	kb.relPaths[absFilepath] = relPath
+	return relPath
 }
 
+// SetProjectStructure remplace la structure du projet et invalide sa sérialisation en cache.
+func (kb *KnowledgeBase) SetProjectStructure(structure map[string]interface{}) {
+	kb.mu.Lock()
+	defer kb.mu.Unlock()
+
+	kb.ProjectStructure = structure
+	kb.structureJSON = ""
+	kb.structureTrunc = ""
+	kb.structureBlock = ""
+	kb.lowercasePaths = nil
+	kb.markChanged()
+}
+
+// projectStructureJSON renvoie la structure du projet en JSON indenté, sérialisée une seule fois.
+func (kb *KnowledgeBase) projectStructureJSON() string {
+	if kb.structureJSON != "" || kb.ProjectStructure == nil {
+		return kb.structureJSON
+	}
+
+	var buf bytes.Buffer
+	encoder := json.NewEncoder(&buf)
+	encoder.SetEscapeHTML(false)
+	encoder.SetIndent("", "  ")
+	if err := encoder.Encode(kb.ProjectStructure); err != nil {
+		logrus.Warnf("Could not serialize project structure: %v", err)
+		return ""
+	}
+	kb.structureJSON = strings.TrimRight(buf.String(), "\n")
+	return kb.structureJSON
+}
+
+// truncatedStructureJSON renvoie la structure du projet tronquée pour les prompts, calculée une
+// seule fois par structure. L'appelant détient kb.mu.
+func (kb *KnowledgeBase) truncatedStructureJSON() string {
+	if kb.structureTrunc != "" {
+		return kb.structureTrunc
+	}
+
+	kb.structureTrunc = kb.projectStructureJSON()
+	if len(kb.structureTrunc) > maxStructureLength {
+		kb.structureTrunc = kb.structureTrunc[:maxStructureLength] + "\n...(structure tronquée)"
+	}
+	return kb.structureTrunc
+}
 
-// AddFileContent ajoute le contenu d'un fichier à la base de connaissances.
+// structureForPrompt renvoie la structure tronquée du projet, partagée par le prompt de
+// présentation du projet et le résumé de contexte.
+func (kb *KnowledgeBase) structureForPrompt() string {
+	kb.mu.Lock()
+	defer kb.mu.Unlock()
+
+	return kb.truncatedStructureJSON()
+}
+
+// findPathIgnoreCase cherche dans la structure déjà scannée un fichier dont le chemin relatif ne
+// diffère de relPath que par la casse. L'index est construit une fois par structure: aucune
+// lecture de dossier n'est nécessaire pour résoudre un chemin mal orthographié.
+func (kb *KnowledgeBase) findPathIgnoreCase(relPath string) (string, bool) {
+	kb.mu.Lock()
+	defer kb.mu.Unlock()
+
+	if kb.lowercasePaths == nil {
+		kb.lowercasePaths = make(map[string]string)
+		indexStructurePaths(kb.ProjectStructure, "", kb.lowercasePaths)
+	}
+	path, ok := kb.lowercasePaths[strings.ToLower(filepath.ToSlash(filepath.Clean(relPath)))]
+	return path, ok
+}
+
+// indexStructurePaths ajoute à index les fichiers d'une structure scannée, sous le préfixe donné.
+func indexStructurePaths(structure map[string]interface{}, prefix string, index map[string]string) {
+	for name, value := range structure {
+		if subStructure, ok := value.(map[string]interface{}); ok {
+			indexStructurePaths(subStructure, prefix+name, index)
+		} else if !strings.HasSuffix(name, "/") && name != "..." {
+			index[strings.ToLower(prefix+name)] = prefix + name
+		}
+	}
+}
+
+// AddFileContent ajoute le contenu d'un fichier à la base de connaissances. Relire un fichier
+// inchangé (READ_FILE répété, README lu deux fois) ne modifie rien: son résumé est gardé et la
+// révision n'avance pas.
 func (kb *KnowledgeBase) AddFileContent(absFilepath string, content string) {
 	kb.mu.Lock()
 	defer kb.mu.Unlock()
 
-	relPath, err := kb.getRelativePath(absFilepath)
+	relPath := kb.getRelativePath(absFilepath)
+	data, hash := kb.compressedContent(content)
+	if previous, exists := kb.fileHashes[relPath]; exists && previous == hash {
+		logrus.Debugf("Content of '%s' unchanged", relPath)
+		return
+	}
+	kb.fileHashes[relPath] = hash
+
+	if _, exists := kb.FileContents[relPath]; !exists {
+		i := sort.SearchStrings(kb.sortedFiles, relPath)
+		kb.sortedFiles = append(kb.sortedFiles, "")
+		copy(kb.sortedFiles[i+1:], kb.sortedFiles[i:])
+		kb.sortedFiles[i] = relPath
+	}
+	kb.FileContents[relPath] = data
+	kb.fileExcerpts[relPath] = fileExcerpt(content, fileExcerptLength)
+	// Un contenu nouveau ou modifié doit être (re)résumé
+	_, summarized := kb.FileSummaries[relPath]
+	if _, pending := kb.pendingSummary[relPath]; summarized || !pending {
+		delete(kb.FileSummaries, relPath)
+		kb.unsummarized = append(kb.unsummarized, relPath)
+		kb.pendingSummary[relPath] = struct{}{}
+	}
+	kb.filesBlock = ""
+	kb.markChanged()
+	logrus.Debugf("Content added/updated for '%s'", relPath)
+}
+
+// fileExcerptLength est la longueur de l'extrait d'un fichier lu recopié dans le résumé.
+const fileExcerptLength = 80
+
+// flateWriters réutilise les compresseurs, coûteux à allouer.
+var flateWriters = sync.Pool{New: func() interface{} {
+	w, _ := flate.NewWriter(nil, flate.BestSpeed)
+	return w
+}}
+
+// compressedContent compresse le contenu d'un fichier lu. Le contenu complet n'est relu que pour
+// le résumé du fichier: il est conservé compressé, et un contenu identique à un fichier déjà lu
+// (code copié, fichiers générés) réutilise la même copie. L'appelant détient kb.mu.
+func (kb *KnowledgeBase) compressedContent(content string) ([]byte, [sha256.Size]byte) {
+	hasher := sha256.New()
+	writeStringChunked(hasher, content)
+	var hash [sha256.Size]byte
+	hasher.Sum(hash[:0])
+	if data, ok := kb.contentsByHash[hash]; ok {
+		return data, hash
+	}
+
+	var buf bytes.Buffer
+	w := flateWriters.Get().(*flate.Writer)
+	w.Reset(&buf)
+	writeStringChunked(w, content)
+	w.Close()
+	flateWriters.Put(w)
+
+	data := bytes.Clone(buf.Bytes())
+	kb.contentsByHash[hash] = data
+	return data, hash
+}
+
+// stringChunkSize est la taille des tranches passées par writeStringChunked.
+const stringChunkSize = 8 * 1024
+
+// writeStringChunked écrit une chaîne par tranches recopiées dans un petit tampon. Ni le hachage
+// ni le compresseur n'acceptent de chaîne: io.WriteString recopierait tout le fichier lu dans un
+// []byte de sa taille, pour chacun des deux.
+func writeStringChunked(w io.Writer, s string) {
+	buf := make([]byte, min(stringChunkSize, len(s)))
+	for len(s) > 0 {
+		n := copy(buf, s)
+		w.Write(buf[:n])
+		s = s[n:]
+	}
+}
+
+// fileContent renvoie le contenu décompressé d'un fichier lu. L'appelant détient kb.mu.
+func (kb *KnowledgeBase) fileContent(relPath string) (string, bool) {
+	data, ok := kb.FileContents[relPath]
+	if !ok {
+		return "", false
+	}
+	content, err := io.ReadAll(flate.NewReader(bytes.NewReader(data)))
 	if err != nil {
-		logrus.Warnf("Could not get relative path for %s: %v. Using absolute path.", absFilepath, err)
-		relPath = absFilepath
+		logrus.Warnf("Could not decompress content of '%s': %v", relPath, err)
+		return "", false
 	}
+	return string(content), true
+}
+
+// readmeExcerptLength est la longueur de l'extrait du README renvoyé par ReadmeExcerpt.
+const readmeExcerptLength = 500
+
+// ReadmeExcerpt renvoie le début du README lu. Le README n'est conservé qu'une fois, avec les
+// autres fichiers lus: l'extrait est recalculé à la demande plutôt que gardé en double.
+func (kb *KnowledgeBase) ReadmeExcerpt() string {
+	kb.mu.Lock()
+	defer kb.mu.Unlock()
 
-	kb.FileContents[relPath] = content
-	logrus.Infof("Content added/updated for '%s'", relPath)
+	content, _ := kb.fileContent(kb.ReadmePath)
+	return content[:min(readmeExcerptLength, len(content))]
 }
 
 // AddNote ajoute une note d'analyse.
@@ -74,11 +340,15 @@ func (kb *KnowledgeBase) AddNote(note string) {
 	kb.mu.Lock()
 	defer kb.mu.Unlock()
 
-	// Éviter les notes dupliquées consécutives
-	if len(kb.AnalysisNotes) == 0 || kb.AnalysisNotes[len(kb.AnalysisNotes)-1] != note {
-		kb.AnalysisNotes = append(kb.AnalysisNotes, note)
-		logrus.Debugf("Note added: %s...", note[:min(100, len(note))])
+	note = kb.withoutProjectPrefix(note)
+	// Éviter les notes dupliquées, même non consécutives
+	if _, seen := kb.notesSeen[note]; seen {
+		return
 	}
+	kb.notesSeen[note] = struct{}{}
+	kb.AnalysisNotes = append(kb.AnalysisNotes, note)
+	kb.markChanged()
+	logrus.Debugf("Note added: %.100s...", note)
 }
 
 // AddHistory ajoute une action à l'historique.
@@ -86,11 +356,211 @@ func (kb *KnowledgeBase) AddHistory(actionDescription string) {
 	kb.mu.Lock()
 	defer kb.mu.Unlock()
 
-	// Éviter les entrées d'historique dupliquées consécutives
-	if len(kb.ExplorationHistory) == 0 || kb.ExplorationHistory[len(kb.ExplorationHistory)-1] != actionDescription {
-		kb.ExplorationHistory = append(kb.ExplorationHistory, actionDescription)
-		logrus.Debugf("History added: %s", actionDescription)
+	actionDescription = kb.withoutProjectPrefix(actionDescription)
+	// Éviter les entrées d'historique dupliquées, même non consécutives
+	if _, seen := kb.historySeen[actionDescription]; seen {
+		return
+	}
+	kb.historySeen[actionDescription] = struct{}{}
+	kb.ExplorationHistory = append(kb.ExplorationHistory, actionDescription)
+	kb.markChanged()
+	logrus.Debugf("History added: %s", actionDescription)
+}
+
+// withoutProjectPrefix rend relatifs les chemins absolus du projet cités dans une note, par exemple
+// dans une erreur de lecture. Le dossier d'un projet envoyé est un dossier temporaire au nom
+// aléatoire: il ne doit pas apparaître dans les prompts, qui seraient sinon différents à chaque
+// envoi du même projet et ne profiteraient jamais du cache de réponses.
+func (kb *KnowledgeBase) withoutProjectPrefix(entry string) string {
+	if !strings.Contains(entry, kb.projectPrefix) {
+		return entry
+	}
+	return strings.ReplaceAll(entry, kb.projectPrefix, "")
+}
+
+// entryCount renvoie le nombre total de notes et d'entrées d'historique.
+func (kb *KnowledgeBase) entryCount() int {
+	return len(kb.AnalysisNotes) + len(kb.ExplorationHistory)
+}
+
+// entriesBetween renvoie les entrées [from, to) de la suite des notes suivies de l'historique.
+// Une plage contenue dans une seule des deux listes est renvoyée sans copie; sinon seule la plage
+// demandée est copiée, quelle que soit la longueur de l'historique.
+func (kb *KnowledgeBase) entriesBetween(from, to int) []string {
+	notes := len(kb.AnalysisNotes)
+	switch {
+	case to <= notes:
+		return kb.AnalysisNotes[from:to:to]
+	case from >= notes:
+		return kb.ExplorationHistory[from-notes : to-notes : to-notes]
+	}
+	entries := make([]string, 0, to-from)
+	entries = append(entries, kb.AnalysisNotes[from:]...)
+	return append(entries, kb.ExplorationHistory[:to-notes]...)
+}
+
+// olderEntriesToSummarize renvoie les entrées trop anciennes pour figurer dans le résumé de
+// contexte, dès que historySummarizeEvery nouvelles entrées n'ont pas encore été résumées.
+// Renvoie nil si le résumé existant est encore à jour.
+func (kb *KnowledgeBase) olderEntriesToSummarize() []string {
+	kb.mu.Lock()
+	defer kb.mu.Unlock()
+
+	olderCount := kb.entryCount() - maxHistoryItemsInSummary
+	if olderCount-kb.summarizedCount < historySummarizeEvery {
+		return nil
+	}
+	return kb.entriesBetween(0, olderCount)
+}
+
+// SetHistorySummary enregistre le résumé des entrées anciennes et le nombre d'entrées couvertes.
+func (kb *KnowledgeBase) SetHistorySummary(summary string, coveredEntries int) {
+	kb.mu.Lock()
+	defer kb.mu.Unlock()
+
+	kb.HistorySummary = summary
+	kb.summarizedCount = coveredEntries
+	kb.markChanged()
+	logrus.Debugf("History summary updated (%d entries covered)", coveredEntries)
+}
+
+// filesToSummarize renvoie les prochains fichiers lus sans résumé, avec leur contenu, et les
+// retire de la file d'attente. Renvoie nil si tous les fichiers lus sont résumés.
+func (kb *KnowledgeBase) filesToSummarize() []keyFile {
+	kb.mu.Lock()
+	defer kb.mu.Unlock()
+
+	if len(kb.unsummarized) == 0 {
+		return nil
+	}
+	batch := kb.unsummarized[:min(maxFilesPerSummaryBatch, len(kb.unsummarized))]
+	files := make([]keyFile, 0, len(batch))
+	for _, path := range batch {
+		content, _ := kb.fileContent(path)
+		files = append(files, keyFile{Path: path, Content: content})
+		delete(kb.pendingSummary, path)
+	}
+	kb.unsummarized = kb.unsummarized[len(batch):]
+	return files
+}
+
+// SetFileSummaries enregistre les résumés de fichiers, qui remplacent leur extrait dans le résumé de contexte.
+func (kb *KnowledgeBase) SetFileSummaries(summaries map[string]string) {
+	kb.mu.Lock()
+	defer kb.mu.Unlock()
+
+	for path, summary := range summaries {
+		kb.FileSummaries[path] = summary
 	}
+	kb.filesBlock = ""
+	kb.markChanged()
+}
+
+// analysisEntry est le sujet d'une analyse déjà obtenue, avec ses mots significatifs.
+type analysisEntry struct {
+	subject string
+	words   map[string]struct{}
+}
+
+// subjectStopWords sont les mots ignorés pour comparer deux sujets d'analyse.
+var subjectStopWords = map[string]bool{
+	"the": true, "a": true, "an": true, "of": true, "in": true, "and": true, "to": true, "for": true,
+	"le": true, "la": true, "les": true, "de": true, "des": true, "du": true, "et": true,
+}
+
+// subjectWords renvoie l'ensemble des mots significatifs d'un sujet, en minuscules.
+func subjectWords(subject string) map[string]struct{} {
+	words := make(map[string]struct{})
+	for _, word := range strings.FieldsFunc(strings.ToLower(subject), func(r rune) bool {
+		return !unicode.IsLetter(r) && !unicode.IsDigit(r) && r != '_' && r != '.'
+	}) {
+		if !subjectStopWords[word] {
+			words[word] = struct{}{}
+		}
+	}
+	return words
+}
+
+// jaccard renvoie la part de mots communs entre deux ensembles.
+func jaccard(a, b map[string]struct{}) float64 {
+	if len(a) == 0 || len(b) == 0 {
+		return 0
+	}
+	common := 0
+	for word := range a {
+		if _, ok := b[word]; ok {
+			common++
+		}
+	}
+	return float64(common) / float64(len(a)+len(b)-common)
+}
+
+// relevantEntries renvoie au plus k entrées qui partagent le plus de mots significatifs avec la
+// question, dans leur ordre d'origine. À score égal, les entrées les plus récentes sont préférées.
+func relevantEntries(question string, entries []string, k int) []string {
+	questionWords := subjectWords(question)
+	if len(questionWords) == 0 || k <= 0 {
+		return nil
+	}
+
+	type scoredEntry struct {
+		index int
+		score int
+	}
+	var scored []scoredEntry
+	for i := len(entries) - 1; i >= 0; i-- {
+		score := 0
+		for word := range subjectWords(entries[i]) {
+			if _, ok := questionWords[word]; ok {
+				score++
+			}
+		}
+		if score > 0 {
+			scored = append(scored, scoredEntry{index: i, score: score})
+		}
+	}
+	sort.SliceStable(scored, func(a, b int) bool { return scored[a].score > scored[b].score })
+	scored = scored[:min(k, len(scored))]
+	sort.Slice(scored, func(a, b int) bool { return scored[a].index < scored[b].index })
+
+	relevant := make([]string, len(scored))
+	for i, entry := range scored {
+		relevant[i] = entries[entry.index]
+	}
+	return relevant
+}
+
+// similarAnalysis renvoie le sujet d'une analyse déjà obtenue quasi identique à subject (mêmes
+// mots significatifs, à l'ordre et aux mots vides près).
+func (kb *KnowledgeBase) similarAnalysis(subject string) (string, bool) {
+	kb.mu.Lock()
+	defer kb.mu.Unlock()
+
+	words := subjectWords(subject)
+	for _, entry := range kb.analyses {
+		if jaccard(words, entry.words) >= similarSubjectThreshold {
+			return entry.subject, true
+		}
+	}
+	return "", false
+}
+
+// RecordAnalysis enregistre le résultat d'une analyse et l'ajoute aux notes.
+func (kb *KnowledgeBase) RecordAnalysis(subject, result string) {
+	kb.mu.Lock()
+	kb.analyses = append(kb.analyses, analysisEntry{subject: subject, words: subjectWords(subject)})
+	kb.mu.Unlock()
+
+	kb.AddNote(fmt.Sprintf("Analysis of '%s': %s", subject, result))
+}
+
+// FindingCount renvoie le nombre de résultats obtenus par l'exploration: fichiers lus et analyses.
+// Les échecs et les notes n'en font pas partie.
+func (kb *KnowledgeBase) FindingCount() int {
+	kb.mu.Lock()
+	defer kb.mu.Unlock()
+
+	return len(kb.FileContents) + len(kb.analyses)
 }
 
 // SetProjectType met à jour le type de projet.
@@ -100,6 +570,7 @@ func (kb *KnowledgeBase) SetProjectType(pType string) {
 
 	if pType != "" && kb.ProjectType != pType {
 		kb.ProjectType = pType
+		kb.markChanged()
 		logrus.Infof("Project type updated: %s", pType)
 	}
 }
@@ -109,10 +580,31 @@ func (kb *KnowledgeBase) AddFailedFileAttempt(filePath string) {
 	kb.mu.Lock()
 	defer kb.mu.Unlock()
 
+	// Seul le premier échec sur un chemin est une information nouvelle: les suivants ne mettent à
+	// jour que le compte affiché, sans faire avancer la révision
+	if kb.FailedFileAttempts[filePath] == 0 {
+		kb.markChanged()
+	} else {
+		kb.summary = ""
+	}
 	kb.FailedFileAttempts[filePath]++
 	logrus.Debugf("Failed file attempt recorded for '%s' (attempt #%d)", filePath, kb.FailedFileAttempts[filePath])
 }
 
+// MarkFileUnreadable records a file whose read failed for good, so it is never retried.
+func (kb *KnowledgeBase) MarkFileUnreadable(filePath string) {
+	kb.mu.Lock()
+	defer kb.mu.Unlock()
+
+	if kb.FailedFileAttempts[filePath] == 0 {
+		kb.markChanged()
+	} else {
+		kb.summary = ""
+	}
+	kb.FailedFileAttempts[filePath] = math.MaxInt
+	logrus.Debugf("File '%s' marked as unreadable", filePath)
+}
+
 // IsFileAttemptExceeded checks if a file has been attempted too many times.
 func (kb *KnowledgeBase) IsFileAttemptExceeded(filePath string, maxAttempts int) bool {
 	kb.mu.Lock()
@@ -127,11 +619,10 @@ func (kb *KnowledgeBase) AddAvailableFile(filePath string) {
 	defer kb.mu.Unlock()
 
 	// Avoid duplicates
-	for _, existing := range kb.AvailableFiles {
-		if existing == filePath {
-			return
-		}
+	if _, seen := kb.availableSeen[filePath]; seen {
+		return
 	}
+	kb.availableSeen[filePath] = struct{}{}
 	kb.AvailableFiles = append(kb.AvailableFiles, filePath)
 	logrus.Debugf("Available file recorded: '%s'", filePath)
 }
@@ -142,54 +633,159 @@ func (kb *KnowledgeBase) AddDependencyFile(depType, filePath string) {
 	defer kb.mu.Unlock()
 
 	kb.DependencyFiles[depType] = filePath
+	kb.markChanged()
 	logrus.Infof("Dependency file found: %s -> %s", depType, filePath)
 }
 
+// fileExcerpt renvoie les maxLen premiers octets du contenu, sans backticks et sur une seule ligne.
+// Seul le début du contenu est parcouru, quelle que soit la taille du fichier.
+func fileExcerpt(content string, maxLen int) string {
+	excerpt := make([]byte, 0, maxLen)
+	for i := 0; i < len(content) && len(excerpt) < maxLen; i++ {
+		switch c := content[i]; c {
+		case '`':
+		case '\n':
+			excerpt = append(excerpt, ' ')
+		default:
+			excerpt = append(excerpt, c)
+		}
+	}
+	return string(excerpt)
+}
 
-func (kb *KnowledgeBase) getContextSummary(userProblem string, maxPromptLength int) string {
-	var summary strings.Builder
+// structureSummaryBlock construit la section "Structure Projet" du résumé; elle ne change
+// qu'avec SetProjectStructure et est donc réutilisée d'un appel à l'autre.
+func (kb *KnowledgeBase) structureSummaryBlock() string {
+	if kb.structureBlock != "" {
+		return kb.structureBlock
+	}
 
-	summary.WriteString(fmt.Sprintf("Problème utilisateur: \"%s\"\n", userProblem))
-	summary.WriteString(fmt.Sprintf("Projet: %s (Type: %s)\n", filepath.Base(kb.ProjectPath), kb.ProjectType))
+	structureStr := kb.truncatedStructureJSON()
+	if structureStr == "" {
+		return ""
+	}
+	kb.structureBlock = fmt.Sprintf("\nStructure Projet (partielle):\n```json\n%s\n```\n", structureStr)
+	return kb.structureBlock
+}
 
-	if kb.ProjectStructure != nil {
-		structureBytes, err := json.MarshalIndent(kb.ProjectStructure, "", "  ")
-		if err == nil {
-			structureStr := string(structureBytes)
-			maxStructureLen := 1800
-			if len(structureStr) > maxStructureLen {
-				structureStr = structureStr[:maxStructureLen] + "\n...(structure tronquée)"
-			}
-			summary.WriteString(fmt.Sprintf("\nStructure Projet (partielle):\n```json\n%s\n```\n", structureStr))
-		}
+// filesSummaryBlock construit la section "Fichiers Lus" du résumé; elle est reconstruite
+// uniquement après l'ajout d'un fichier.
+func (kb *KnowledgeBase) filesSummaryBlock() string {
+	if kb.filesBlock != "" {
+		return kb.filesBlock
 	}
 
-	summary.WriteString("\nFichiers Lus (Extraits):\n")
+	var block strings.Builder
+	block.WriteString("\nFichiers Lus (Extraits):\n")
 	if len(kb.FileContents) == 0 {
-		summary.WriteString("(Aucun)\n")
+		block.WriteString("(Aucun)\n")
 	} else {
+		// Les fichiers sont listés dans l'ordre trié, stable d'un appel à l'autre
 		count := 0
-		for path, content := range kb.FileContents {
-			excerpt := strings.ReplaceAll(strings.ReplaceAll(content, "`", ""), "\n", " ")
-			if len(excerpt) > 80 {
-				excerpt = excerpt[:80]
+		for _, path := range kb.sortedFiles {
+			block.WriteString("- `")
+			block.WriteString(path)
+			block.WriteString("`: ")
+			if summary, ok := kb.FileSummaries[path]; ok {
+				block.WriteString(summary)
+			} else {
+				block.WriteString(kb.fileExcerpts[path])
+				block.WriteString("...")
 			}
-			summary.WriteString(fmt.Sprintf("- `%s`: %s...\n", path, excerpt))
+			block.WriteByte('\n')
 			count++
 			if count >= 5 {
-				summary.WriteString(fmt.Sprintf("... et %d autres fichiers lus.\n", len(kb.FileContents)-count))
+				fmt.Fprintf(&block, "... et %d autres fichiers lus.\n", len(kb.FileContents)-count)
 				break
 			}
 		}
 	}
+	kb.filesBlock = block.String()
+	return kb.filesBlock
+}
+
+// markChanged enregistre une modification d'une information résumée: le résumé en cache est
+// invalidé et la révision avance. L'appelant détient kb.mu.
+func (kb *KnowledgeBase) markChanged() {
+	kb.summary = ""
+	kb.revision++
+}
+
+// Revision renvoie un compteur qui avance à chaque nouvelle information: deux valeurs égales
+// signifient que rien n'a été appris entre-temps.
+func (kb *KnowledgeBase) Revision() int {
+	kb.mu.Lock()
+	defer kb.mu.Unlock()
+
+	return kb.revision
+}
+
+// getContextSummary construit le résumé de contexte envoyé au modèle. Le résumé est réutilisé
+// tant que la base de connaissances n'a pas été modifiée: chaque méthode qui modifie une
+// information résumée l'invalide.
+//
+// Le résumé est borné dès sa construction à maxPromptLength moins contextSummarySlack: si tout ne
+// tient pas, la structure du projet puis les extraits de fichiers sont omis, plutôt que d'être
+// recopiés pour être aussitôt retirés par fitPrompt.
+func (kb *KnowledgeBase) getContextSummary(userProblem string, maxPromptLength int) string {
+	// Verrouillé: les étapes d'un plan s'exécutent en parallèle et les blocs mis en cache sont écrits ici
+	kb.mu.Lock()
+	defer kb.mu.Unlock()
+
+	if kb.summary != "" && kb.summaryProblem == userProblem && kb.summaryMaxLength == maxPromptLength {
+		return kb.summary
+	}
+
+	// Le nom du dossier du projet, temporaire et aléatoire, n'est pas repris (voir withoutProjectPrefix)
+	header := fmt.Sprintf("Problème utilisateur: \"%s\"\nType de projet: %s\n", userProblem, kb.ProjectType)
+	details := kb.summaryDetails(userProblem)
+
+	// Les sections les plus récentes et les plus ciblées passent en premier dans le budget
+	structureBlock, filesBlock := kb.structureSummaryBlock(), kb.filesSummaryBlock()
+	remaining := maxPromptLength - contextSummarySlack - len(header) - len(details)
+	if len(filesBlock) > remaining {
+		filesBlock = omittedFilesBlock
+	}
+	remaining -= len(filesBlock)
+	if len(structureBlock) > remaining {
+		structureBlock = omittedStructureBlock
+	}
+
+	var summary strings.Builder
+	summary.Grow(len(header) + len(structureBlock) + len(filesBlock) + len(details))
+	summary.WriteString(header)
+	summary.WriteString(structureBlock)
+	summary.WriteString(filesBlock)
+	summary.WriteString(details)
+
+	finalSummary := summary.String()
+	if len(finalSummary) > maxPromptLength-contextSummarySlack {
+		logrus.Warnf("Context summary is potentially too long (%d chars).", len(finalSummary))
+	}
+
+	kb.summary = finalSummary
+	kb.summaryProblem = userProblem
+	kb.summaryMaxLength = maxPromptLength
+	return finalSummary
+}
+
+// summaryDetails construit les sections du résumé qui suivent les fichiers lus: fichiers non
+// disponibles, dépendances et historique. L'appelant détient kb.mu.
+func (kb *KnowledgeBase) summaryDetails(userProblem string) string {
+	var summary strings.Builder
+	summary.Grow(2048)
 
 	// Add information about failed file attempts
 	summary.WriteString("\nFichiers Non Disponibles (éviter de les redemander):\n")
 	if len(kb.FailedFileAttempts) == 0 {
 		summary.WriteString("(Aucun)\n")
 	} else {
-		for filePath, attempts := range kb.FailedFileAttempts {
-			summary.WriteString(fmt.Sprintf("- %s (tenté %d fois)\n", filePath, attempts))
+		for _, filePath := range sortedKeys(kb.FailedFileAttempts) {
+			summary.WriteString("- ")
+			summary.WriteString(filePath)
+			summary.WriteString(" (tenté ")
+			summary.WriteString(strconv.Itoa(kb.FailedFileAttempts[filePath]))
+			summary.WriteString(" fois)\n")
 		}
 	}
 
@@ -198,34 +794,69 @@ func (kb *KnowledgeBase) getContextSummary(userProblem string, maxPromptLength i
 	if len(kb.DependencyFiles) == 0 {
 		summary.WriteString("(Aucun détecté)\n")
 	} else {
-		for depType, filePath := range kb.DependencyFiles {
-			summary.WriteString(fmt.Sprintf("- %s: %s\n", depType, filePath))
+		for _, depType := range sortedKeys(kb.DependencyFiles) {
+			summary.WriteString("- ")
+			summary.WriteString(depType)
+			summary.WriteString(": ")
+			summary.WriteString(kb.DependencyFiles[depType])
+			summary.WriteByte('\n')
 		}
 	}
 
 	summary.WriteString("\nHistorique/Notes Récentes:\n")
-	combinedInfo := append(kb.AnalysisNotes, kb.ExplorationHistory...)
-	if len(combinedInfo) == 0 {
+	if total := kb.entryCount(); total == 0 {
 		summary.WriteString("(Aucun)\n")
 	} else {
-		maxHistory := 6 // Reduced to make room for new sections
-		start := 0
-		if len(combinedInfo) > maxHistory {
-			start = len(combinedInfo) - maxHistory
+		if kb.HistorySummary != "" {
+			fmt.Fprintf(&summary, "- Résumé des étapes précédentes: %s\n", kb.HistorySummary)
+		}
+		start := max(total-maxHistoryItemsInSummary, 0)
+		// Les entrées anciennes ne sont reprises que si elles concernent la question; seules les
+		// plus récentes d'entre elles sont examinées, pour un coût indépendant de la durée de l'analyse
+		candidates := kb.entriesBetween(max(start-maxRelevantCandidates, 1), max(start, 1))
+		relevant := relevantEntries(userProblem, candidates, maxRelevantEntries)
+		if start > 0 {
+			// Masquage des observations: la première entrée reste visible et les autres entrées
+			// anciennes sont seulement comptées, sans requête supplémentaire au modèle
+			writeHistoryEntry(&summary, kb.entriesBetween(0, 1)[0])
+			if masked := start - 1 - len(relevant); masked > 0 {
+				fmt.Fprintf(&summary, "- [%d entrées plus anciennes masquées]\n", masked)
+			}
 		}
-		for _, info := range combinedInfo[start:] {
-			if len(info) > 80 { // Reduced length to save space
-				info = info[:80] + "..."
+		for _, info := range relevant {
+			if len(info) > maxRelevantEntryLength {
+				info = fileExcerpt(info, maxRelevantEntryLength) + "..."
 			}
-			summary.WriteString(fmt.Sprintf("- %s\n", info))
+			fmt.Fprintf(&summary, "- Pertinent: %s\n", info)
+		}
+		for _, info := range kb.entriesBetween(start, total) {
+			writeHistoryEntry(&summary, info)
 		}
 	}
+	return summary.String()
+}
 
-	// Truncate if too long
-	finalSummary := summary.String()
-	if len(finalSummary) > maxPromptLength-500 {
-		logrus.Warnf("Context summary is potentially too long (%d chars).", len(finalSummary))
+// sortedKeys renvoie les clés d'une map dans l'ordre trié. Le résumé ne dépend ainsi pas de
+// l'ordre d'itération des maps: deux résumés d'un même état sont identiques octet pour octet, et
+// le serveur peut réutiliser le préfixe déjà calculé du prompt précédent.
+func sortedKeys[V any](m map[string]V) []string {
+	keys := make([]string, 0, len(m))
+	for key := range m {
+		keys = append(keys, key)
 	}
+	sort.Strings(keys)
+	return keys
+}
 
-	return finalSummary
+// writeHistoryEntry écrit une entrée de notes/historique dans le résumé, tronquée à 80 caractères.
+// Écriture directe des sous-chaînes, sans formatage ni concaténation par entrée.
+func writeHistoryEntry(summary *strings.Builder, info string) {
+	summary.WriteString("- ")
+	if len(info) > 80 { // Reduced length to save space
+		summary.WriteString(info[:80])
+		summary.WriteString("...")
+	} else {
+		summary.WriteString(info)
+	}
+	summary.WriteByte('\n')
 }
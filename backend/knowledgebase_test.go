@@ -2,8 +2,10 @@ package main
 
 import (
 	"debugagent/config"
+	"fmt"
 	"os"
 	"path/filepath"
+	"slices"
 	"strings"
 	"testing"
 )
@@ -33,12 +35,44 @@ func TestAddFileContent(t *testing.T) {
 
 	kb.AddFileContent(absFilePath, content)
 
-	relPath, _ := kb.getRelativePath(absFilePath)
-	if got, ok := kb.FileContents[relPath]; !ok || got != content {
+	relPath := kb.getRelativePath(absFilePath)
+	if got, ok := kb.fileContent(relPath); !ok || got != content {
 		t.Errorf("AddFileContent() failed, expected '%s', got '%s'", content, got)
 	}
 }
 
+func TestAddFileContentSharesIdenticalContents(t *testing.T) {
+	kb := setupKnowledgeBase(t)
+	content := strings.Repeat("package vendor\n", stringChunkSize/10)
+	kb.AddFileContent(filepath.Join(kb.ProjectPath, "a/util.go"), content)
+	kb.AddFileContent(filepath.Join(kb.ProjectPath, "b/util.go"), content)
+
+	a, b := kb.FileContents["a/util.go"], kb.FileContents["b/util.go"]
+	if len(a) == 0 || &a[0] != &b[0] {
+		t.Error("expected identical files to share the same compressed content")
+	}
+	if len(a) >= len(content) {
+		t.Errorf("expected the content to be compressed, got %d bytes for %d", len(a), len(content))
+	}
+	if got, ok := kb.fileContent("b/util.go"); !ok || got != content {
+		t.Errorf("fileContent() did not return the original content, got %q", got)
+	}
+}
+
+func TestReadmeExcerpt(t *testing.T) {
+	kb := setupKnowledgeBase(t)
+	if got := kb.ReadmeExcerpt(); got != "" {
+		t.Errorf("ReadmeExcerpt() without README = %q, want empty", got)
+	}
+
+	content := strings.Repeat("# Project\n", 100)
+	kb.AddFileContent(filepath.Join(kb.ProjectPath, "README.md"), content)
+	kb.ReadmePath = "README.md"
+	if got := kb.ReadmeExcerpt(); got != content[:readmeExcerptLength] {
+		t.Errorf("ReadmeExcerpt() = %q, want the first %d bytes of the README", got, readmeExcerptLength)
+	}
+}
+
 func TestGetContextSummary(t *testing.T) {
 	kb := setupKnowledgeBase(t)
 	kb.SetProjectType("Go Backend")
@@ -51,9 +85,12 @@ func TestGetContextSummary(t *testing.T) {
 	if !strings.Contains(summary, "Problème utilisateur: \"What is the entry point?\"") {
 		t.Error("getContextSummary() did not include the user problem")
 	}
-	if !strings.Contains(summary, "Type: Go Backend") {
+	if !strings.Contains(summary, "Type de projet: Go Backend") {
 		t.Error("getContextSummary() did not include the project type")
 	}
+	if strings.Contains(summary, filepath.Base(kb.ProjectPath)) {
+		t.Error("getContextSummary() should not include the temporary project directory name")
+	}
 	if !strings.Contains(summary, "- `main.go`: package main  func main() {}...") {
 		t.Error("getContextSummary() did not include the file content")
 	}
@@ -64,3 +101,391 @@ func TestGetContextSummary(t *testing.T) {
 		t.Error("getContextSummary() did not include the history")
 	}
 }
+
+func TestGetContextSummaryIsInvalidatedOnChange(t *testing.T) {
+	kb := setupKnowledgeBase(t)
+	first := kb.getContextSummary("What is the entry point?", 1000)
+	if again := kb.getContextSummary("What is the entry point?", 1000); again != first {
+		t.Errorf("getContextSummary() changed without any update: %q then %q", first, again)
+	}
+
+	kb.AddNote("A new note.")
+	if summary := kb.getContextSummary("What is the entry point?", 1000); !strings.Contains(summary, "- A new note.") {
+		t.Errorf("getContextSummary() returned a stale summary after AddNote, got %q", summary)
+	}
+	kb.AddFailedFileAttempt("missing.go")
+	if summary := kb.getContextSummary("What is the entry point?", 1000); !strings.Contains(summary, "- missing.go (tenté 1 fois)") {
+		t.Errorf("getContextSummary() returned a stale summary after AddFailedFileAttempt, got %q", summary)
+	}
+	if summary := kb.getContextSummary("Another question?", 1000); !strings.Contains(summary, `"Another question?"`) {
+		t.Errorf("getContextSummary() reused the summary of another question, got %q", summary)
+	}
+}
+
+func TestSetProjectStructureInvalidatesCache(t *testing.T) {
+	kb := setupKnowledgeBase(t)
+	kb.SetProjectStructure(map[string]interface{}{"main.go": "10 bytes"})
+	if got := kb.projectStructureJSON(); !strings.Contains(got, "main.go") {
+		t.Errorf("projectStructureJSON() = %q, expected it to contain main.go", got)
+	}
+
+	kb.SetProjectStructure(map[string]interface{}{"app.js": "<20 bytes>"})
+	got := kb.projectStructureJSON()
+	if strings.Contains(got, "main.go") {
+		t.Error("projectStructureJSON() returned a stale structure after SetProjectStructure")
+	}
+	if !strings.Contains(got, "<20 bytes>") {
+		t.Errorf("projectStructureJSON() should not HTML-escape values, got %q", got)
+	}
+	if got := kb.structureForPrompt(); strings.Contains(got, "main.go") || !strings.Contains(got, "app.js") {
+		t.Errorf("structureForPrompt() = %q, expected the current structure", got)
+	}
+}
+
+func TestStructureForPromptIsTruncated(t *testing.T) {
+	kb := setupKnowledgeBase(t)
+	structure := make(map[string]interface{})
+	for i := 0; i < 200; i++ {
+		structure[fmt.Sprintf("file%03d.go", i)] = "10 bytes"
+	}
+	kb.SetProjectStructure(structure)
+
+	got := kb.structureForPrompt()
+	if !strings.HasSuffix(got, "...(structure tronquée)") || len(got) > maxStructureLength+len("\n...(structure tronquée)") {
+		t.Errorf("structureForPrompt() was not truncated, got %d chars", len(got))
+	}
+	if summary := kb.getContextSummary("question", 8000); !strings.Contains(summary, got) {
+		t.Error("getContextSummary() should reuse the truncated structure")
+	}
+}
+
+func TestFilesSummaryBlockInvalidatedOnAdd(t *testing.T) {
+	kb := setupKnowledgeBase(t)
+	if block := kb.filesSummaryBlock(); !strings.Contains(block, "(Aucun)") {
+		t.Errorf("expected empty files block, got %q", block)
+	}
+
+	kb.AddFileContent(filepath.Join(kb.ProjectPath, "main.go"), "package main")
+	if block := kb.filesSummaryBlock(); !strings.Contains(block, "- `main.go`: package main...") {
+		t.Errorf("files block was not rebuilt after AddFileContent, got %q", block)
+	}
+}
+
+func TestFileExcerpt(t *testing.T) {
+	if got := fileExcerpt("a`b\nc", 80); got != "ab c" {
+		t.Errorf("fileExcerpt() = %q, want %q", got, "ab c")
+	}
+	if got := fileExcerpt(strings.Repeat("`x", 100), 5); got != "xxxxx" {
+		t.Errorf("fileExcerpt() = %q, want %q", got, "xxxxx")
+	}
+}
+
+func TestAddNoteAndHistorySkipDuplicates(t *testing.T) {
+	kb := setupKnowledgeBase(t)
+	kb.AddNote("first")
+	kb.AddNote("second")
+	kb.AddNote("first")
+	if len(kb.AnalysisNotes) != 2 {
+		t.Errorf("expected 2 notes, got %v", kb.AnalysisNotes)
+	}
+
+	kb.AddHistory("step A")
+	kb.AddHistory("step B")
+	kb.AddHistory("step A")
+	if len(kb.ExplorationHistory) != 2 {
+		t.Errorf("expected 2 history entries, got %v", kb.ExplorationHistory)
+	}
+}
+
+func TestOlderEntriesToSummarize(t *testing.T) {
+	kb := setupKnowledgeBase(t)
+	for i := 0; i < maxHistoryItemsInSummary+historySummarizeEvery-1; i++ {
+		kb.AddHistory(fmt.Sprintf("step %d", i))
+	}
+	if older := kb.olderEntriesToSummarize(); older != nil {
+		t.Errorf("expected no entries to summarize yet, got %v", older)
+	}
+
+	kb.AddHistory("one more step")
+	older := kb.olderEntriesToSummarize()
+	if len(older) != historySummarizeEvery {
+		t.Fatalf("expected %d entries to summarize, got %d", historySummarizeEvery, len(older))
+	}
+
+	kb.SetHistorySummary("Earlier steps explored the entry point.", len(older))
+	if kb.olderEntriesToSummarize() != nil {
+		t.Error("expected the summary to be up to date")
+	}
+	summary := kb.getContextSummary("question", 8000)
+	if !strings.Contains(summary, "Résumé des étapes précédentes: Earlier steps explored the entry point.") {
+		t.Error("getContextSummary() did not include the history summary")
+	}
+}
+
+func TestEntriesBetween(t *testing.T) {
+	kb := setupKnowledgeBase(t)
+	kb.AddNote("note 0")
+	kb.AddNote("note 1")
+	kb.AddHistory("step 0")
+	kb.AddHistory("step 1")
+
+	testCases := []struct {
+		from, to int
+		want     []string
+	}{
+		{0, 2, []string{"note 0", "note 1"}},
+		{2, 4, []string{"step 0", "step 1"}},
+		{1, 3, []string{"note 1", "step 0"}},
+		{0, 4, []string{"note 0", "note 1", "step 0", "step 1"}},
+		{4, 4, []string{}},
+	}
+	for _, tc := range testCases {
+		if got := kb.entriesBetween(tc.from, tc.to); !slices.Equal(got, tc.want) {
+			t.Errorf("entriesBetween(%d, %d) = %v, want %v", tc.from, tc.to, got, tc.want)
+		}
+	}
+}
+
+func TestFilesSummaryBlockIsSorted(t *testing.T) {
+	kb := setupKnowledgeBase(t)
+	for _, name := range []string{"c.go", "a.go", "b.go", "a.go"} {
+		kb.AddFileContent(filepath.Join(kb.ProjectPath, name), "content of "+name)
+	}
+
+	block := kb.filesSummaryBlock()
+	a, b, c := strings.Index(block, "`a.go`"), strings.Index(block, "`b.go`"), strings.Index(block, "`c.go`")
+	if a == -1 || !(a < b && b < c) {
+		t.Errorf("expected files to be listed in sorted order, got %q", block)
+	}
+	if strings.Count(block, "`a.go`") != 1 {
+		t.Errorf("expected a.go to be listed once, got %q", block)
+	}
+}
+
+func TestSummaryDetailsAreSorted(t *testing.T) {
+	kb := setupKnowledgeBase(t)
+	for _, name := range []string{"z.go", "m.go", "a.go", "q.go"} {
+		kb.AddFailedFileAttempt(name)
+	}
+	for _, depType := range []string{"npm", "composer", "go"} {
+		kb.AddDependencyFile(depType, depType+".json")
+	}
+
+	// Le même état donne toujours le même texte, quel que soit l'ordre d'itération des maps
+	details := kb.summaryDetails("question")
+	for i := 0; i < 10; i++ {
+		if again := kb.summaryDetails("question"); again != details {
+			t.Fatalf("expected identical details, got %q and %q", details, again)
+		}
+	}
+	if a, z := strings.Index(details, "- a.go"), strings.Index(details, "- z.go"); a == -1 || a > z {
+		t.Errorf("expected failed files in sorted order, got %q", details)
+	}
+	if c, n := strings.Index(details, "- composer:"), strings.Index(details, "- npm:"); c == -1 || c > n {
+		t.Errorf("expected dependency files in sorted order, got %q", details)
+	}
+}
+
+func TestGetRelativePath(t *testing.T) {
+	kb := setupKnowledgeBase(t)
+	testCases := map[string]string{
+		filepath.Join(kb.ProjectPath, "main.go"):            "main.go",
+		filepath.Join(kb.ProjectPath, "src", "app.js"):      filepath.Join("src", "app.js"),
+		kb.ProjectPath + "/src/../lib/util.go":              filepath.Join("lib", "util.go"),
+		filepath.Join(filepath.Dir(kb.ProjectPath), "x.go"): filepath.Join("..", "x.go"),
+	}
+	for absPath, expected := range testCases {
+		if got := kb.getRelativePath(absPath); got != expected {
+			t.Errorf("getRelativePath(%q) = %q, want %q", absPath, got, expected)
+		}
+	}
+}
+
+func TestFileSummaries(t *testing.T) {
+	kb := setupKnowledgeBase(t)
+	mainPath := filepath.Join(kb.ProjectPath, "main.go")
+	kb.AddFileContent(mainPath, "package main")
+	kb.AddFileContent(filepath.Join(kb.ProjectPath, "util.go"), "package util")
+
+	files := kb.filesToSummarize()
+	if len(files) != 2 || files[0].Path != "main.go" || files[1].Content != "package util" {
+		t.Fatalf("unexpected files to summarize: %v", files)
+	}
+	if files := kb.filesToSummarize(); files != nil {
+		t.Errorf("expected no pending files after the batch was taken, got %v", files)
+	}
+
+	kb.SetFileSummaries(map[string]string{"main.go": "Entry point."})
+	if block := kb.filesSummaryBlock(); !strings.Contains(block, "- `main.go`: Entry point.\n") || !strings.Contains(block, "- `util.go`: package util...") {
+		t.Errorf("expected the summary to replace the excerpt, got %q", block)
+	}
+
+	// Un fichier relu doit être résumé à nouveau, une seule fois même s'il est relu avant son résumé
+	kb.AddFileContent(mainPath, "package main // v2")
+	kb.AddFileContent(mainPath, "package main // v3")
+	if files := kb.filesToSummarize(); len(files) != 1 || files[0].Content != "package main // v3" {
+		t.Errorf("expected the updated file to be pending again, got %v", files)
+	}
+}
+
+func TestAddFileContentIgnoresUnchangedContent(t *testing.T) {
+	kb := setupKnowledgeBase(t)
+	mainPath := filepath.Join(kb.ProjectPath, "main.go")
+	kb.AddFileContent(mainPath, "package main")
+	kb.filesToSummarize()
+	kb.SetFileSummaries(map[string]string{"main.go": "Entry point."})
+
+	revision := kb.Revision()
+	kb.AddFileContent(mainPath, "package main")
+	if kb.Revision() != revision {
+		t.Error("re-reading an unchanged file should not advance the revision")
+	}
+	if files := kb.filesToSummarize(); files != nil || kb.FileSummaries["main.go"] != "Entry point." {
+		t.Errorf("re-reading an unchanged file should keep its summary, got pending %v and summaries %v", files, kb.FileSummaries)
+	}
+}
+
+func TestNotesDoNotIncludeTheProjectDirectory(t *testing.T) {
+	kb := setupKnowledgeBase(t)
+	kb.AddNote(fmt.Sprintf("Failed to read 'a.go': open %s: no such file", filepath.Join(kb.ProjectPath, "a.go")))
+	kb.AddHistory(fmt.Sprintf("Read %s", filepath.Join(kb.ProjectPath, "src", "b.go")))
+
+	want := []string{"Failed to read 'a.go': open a.go: no such file", "Read " + filepath.Join("src", "b.go")}
+	if got := []string{kb.AnalysisNotes[0], kb.ExplorationHistory[0]}; !slices.Equal(got, want) {
+		t.Errorf("expected project paths to be made relative, got %q", got)
+	}
+}
+
+func TestAddAvailableFileSkipsDuplicates(t *testing.T) {
+	kb := setupKnowledgeBase(t)
+	for _, file := range []string{"go.mod", "main.go", "go.mod"} {
+		kb.AddAvailableFile(file)
+	}
+	if !slices.Equal(kb.AvailableFiles, []string{"go.mod", "main.go"}) {
+		t.Errorf("AvailableFiles = %v, want [go.mod main.go]", kb.AvailableFiles)
+	}
+}
+
+func TestSimilarAnalysis(t *testing.T) {
+	kb := setupKnowledgeBase(t)
+	kb.RecordAnalysis("the application entry point", "main.go starts the server")
+
+	if len(kb.AnalysisNotes) != 1 || !strings.Contains(kb.AnalysisNotes[0], "main.go starts the server") {
+		t.Errorf("expected the analysis to be added to the notes, got %v", kb.AnalysisNotes)
+	}
+	for _, subject := range []string{"The entry point of the application", "application entry-point"} {
+		if previous, ok := kb.similarAnalysis(subject); !ok || previous != "the application entry point" {
+			t.Errorf("expected %q to reuse the previous analysis, got %q, %v", subject, previous, ok)
+		}
+	}
+	if _, ok := kb.similarAnalysis("the database schema"); ok {
+		t.Error("expected an unrelated subject not to match")
+	}
+}
+
+func TestRelevantEntries(t *testing.T) {
+	entries := []string{
+		"Read config.go",
+		"The server handles requests in routes.go",
+		"Analysis of 'database layer': uses sqlite",
+		"Read handler.go again",
+	}
+	got := relevantEntries("How are requests handled by the server?", entries, 2)
+	want := []string{"The server handles requests in routes.go"}
+	if !slices.Equal(got, want) {
+		t.Errorf("relevantEntries() = %v, want %v", got, want)
+	}
+
+	got = relevantEntries("Where is handler.go or config.go used?", entries, 2)
+	want = []string{"Read config.go", "Read handler.go again"}
+	if !slices.Equal(got, want) {
+		t.Errorf("relevantEntries() = %v, want the most recent entries in their original order %v", got, want)
+	}
+	if got := relevantEntries("the of", entries, 2); got != nil {
+		t.Errorf("relevantEntries() with only stop words = %v, want nil", got)
+	}
+}
+
+func TestGetContextSummaryKeepsRelevantOlderEntries(t *testing.T) {
+	kb := setupKnowledgeBase(t)
+	kb.AddNote("Project type detected")
+	kb.AddNote("Analysis of 'database': migrations live in db/migrate")
+	for i := 0; i < maxHistoryItemsInSummary; i++ {
+		kb.AddHistory(fmt.Sprintf("Step %d done", i))
+	}
+
+	summary := kb.getContextSummary("Where are the database migrations?", 5000)
+	if !strings.Contains(summary, "- Pertinent: Analysis of 'database': migrations live in db/migrate") {
+		t.Errorf("getContextSummary() dropped an older entry relevant to the question, got %q", summary)
+	}
+	if summary := kb.getContextSummary("What is the entry point?", 5000); strings.Contains(summary, "Pertinent") {
+		t.Errorf("getContextSummary() kept an unrelated older entry, got %q", summary)
+	}
+}
+
+func TestGetContextSummaryMasksOlderEntries(t *testing.T) {
+	kb := setupKnowledgeBase(t)
+	for i := 0; i < maxHistoryItemsInSummary+5; i++ {
+		kb.AddHistory(fmt.Sprintf("Step %d done", i))
+	}
+
+	summary := kb.getContextSummary("What is the entry point?", 8000)
+	for _, want := range []string{"- Step 0 done\n- [4 entrées plus anciennes masquées]\n- Step 5 done\n", "- Step 10 done\n"} {
+		if !strings.Contains(summary, want) {
+			t.Errorf("getContextSummary() = %q, want it to contain %q", summary, want)
+		}
+	}
+	if strings.Contains(summary, "Step 4 done") {
+		t.Error("expected the middle entries to be masked")
+	}
+}
+
+func TestGetContextSummaryStaysWithinBudget(t *testing.T) {
+	kb := setupKnowledgeBase(t)
+	structure := make(map[string]interface{})
+	for i := 0; i < 200; i++ {
+		structure[fmt.Sprintf("file%03d.go", i)] = "10 bytes"
+	}
+	kb.SetProjectStructure(structure)
+	kb.AddFileContent(filepath.Join(kb.ProjectPath, "main.go"), "package main")
+	kb.AddHistory("Read main.go")
+
+	summary := kb.getContextSummary("question", 1500)
+	if len(summary) > 1500-contextSummarySlack {
+		t.Errorf("getContextSummary() returned %d chars, want at most %d", len(summary), 1500-contextSummarySlack)
+	}
+	if !strings.Contains(summary, omittedStructureBlock) || !strings.Contains(summary, "main.go") {
+		t.Errorf("expected the structure to be omitted before the files and history, got %q", summary)
+	}
+	if summary := kb.getContextSummary("question", 8000); strings.Contains(summary, omittedStructureBlock) {
+		t.Error("expected the structure to be kept with a larger budget")
+	}
+}
+
+func TestRevisionOnlyAdvancesOnChange(t *testing.T) {
+	kb := setupKnowledgeBase(t)
+	kb.AddNote("Search for 'handler': no match")
+	revision := kb.Revision()
+
+	kb.AddNote("Search for 'handler': no match")
+	kb.SetProjectType(kb.ProjectType)
+	if kb.Revision() != revision {
+		t.Error("Revision() advanced although nothing new was recorded")
+	}
+	kb.AddFailedFileAttempt("missing.go")
+	if kb.Revision() == revision {
+		t.Error("Revision() did not advance after AddFailedFileAttempt")
+	}
+
+	// Un nouvel échec sur le même chemin n'apprend rien, mais le compte affiché est à jour
+	revision = kb.Revision()
+	kb.getContextSummary("question", 8000)
+	kb.AddFailedFileAttempt("missing.go")
+	if summary := kb.getContextSummary("question", 8000); !strings.Contains(summary, "missing.go (tenté 2 fois)") {
+		t.Errorf("expected the updated attempt count in the summary, got %q", summary)
+	}
+	kb.MarkFileUnreadable("missing.go")
+	if kb.Revision() != revision {
+		t.Error("Revision() advanced after repeated failures on the same path")
+	}
+}
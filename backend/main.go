@@ -265,6 +265,27 @@ func healthCheckHandler(w http.ResponseWriter, r *http.Request) {
 	json.NewEncoder(w).Encode(map[string]string{"status": "ok"})
 }
 
+// preloadOllamaModel loads the configured models into Ollama, so the first analysis does not wait
+// for them. A failure only means that analysis pays the load time itself.
+func preloadOllamaModel() {
+	client, err := NewOllamaClient()
+	if err != nil {
+		logrus.Warnf("Could not preload the Ollama model: %v", err)
+		return
+	}
+	clients := []*OllamaClient{client}
+	if structured := client.structured(); structured != client {
+		clients = append(clients, structured)
+	}
+	for _, c := range clients {
+		if err := c.preloadModel(); err != nil {
+			logrus.Warnf("Could not preload the Ollama model %s: %v", c.model, err)
+			continue
+		}
+		logrus.Infof("Ollama model %s loaded.", c.model)
+	}
+}
+
 func main() {
 	if err := config.LoadConfig(); err != nil {
 		logrus.Fatalf("Error loading configuration: %v", err)
@@ -272,6 +293,9 @@ func main() {
 
 	logging.InitLogger()
 
+	// Load the model while the server waits for its first request
+	go preloadOllamaModel()
+
 	http.HandleFunc("/analyze", corsMiddleware(analyzeHandler))
 	http.HandleFunc("/analyze-stream", corsMiddleware(analyzeStreamHandler))
 	http.HandleFunc("/health", corsMiddleware(healthCheckHandler))
@@ -1,72 +1,643 @@
 package main
 
 import (
+	"bytes"
+	"container/list"
+	"crypto/sha256"
 	"debugagent/config"
+	"encoding/hex"
+	"encoding/json"
 	"fmt"
+	"io"
+	"net/http"
 	"net/url"
+	"os"
+	"path/filepath"
+	"slices"
 	"strings"
+	"sync"
+	"time"
+	"unicode/utf8"
 
-	"github.com/JexSrs/go-ollama"
 	"github.com/sirupsen/logrus"
 )
 
-
 // OllamaClient est une structure pour interagir avec l'API Ollama.
 type OllamaClient struct {
-	client *ollama.Ollama
-	model  string
+	httpClient  *http.Client
+	generateURL string
+	model       string
+	keepAlive   string
+	numCtx      int
+	inFlight    chan struct{} // Limite le nombre de requêtes simultanées envoyées à Ollama, voir sharedOllamaSlots
+	cacheDir    string        // Dossier du cache de réponses sur disque, vide s'il est désactivé
+
+	structuredClient *OllamaClient // Client du modèle des réponses courtes et structurées, voir structured
+}
+
+var (
+	ollamaHTTPClient     *http.Client
+	ollamaHTTPClientOnce sync.Once
+	ollamaSlots          chan struct{}
+	ollamaSlotsOnce      sync.Once
+	responseCacheSweep   sync.Once
+)
+
+// sharedOllamaSlots renvoie le sémaphore commun à toutes les analyses: max_parallel_requests
+// borne les requêtes envoyées par tout le serveur, et non par analyse, pour que des analyses
+// simultanées ne dépassent pas ensemble les OLLAMA_NUM_PARALLEL emplacements du serveur Ollama.
+func sharedOllamaSlots(maxParallel int) chan struct{} {
+	ollamaSlotsOnce.Do(func() {
+		ollamaSlots = make(chan struct{}, maxParallel)
+	})
+	return ollamaSlots
+}
+
+// sharedOllamaHTTPClient renvoie le client HTTP commun à toutes les analyses. Son pool garde
+// assez de connexions inactives vers Ollama pour max_parallel_requests requêtes simultanées, afin
+// que chaque appel réutilise une connexion existante au lieu d'en ouvrir une nouvelle.
+func sharedOllamaHTTPClient(maxParallel int) *http.Client {
+	ollamaHTTPClientOnce.Do(func() {
+		transport := http.DefaultTransport.(*http.Transport).Clone()
+		transport.MaxIdleConnsPerHost = max(maxParallel, 2)
+		transport.IdleConnTimeout = 5 * time.Minute
+		ollamaHTTPClient = &http.Client{Transport: transport}
+	})
+	return ollamaHTTPClient
+}
+
+// closeBody vide puis ferme le corps d'une réponse, pour que sa connexion retourne dans le pool.
+func closeBody(resp *http.Response) {
+	io.Copy(io.Discard, io.LimitReader(resp.Body, 64*1024))
+	resp.Body.Close()
+}
+
+// maxCachedResponses borne le nombre de réponses gardées par responseCache.
+const maxCachedResponses = 512
+
+// responseCache garde les dernières réponses d'Ollama, indexées par le hash du modèle, du prompt
+// système et du prompt: une requête identique coûte une recherche au lieu d'une inférence.
+type responseCache struct {
+	mu      sync.Mutex
+	order   *list.List // Clés, de la plus récemment utilisée à la plus ancienne
+	entries map[[sha256.Size]byte]*list.Element
+}
+
+// cachedResponse est une entrée de responseCache.
+type cachedResponse struct {
+	key      [sha256.Size]byte
+	response string
+}
+
+// ollamaResponses est le cache partagé par tous les clients Ollama.
+var ollamaResponses = newResponseCache()
+
+// newResponseCache crée un cache de réponses vide.
+func newResponseCache() *responseCache {
+	return &responseCache{order: list.New(), entries: make(map[[sha256.Size]byte]*list.Element)}
+}
+
+// responseCacheKey renvoie la clé d'une requête; le séparateur NUL évite les collisions entre champs.
+// Les prompts sont hachés tels quels: ils contiennent le code des fichiers lus, où un changement
+// d'indentation ou de tabulation compte (Python, YAML, Makefile) et doit donner une autre réponse.
+// La limite de tokens et le format en font partie: ils changent la réponse, et une réponse coupée
+// à une ancienne limite ne doit pas être resservie.
+func responseCacheKey(model, systemMessage, userPrompt string, maxTokens int, format string) [sha256.Size]byte {
+	hash := sha256.New()
+	hash.Write([]byte(model))
+	hash.Write([]byte{0})
+	io.WriteString(hash, systemMessage)
+	hash.Write([]byte{0})
+	io.WriteString(hash, userPrompt)
+	hash.Write([]byte{0})
+	fmt.Fprintf(hash, "%d\x00%s", maxTokens, format)
+	var key [sha256.Size]byte
+	hash.Sum(key[:0])
+	return key
+}
+
+// get renvoie la réponse en cache pour une clé, si elle existe.
+func (c *responseCache) get(key [sha256.Size]byte) (string, bool) {
+	c.mu.Lock()
+	defer c.mu.Unlock()
+	elem, ok := c.entries[key]
+	if !ok {
+		return "", false
+	}
+	c.order.MoveToFront(elem)
+	return elem.Value.(*cachedResponse).response, true
+}
+
+// put enregistre une réponse, en évinçant la moins récemment utilisée si le cache est plein.
+func (c *responseCache) put(key [sha256.Size]byte, response string) {
+	c.mu.Lock()
+	defer c.mu.Unlock()
+	if elem, ok := c.entries[key]; ok {
+		elem.Value.(*cachedResponse).response = response
+		c.order.MoveToFront(elem)
+		return
+	}
+	c.entries[key] = c.order.PushFront(&cachedResponse{key: key, response: response})
+	if c.order.Len() > maxCachedResponses {
+		oldest := c.order.Back()
+		c.order.Remove(oldest)
+		delete(c.entries, oldest.Value.(*cachedResponse).key)
+	}
+}
+
+// ollamaResult est le résultat d'une requête lancée en arrière-plan.
+type ollamaResult struct {
+	Response string
+	Err      error
+}
+
+// generateRequest est le corps envoyé à l'endpoint /api/generate d'Ollama.
+type generateRequest struct {
+	Model     string           `json:"model"`
+	System    string           `json:"system,omitempty"`
+	Prompt    string           `json:"prompt"`
+	Stream    bool             `json:"stream"`
+	KeepAlive string           `json:"keep_alive,omitempty"`
+	Format    string           `json:"format,omitempty"` // "json" contraint la réponse à un objet JSON
+	Options   *generateOptions `json:"options,omitempty"`
+}
+
+// generateOptions sont les options de modèle d'une requête. Une structure typée s'encode sans
+// passer par une map ni par des valeurs interface{}; une option nulle n'est pas envoyée.
+type generateOptions struct {
+	NumCtx     int `json:"num_ctx,omitempty"`
+	NumPredict int `json:"num_predict,omitempty"`
+}
+
+// generateResponse est la réponse de l'endpoint /api/generate d'Ollama.
+type generateResponse struct {
+	Response string `json:"response"`
+	Done     bool   `json:"done"`
+	Error    string `json:"error"`
 }
 
 // NewOllamaClient crée un nouveau client pour Ollama.
 func NewOllamaClient() (*OllamaClient, error) {
-	host := config.AppConfig.Ollama.Host
-	model := config.AppConfig.Ollama.Model
+	cfg := config.AppConfig.Ollama
+	host := cfg.Host
+	model := cfg.Model
 
 	ollamaURL, err := url.Parse(host)
 	if err != nil {
 		return nil, fmt.Errorf("URL Ollama invalide: %w", err)
 	}
 
-	client := ollama.New(*ollamaURL)
+	maxParallel := cfg.MaxParallelRequests
+	if maxParallel <= 0 {
+		maxParallel = 1
+	}
 
 	logrus.Infof("Using Ollama client for host: %s", host)
-	logrus.Infof("Using Ollama model: %s", model)
+	logrus.Infof("Using Ollama model: %s (keep_alive: %s, num_ctx: %d)", model, cfg.KeepAlive, cfg.NumCtx)
+
+	cacheDir := ""
+	if cfg.DiskCache {
+		cacheDir = responseCacheDir()
+		responseCacheSweep.Do(func() { sweepResponseCache(cacheDir) })
+	}
+
+	client := &OllamaClient{
+		httpClient:  sharedOllamaHTTPClient(maxParallel),
+		generateURL: ollamaURL.JoinPath("api", "generate").String(),
+		model:       model,
+		keepAlive:   cfg.KeepAlive,
+		numCtx:      cfg.NumCtx,
+		inFlight:    sharedOllamaSlots(maxParallel),
+		cacheDir:    cacheDir,
+	}
+	if cfg.StructuredModel != "" && cfg.StructuredModel != model {
+		logrus.Infof("Using Ollama model %s for plans and summaries", cfg.StructuredModel)
+		structured := *client
+		structured.model = cfg.StructuredModel
+		client.structuredClient = &structured
+	}
+	return client, nil
+}
 
-	return &OllamaClient{
-		client: client,
-		model:  model,
-	}, nil
+// structured renvoie le client des requêtes dont la réponse est courte et structurée (plan,
+// aperçu du projet, résumés): il utilise ollama.structured_model s'il est configuré, un modèle
+// plus petit qui produit ces réponses aussi bien et plus vite. Il partage la limite de requêtes
+// simultanées et la connexion du client principal. Sans structured_model, c'est oc lui-même.
+func (oc *OllamaClient) structured() *OllamaClient {
+	if oc.structuredClient == nil {
+		return oc
+	}
+	return oc.structuredClient
 }
 
-// ollamaRequest envoie une requête à Ollama en utilisant la fonction Generate.
-func (oc *OllamaClient) ollamaRequest(systemMessage, userPrompt string) (string, error) {
-	maxPromptLen := config.AppConfig.Analysis.MaxPromptLength
+// newGenerateRequest prépare le corps d'une requête, en gardant le modèle chargé entre deux appels.
+// Si maxTokens est positif, la génération s'arrête après maxTokens tokens.
+func (oc *OllamaClient) newGenerateRequest(systemMessage, userPrompt string, maxTokens int) generateRequest {
+	maxPromptLen := maxPromptChars()
 	logrus.Debugf("Sending prompt of %d characters to Ollama (max: %d)", len(userPrompt), maxPromptLen)
-	
-	if len(userPrompt) > maxPromptLen {
+
+	// Les prompts sont déjà ajustés par fitPrompt: cette coupe n'est qu'un dernier recours, qui
+	// ne sépare jamais les octets d'un caractère UTF-8
+	if maxPromptLen > 0 && len(userPrompt) > maxPromptLen {
 		logrus.Warnf("Prompt is being truncated from %d to %d characters.", len(userPrompt), maxPromptLen)
-		userPrompt = userPrompt[:maxPromptLen]
+		cut := maxPromptLen
+		for cut > 0 && !utf8.RuneStart(userPrompt[cut]) {
+			cut--
+		}
+		userPrompt = userPrompt[:cut]
+	}
+
+	req := generateRequest{
+		Model:     oc.model,
+		System:    systemMessage,
+		Prompt:    userPrompt,
+		KeepAlive: oc.keepAlive,
+	}
+	if oc.numCtx > 0 || maxTokens > 0 {
+		req.Options = &generateOptions{NumCtx: max(oc.numCtx, 0), NumPredict: max(maxTokens, 0)}
+	}
+	return req
+}
+
+// postGenerate envoie une requête à l'endpoint /api/generate et renvoie la réponse HTTP brute.
+func (oc *OllamaClient) postGenerate(req generateRequest) (*http.Response, error) {
+	// Le code source envoyé contient beaucoup de <, > et &: sans échappement HTML, ils restent sur
+	// un octet au lieu de six et n'ont pas à être réécrits
+	body := bytes.NewBuffer(make([]byte, 0, len(req.System)+len(req.Prompt)+256))
+	encoder := json.NewEncoder(body)
+	encoder.SetEscapeHTML(false)
+	if err := encoder.Encode(req); err != nil {
+		return nil, fmt.Errorf("impossible d'encoder la requête Ollama: %w", err)
+	}
+
+	resp, err := oc.httpClient.Post(oc.generateURL, "application/json", body)
+	if err != nil {
+		return nil, fmt.Errorf("erreur lors de l'appel à l'API Generate d'Ollama: %w", err)
+	}
+	return resp, nil
+}
+
+// ollamaRequest envoie une requête à l'endpoint /api/generate d'Ollama. Une requête identique à
+// une requête récente, ou à une requête d'une exécution précédente si le cache sur disque est
+// activé, renvoie la même réponse sans appeler Ollama.
+func (oc *OllamaClient) ollamaRequest(systemMessage, userPrompt string) (string, error) {
+	return oc.ollamaRequestLimited(systemMessage, userPrompt, 0)
+}
+
+// ollamaRequestLimited est ollamaRequest pour les réponses courtes et structurées: la génération
+// est arrêtée après maxTokens tokens au lieu de la limite par défaut du modèle.
+// Des requêtes identiques simultanées (voir ollamaCalls) partagent un seul appel à Ollama.
+func (oc *OllamaClient) ollamaRequestLimited(systemMessage, userPrompt string, maxTokens int) (string, error) {
+	return oc.cachedRequest(systemMessage, userPrompt, maxTokens, "")
+}
+
+// ollamaRequestJSON est ollamaRequestLimited pour les réponses attendues sous forme d'objet JSON:
+// le serveur contraint la génération à un objet JSON valide, qui s'arrête dès l'objet refermé au
+// lieu de continuer par du texte que l'analyse ignorerait. Un prompt système n'est envoyé qu'avec
+// un seul format: la clé du cache n'a pas à en dépendre.
+func (oc *OllamaClient) ollamaRequestJSON(systemMessage, userPrompt string, maxTokens int) (string, error) {
+	return oc.cachedRequest(systemMessage, userPrompt, maxTokens, "json")
+}
+
+// cachedRequest envoie une requête non streamée, en passant par les caches de réponses et en
+// partageant l'appel avec les requêtes identiques simultanées.
+func (oc *OllamaClient) cachedRequest(systemMessage, userPrompt string, maxTokens int, format string) (string, error) {
+	key := responseCacheKey(oc.model, systemMessage, userPrompt, maxTokens, format)
+	call, leader := ollamaCalls.join(key)
+	if !leader {
+		<-call.done
+		logrus.Debug("Response shared with an identical concurrent request.")
+		return call.response, call.err
+	}
+
+	// Le cache est consulté par le seul appelant qui envoie la requête: une réponse enregistrée
+	// par l'appel précédent y est toujours visible
+	response, ok := oc.cachedResponse(key)
+	var err error
+	if !ok {
+		if response, err = oc.generate(systemMessage, userPrompt, maxTokens, format); err == nil {
+			oc.storeResponse(key, response)
+		}
+	}
+	ollamaCalls.finish(key, call, response, err)
+	return response, err
+}
+
+// ollamaCall est une requête en cours, partagée par les appelants qui envoient la même requête.
+type ollamaCall struct {
+	done     chan struct{} // Fermé quand response et err sont connus
+	response string
+	err      error
+}
+
+// ollamaCalls regroupe les requêtes identiques simultanées, par exemple deux analyses du même
+// projet ou deux étapes ANALYZE identiques d'un plan: seule la première est envoyée à Ollama, les
+// suivantes attendent sa réponse au lieu de la faire calculer à nouveau.
+var ollamaCalls = inflightCalls{calls: make(map[[sha256.Size]byte]*ollamaCall)}
+
+// inflightCalls indexe les requêtes en cours par leur clé de responseCacheKey.
+type inflightCalls struct {
+	mu    sync.Mutex
+	calls map[[sha256.Size]byte]*ollamaCall
+}
+
+// join renvoie la requête en cours pour une clé, ou en crée une: leader indique alors que
+// l'appelant doit l'envoyer puis appeler finish.
+func (c *inflightCalls) join(key [sha256.Size]byte) (call *ollamaCall, leader bool) {
+	c.mu.Lock()
+	defer c.mu.Unlock()
+	if call, ok := c.calls[key]; ok {
+		return call, false
+	}
+	call = &ollamaCall{done: make(chan struct{})}
+	c.calls[key] = call
+	return call, true
+}
+
+// finish publie le résultat d'une requête à ses appelants en attente et la retire des requêtes en cours.
+func (c *inflightCalls) finish(key [sha256.Size]byte, call *ollamaCall, response string, err error) {
+	c.mu.Lock()
+	delete(c.calls, key)
+	c.mu.Unlock()
+	call.response, call.err = response, err
+	close(call.done)
+}
+
+// cachedResponse renvoie la réponse en cache pour une clé de responseCacheKey, en mémoire puis
+// sur disque.
+func (oc *OllamaClient) cachedResponse(key [sha256.Size]byte) (string, bool) {
+	if response, ok := ollamaResponses.get(key); ok {
+		logrus.Debug("Response served from cache.")
+		return response, true
+	}
+	if cachePath := oc.responseCachePath(key); cachePath != "" {
+		if response, ok := readCachedResponse(cachePath); ok {
+			logrus.Debug("Response served from the disk cache.")
+			ollamaResponses.put(key, response)
+			return response, true
+		}
+	}
+	return "", false
+}
+
+// storeResponse enregistre une réponse en mémoire et, s'il est activé, dans le cache sur disque.
+func (oc *OllamaClient) storeResponse(key [sha256.Size]byte, response string) {
+	ollamaResponses.put(key, response)
+	if cachePath := oc.responseCachePath(key); cachePath != "" {
+		storeCachedResponse(cachePath, response)
+	}
+}
+
+// responseCacheDir renvoie le dossier où les réponses sont gardées entre deux exécutions, ou une
+// chaîne vide si le dossier de cache de l'utilisateur est inconnu.
+func responseCacheDir() string {
+	dir, err := os.UserCacheDir()
+	if err != nil {
+		logrus.Warnf("Cache de réponses sur disque désactivé: %v", err)
+		return ""
+	}
+	return filepath.Join(dir, "debugagent", "responses")
+}
+
+// responseCachePath renvoie le fichier du cache sur disque pour une clé, réparti dans des
+// sous-dossiers selon son premier octet, ou une chaîne vide si le cache est désactivé.
+func (oc *OllamaClient) responseCachePath(key [sha256.Size]byte) string {
+	if oc.cacheDir == "" {
+		return ""
+	}
+	name := hex.EncodeToString(key[:])
+	return filepath.Join(oc.cacheDir, name[:2], name)
+}
+
+// maxCachedResponseAge est la durée pendant laquelle une réponse du cache sur disque reste
+// valable: au-delà, le modèle installé sous le même nom ou le projet ont pu changer.
+const maxCachedResponseAge = 24 * time.Hour
+
+// readCachedResponse lit une réponse du cache sur disque. Une réponse trop ancienne est supprimée
+// et ignorée.
+func readCachedResponse(cachePath string) (string, bool) {
+	info, err := os.Stat(cachePath)
+	if err != nil {
+		return "", false
+	}
+	if time.Since(info.ModTime()) > maxCachedResponseAge {
+		os.Remove(cachePath)
+		return "", false
+	}
+	response, err := os.ReadFile(cachePath)
+	if err != nil {
+		return "", false
+	}
+	return string(response), true
+}
+
+// maxResponseCacheBytes borne la taille du cache sur disque: au-delà, les réponses les plus
+// anciennes sont supprimées au démarrage.
+const maxResponseCacheBytes = 64 << 20
+
+// sweepResponseCache supprime du cache sur disque les réponses expirées, et les plus anciennes tant
+// qu'il dépasse maxResponseCacheBytes. readCachedResponse ne supprime une réponse expirée que si
+// la même requête revient: sans ce nettoyage, les réponses des projets analysés une seule fois
+// resteraient indéfiniment. Il est fait une fois au démarrage, avant la première analyse.
+func sweepResponseCache(dir string) {
+	if dir == "" {
+		return
+	}
+	type cachedFile struct {
+		path    string
+		size    int64
+		modTime time.Time
+	}
+	var files []cachedFile
+	var total int64
+	filepath.WalkDir(dir, func(path string, d os.DirEntry, err error) error {
+		if err != nil || d.IsDir() {
+			return nil
+		}
+		info, err := d.Info()
+		if err != nil {
+			return nil
+		}
+		// Les fichiers temporaires d'une écriture interrompue expirent comme les réponses
+		if time.Since(info.ModTime()) > maxCachedResponseAge {
+			os.Remove(path)
+			return nil
+		}
+		files = append(files, cachedFile{path: path, size: info.Size(), modTime: info.ModTime()})
+		total += info.Size()
+		return nil
+	})
+	if total <= maxResponseCacheBytes {
+		return
+	}
+	slices.SortFunc(files, func(a, b cachedFile) int { return a.modTime.Compare(b.modTime) })
+	for _, file := range files {
+		if total <= maxResponseCacheBytes {
+			break
+		}
+		if os.Remove(file.path) == nil {
+			total -= file.size
+		}
+	}
+}
+
+// storeCachedResponse écrit une réponse dans le cache sur disque. Le fichier est renommé une fois
+// complet: une analyse concurrente ne lit jamais une réponse partielle. Un échec ne coûte qu'une
+// requête future.
+func storeCachedResponse(cachePath, response string) {
+	if err := os.MkdirAll(filepath.Dir(cachePath), 0o755); err != nil {
+		logrus.Debugf("Impossible de créer le dossier du cache de réponses: %v", err)
+		return
+	}
+	tmp, err := os.CreateTemp(filepath.Dir(cachePath), ".response-*")
+	if err != nil {
+		logrus.Debugf("Impossible de garder la réponse en cache: %v", err)
+		return
+	}
+	_, err = tmp.WriteString(response)
+	if closeErr := tmp.Close(); err == nil {
+		err = closeErr
+	}
+	if err == nil {
+		err = os.Rename(tmp.Name(), cachePath)
+	}
+	if err != nil {
+		os.Remove(tmp.Name())
+		logrus.Debugf("Impossible de garder la réponse en cache: %v", err)
 	}
+}
+
+// generate envoie la requête à Ollama et attend la réponse complète, dans le format donné
+// (voir generateRequest.Format).
+func (oc *OllamaClient) generate(systemMessage, userPrompt string, maxTokens int, format string) (string, error) {
+	req := oc.newGenerateRequest(systemMessage, userPrompt, maxTokens)
+	req.Format = format
 
-	// Utilisation de la fonction Generate qui est plus simple pour des requêtes uniques.
-	res, err := oc.client.Generate(
-		oc.client.Generate.WithModel(oc.model),
-		oc.client.Generate.WithSystem(systemMessage),
-		oc.client.Generate.WithPrompt(userPrompt),
-	)
+	oc.inFlight <- struct{}{}
+	defer func() { <-oc.inFlight }()
 
+	resp, err := oc.postGenerate(req)
 	if err != nil {
-		return "", fmt.Errorf("erreur lors de l'appel à l'API Generate d'Ollama: %w", err)
+		return "", err
+	}
+	defer closeBody(resp)
+
+	var res generateResponse
+	if err := json.NewDecoder(resp.Body).Decode(&res); err != nil {
+		return "", fmt.Errorf("réponse d'Ollama illisible (statut %d): %w", resp.StatusCode, err)
+	}
+	if resp.StatusCode != http.StatusOK || res.Error != "" {
+		return "", fmt.Errorf("erreur lors de l'appel à l'API Generate d'Ollama (statut %d): %s", resp.StatusCode, res.Error)
 	}
 
 	if res.Done {
 		if res.Response != "" {
 			logrus.Debug("Response received from Ollama.")
-			// Nettoyer la réponse des "```" que le modèle ajoute parfois
-			return strings.TrimSpace(strings.Trim(res.Response, "```")), nil
+			return cleanResponse(res.Response), nil
 		}
 		return "", fmt.Errorf("réponse d'Ollama vide mais marquée comme terminée")
 	}
 
 	return "", fmt.Errorf("la requête à Ollama n'est pas terminée (comportement de streaming inattendu)")
 }
+
+// preloadModel demande à Ollama de charger le modèle sans rien générer: une requête sans prompt
+// ne fait que le charger et le garder en mémoire pendant keep_alive. Elle porte le même num_ctx
+// que les requêtes de l'analyse, sinon le serveur rechargerait le modèle à la première d'entre elles.
+func (oc *OllamaClient) preloadModel() error {
+	oc.inFlight <- struct{}{}
+	defer func() { <-oc.inFlight }()
+
+	resp, err := oc.postGenerate(oc.newGenerateRequest("", "", 0))
+	if err != nil {
+		return err
+	}
+	defer closeBody(resp)
+
+	var res generateResponse
+	if err := json.NewDecoder(resp.Body).Decode(&res); err != nil {
+		return fmt.Errorf("réponse d'Ollama illisible (statut %d): %w", resp.StatusCode, err)
+	}
+	if resp.StatusCode != http.StatusOK || res.Error != "" {
+		return fmt.Errorf("impossible de charger le modèle %s (statut %d): %s", oc.model, resp.StatusCode, res.Error)
+	}
+	return nil
+}
+
+// cleanResponse retire les blocs "```" que le modèle ajoute parfois autour de sa réponse, y
+// compris l'étiquette de langage ("```json"), ainsi que les espaces qui l'entourent. Le résultat
+// est une sous-chaîne de la réponse: aucune copie n'est faite.
+func cleanResponse(response string) string {
+	response = strings.TrimSpace(response)
+	if rest, ok := strings.CutPrefix(response, "```"); ok {
+		// Une étiquette de langage occupe seule la première ligne du bloc
+		if newline := strings.IndexByte(rest, '\n'); newline != -1 && !strings.ContainsAny(rest[:newline], " \t`{[\"") {
+			rest = rest[newline+1:]
+		}
+		response = rest
+	}
+	return strings.TrimSpace(strings.Trim(response, "`"))
+}
+
+// ollamaStreamLines envoie une requête en streaming et transmet chaque ligne complète de la
+// réponse à onLine dès sa réception. Si onLine renvoie false, la lecture s'arrête et la
+// connexion est fermée, ce qui interrompt la génération côté Ollama. Renvoie le texte reçu.
+// Si maxTokens est positif, la génération s'arrête après maxTokens tokens.
+func (oc *OllamaClient) ollamaStreamLines(systemMessage, userPrompt string, maxTokens int, onLine func(string) bool) (string, error) {
+	req := oc.newGenerateRequest(systemMessage, userPrompt, maxTokens)
+	req.Stream = true
+
+	oc.inFlight <- struct{}{}
+	defer func() { <-oc.inFlight }()
+
+	resp, err := oc.postGenerate(req)
+	if err != nil {
+		return "", err
+	}
+	// Pas de closeBody ici: en cas d'arrêt anticipé, fermer sans vider interrompt la génération
+	defer resp.Body.Close()
+
+	var received strings.Builder
+	lineStart := 0
+	decoder := json.NewDecoder(resp.Body)
+	for {
+		var chunk generateResponse
+		if err := decoder.Decode(&chunk); err != nil {
+			if err == io.EOF {
+				break
+			}
+			return "", fmt.Errorf("réponse d'Ollama illisible (statut %d): %w", resp.StatusCode, err)
+		}
+		if resp.StatusCode != http.StatusOK || chunk.Error != "" {
+			return "", fmt.Errorf("erreur lors de l'appel à l'API Generate d'Ollama (statut %d): %s", resp.StatusCode, chunk.Error)
+		}
+
+		received.WriteString(chunk.Response)
+		text := received.String()
+		for {
+			newline := strings.IndexByte(text[lineStart:], '\n')
+			if newline == -1 {
+				break
+			}
+			line := text[lineStart : lineStart+newline]
+			lineStart += newline + 1
+			if !onLine(line) {
+				logrus.Debug("Stopping Ollama stream early.")
+				return text[:lineStart], nil
+			}
+		}
+		if chunk.Done {
+			break
+		}
+	}
+
+	text := received.String()
+	if lineStart < len(text) {
+		onLine(text[lineStart:])
+	}
+	if strings.TrimSpace(text) == "" {
+		return "", fmt.Errorf("réponse d'Ollama vide mais marquée comme terminée")
+	}
+	logrus.Debug("Streamed response received from Ollama.")
+	return text, nil
+}
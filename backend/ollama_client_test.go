@@ -0,0 +1,518 @@
+package main
+
+import (
+	"crypto/sha256"
+	"debugagent/config"
+	"encoding/json"
+	"errors"
+	"fmt"
+	"io"
+	"net"
+	"net/http"
+	"net/http/httptest"
+	"os"
+	"path/filepath"
+	"slices"
+	"strings"
+	"sync"
+	"sync/atomic"
+	"testing"
+	"time"
+	"unicode/utf8"
+)
+
+func setupOllamaClientTest(t *testing.T, handler http.HandlerFunc) *OllamaClient {
+	server := httptest.NewServer(handler)
+	t.Cleanup(server.Close)
+
+	config.AppConfig = &config.Config{
+		Ollama: config.OllamaConfig{
+			Host:      server.URL,
+			Model:     "test-model",
+			KeepAlive: "30m",
+			NumCtx:    4096,
+		},
+		Analysis: config.AnalysisConfig{
+			MaxPromptLength: 8000,
+		},
+	}
+
+	ollamaResponses = newResponseCache()
+
+	client, err := NewOllamaClient()
+	if err != nil {
+		t.Fatalf("Failed to create Ollama client: %v", err)
+	}
+	return client
+}
+
+func TestOllamaRequest(t *testing.T) {
+	var received generateRequest
+	client := setupOllamaClientTest(t, func(w http.ResponseWriter, r *http.Request) {
+		if r.URL.Path != "/api/generate" {
+			t.Errorf("unexpected path %s", r.URL.Path)
+		}
+		if err := json.NewDecoder(r.Body).Decode(&received); err != nil {
+			t.Errorf("could not decode request: %v", err)
+		}
+		json.NewEncoder(w).Encode(generateResponse{Response: "```Go Backend```", Done: true})
+	})
+
+	response, err := client.ollamaRequest("system", "prompt")
+	if err != nil {
+		t.Fatalf("ollamaRequest() returned an error: %v", err)
+	}
+	if response != "Go Backend" {
+		t.Errorf("expected cleaned response 'Go Backend', got %q", response)
+	}
+	if received.Model != "test-model" || received.System != "system" || received.Prompt != "prompt" {
+		t.Errorf("unexpected request body: %+v", received)
+	}
+	if received.KeepAlive != "30m" || received.Options == nil || received.Options.NumCtx != 4096 {
+		t.Errorf("expected keep_alive and num_ctx to be sent, got %+v", received)
+	}
+}
+
+func TestOllamaRequestError(t *testing.T) {
+	client := setupOllamaClientTest(t, func(w http.ResponseWriter, r *http.Request) {
+		w.WriteHeader(http.StatusNotFound)
+		json.NewEncoder(w).Encode(generateResponse{Error: "model not found"})
+	})
+
+	if _, err := client.ollamaRequest("system", "prompt"); err == nil {
+		t.Error("expected an error when Ollama reports one")
+	}
+}
+
+func TestProjectOverviewRequestsJSON(t *testing.T) {
+	var formats []string
+	client := setupOllamaClientTest(t, func(w http.ResponseWriter, r *http.Request) {
+		var req generateRequest
+		if err := json.NewDecoder(r.Body).Decode(&req); err != nil {
+			t.Errorf("failed to decode request: %v", err)
+		}
+		formats = append(formats, req.Format)
+		json.NewEncoder(w).Encode(generateResponse{Response: `{"project_type": "Go backend"}`, Done: true})
+	})
+
+	if result := <-requestProjectOverview(client, "structure"); result.Err != nil {
+		t.Fatalf("requestProjectOverview() returned an error: %v", result.Err)
+	}
+	if _, err := client.ollamaRequest("system", "prompt"); err != nil {
+		t.Fatalf("ollamaRequest() returned an error: %v", err)
+	}
+	if !slices.Equal(formats, []string{"json", ""}) {
+		t.Errorf("expected only the overview to ask for JSON, got formats %q", formats)
+	}
+}
+
+func TestStructuredRequestsUseStructuredModel(t *testing.T) {
+	var mu sync.Mutex
+	models := make(map[string]string)
+	client := setupOllamaClientTest(t, func(w http.ResponseWriter, r *http.Request) {
+		var req generateRequest
+		if err := json.NewDecoder(r.Body).Decode(&req); err != nil {
+			t.Errorf("failed to decode request: %v", err)
+		}
+		mu.Lock()
+		models[req.System] = req.Model
+		mu.Unlock()
+		json.NewEncoder(w).Encode(generateResponse{Response: "1. FINISH\n", Done: true})
+	})
+	if client.structured() != client {
+		t.Fatal("expected a single model unless structured_model is configured")
+	}
+	config.AppConfig.Ollama.StructuredModel = "small-model"
+	client, err := NewOllamaClient()
+	if err != nil {
+		t.Fatalf("Failed to create Ollama client: %v", err)
+	}
+
+	if _, err := requestPlan(client, "prompt"); err != nil {
+		t.Fatalf("requestPlan() returned an error: %v", err)
+	}
+	<-requestProjectOverview(client, "structure")
+	if _, err := client.ollamaRequest(analyzeSystemPrompt, "prompt"); err != nil {
+		t.Fatalf("ollamaRequest() returned an error: %v", err)
+	}
+	want := map[string]string{
+		planSystemPrompt:            "small-model",
+		projectOverviewSystemPrompt: "small-model",
+		analyzeSystemPrompt:         "test-model",
+	}
+	for system, model := range want {
+		if models[system] != model {
+			t.Errorf("request %q used model %q, want %q", system, models[system], model)
+		}
+	}
+}
+
+func TestPreloadModel(t *testing.T) {
+	var received generateRequest
+	client := setupOllamaClientTest(t, func(w http.ResponseWriter, r *http.Request) {
+		if err := json.NewDecoder(r.Body).Decode(&received); err != nil {
+			t.Errorf("failed to decode request: %v", err)
+		}
+		json.NewEncoder(w).Encode(generateResponse{Done: true})
+	})
+
+	if err := client.preloadModel(); err != nil {
+		t.Fatalf("preloadModel() returned an error: %v", err)
+	}
+	if received.Prompt != "" || received.KeepAlive != "30m" || received.Options == nil || received.Options.NumCtx != 4096 {
+		t.Errorf("expected an empty prompt with keep_alive and num_ctx, got %+v", received)
+	}
+}
+
+func TestOllamaStreamLines(t *testing.T) {
+	var requests atomic.Int32
+	client := setupOllamaClientTest(t, func(w http.ResponseWriter, r *http.Request) {
+		requests.Add(1)
+		var req generateRequest
+		json.NewDecoder(r.Body).Decode(&req)
+		if !req.Stream {
+			t.Error("expected a streaming request")
+		}
+		encoder := json.NewEncoder(w)
+		for _, chunk := range []string{"1. READ_", "FILE main.go\n2. FIN", "ISH\n3. ANALYZE ignored\n"} {
+			encoder.Encode(generateResponse{Response: chunk})
+		}
+		encoder.Encode(generateResponse{Done: true})
+	})
+
+	plan, err := requestPlan(client, "prompt")
+	if err != nil {
+		t.Fatalf("requestPlan() returned an error: %v", err)
+	}
+	expected := []string{"READ_FILE main.go", "FINISH"}
+	if len(plan) != len(expected) || plan[0] != expected[0] || plan[1] != expected[1] {
+		t.Errorf("expected %v, got %v", expected, plan)
+	}
+
+	// The same context is planned from the cache
+	if cached, err := requestPlan(client, "prompt"); err != nil || !slices.Equal(cached, expected) {
+		t.Errorf("expected the cached plan %v, got %v (%v)", expected, cached, err)
+	}
+	if requests.Load() != 1 {
+		t.Errorf("expected a single request to Ollama, got %d", requests.Load())
+	}
+}
+
+func TestOllamaRequestReusesConnection(t *testing.T) {
+	var newConns atomic.Int32
+	client := setupOllamaClientTest(t, func(w http.ResponseWriter, r *http.Request) {
+		t.Error("unexpected request to the default test server")
+	})
+	server := httptest.NewUnstartedServer(http.HandlerFunc(func(w http.ResponseWriter, r *http.Request) {
+		json.NewEncoder(w).Encode(generateResponse{Response: "ok", Done: true})
+	}))
+	server.Config.ConnState = func(_ net.Conn, state http.ConnState) {
+		if state == http.StateNew {
+			newConns.Add(1)
+		}
+	}
+	server.Start()
+	t.Cleanup(server.Close)
+	client.generateURL = server.URL + "/api/generate"
+
+	for i := 0; i < 3; i++ {
+		if _, err := client.ollamaRequest("system", fmt.Sprintf("prompt %d", i)); err != nil {
+			t.Fatalf("ollamaRequest() returned an error: %v", err)
+		}
+	}
+	if got := newConns.Load(); got != 1 {
+		t.Errorf("expected a single connection to be reused, got %d", got)
+	}
+}
+
+func TestOllamaRequestCachesResponses(t *testing.T) {
+	var calls atomic.Int32
+	client := setupOllamaClientTest(t, func(w http.ResponseWriter, r *http.Request) {
+		calls.Add(1)
+		json.NewEncoder(w).Encode(generateResponse{Response: "answer", Done: true})
+	})
+
+	for i := 0; i < 2; i++ {
+		if response, err := client.ollamaRequest("system", "prompt"); err != nil || response != "answer" {
+			t.Fatalf("ollamaRequest() = %q, %v", response, err)
+		}
+	}
+	if _, err := client.ollamaRequest("other system", "prompt"); err != nil {
+		t.Fatalf("ollamaRequest() returned an error: %v", err)
+	}
+	if got := calls.Load(); got != 2 {
+		t.Errorf("expected the repeated request to be served from cache (2 calls), got %d calls", got)
+	}
+}
+
+func TestOllamaRequestSharesConcurrentIdenticalRequests(t *testing.T) {
+	var calls atomic.Int32
+	release := make(chan struct{})
+	client := setupOllamaClientTest(t, func(w http.ResponseWriter, r *http.Request) {
+		calls.Add(1)
+		<-release
+		json.NewEncoder(w).Encode(generateResponse{Response: "answer", Done: true})
+	})
+
+	const callers = 8
+	var wg sync.WaitGroup
+	responses := make([]string, callers)
+	for i := 0; i < callers; i++ {
+		wg.Add(1)
+		go func(i int) {
+			defer wg.Done()
+			responses[i], _ = client.ollamaRequest("system", "prompt")
+		}(i)
+	}
+	time.Sleep(50 * time.Millisecond)
+	close(release)
+	wg.Wait()
+
+	for i, response := range responses {
+		if response != "answer" {
+			t.Errorf("caller %d got %q, want %q", i, response, "answer")
+		}
+	}
+	if got := calls.Load(); got != 1 {
+		t.Errorf("expected identical concurrent requests to share one call, got %d calls", got)
+	}
+}
+
+func TestInflightCallsSharesErrors(t *testing.T) {
+	calls := inflightCalls{calls: make(map[[sha256.Size]byte]*ollamaCall)}
+	key := responseCacheKey("model", "system", "prompt", 0, "")
+
+	call, leader := calls.join(key)
+	waiter, waiterLeads := calls.join(key)
+	if !leader || waiterLeads || waiter != call {
+		t.Fatalf("expected the second caller to join the first call")
+	}
+	calls.finish(key, call, "", errors.New("unavailable"))
+	<-waiter.done
+	if waiter.err == nil {
+		t.Error("expected the waiting caller to receive the error")
+	}
+	// Une requête échouée n'est pas gardée: l'appel suivant la renvoie
+	if _, leader := calls.join(key); !leader {
+		t.Error("expected a new call after the previous one finished")
+	}
+}
+
+func TestResponseCacheKeyKeepsWhitespace(t *testing.T) {
+	key := responseCacheKey("model", "system", "File: tasks.py\ndef run():\n    return 1\n", 0, "")
+	if other := responseCacheKey("model", "system", "File: tasks.py\ndef run():\n\treturn 1\n", 0, ""); other == key {
+		t.Error("expected prompts differing only in indentation to have different keys")
+	}
+	if other := responseCacheKey("model", "system", "File: tasks.py\ndef run():\n    return 1\n", 0, ""); other != key {
+		t.Error("expected identical prompts to share a key")
+	}
+}
+
+func TestResponseCacheKeyIncludesLimitAndFormat(t *testing.T) {
+	key := responseCacheKey("model", "system", "prompt", 256, "")
+	for _, other := range [][sha256.Size]byte{
+		responseCacheKey("model", "system", "prompt", 512, ""),
+		responseCacheKey("model", "system", "prompt", 256, "json"),
+	} {
+		if other == key {
+			t.Error("expected a different token limit or format to change the key")
+		}
+	}
+}
+
+func TestResponseCacheEvictsLeastRecentlyUsed(t *testing.T) {
+	cache := newResponseCache()
+	first := responseCacheKey("model", "system", "first", 0, "")
+	cache.put(first, "1")
+	for i := 0; i < maxCachedResponses; i++ {
+		cache.put(responseCacheKey("model", "system", fmt.Sprint(i), 0, ""), "x")
+		if i == 0 {
+			cache.get(first) // Garder la première entrée récente
+		}
+	}
+	if _, ok := cache.get(first); !ok {
+		t.Error("expected a recently used entry to survive eviction")
+	}
+	if _, ok := cache.get(responseCacheKey("model", "system", "0", 0, "")); ok {
+		t.Error("expected the least recently used entry to be evicted")
+	}
+	if cache.order.Len() != maxCachedResponses {
+		t.Errorf("expected %d entries, got %d", maxCachedResponses, cache.order.Len())
+	}
+}
+
+func TestCleanResponse(t *testing.T) {
+	tests := map[string]string{
+		"Go Backend":                       "Go Backend",
+		"  `Go Backend`\n":                 "Go Backend",
+		"```Go Backend```":                 "Go Backend",
+		"```json\n{\"a\": 1}\n```":         `{"a": 1}`,
+		"```\n1. READ_FILE main.go\n```\n": "1. READ_FILE main.go",
+		"```{\"a\": 1}\n```":               `{"a": 1}`,
+	}
+	for input, want := range tests {
+		if got := cleanResponse(input); got != want {
+			t.Errorf("cleanResponse(%q) = %q, want %q", input, got, want)
+		}
+	}
+}
+
+func TestOllamaRequestDoesNotEscapeHTML(t *testing.T) {
+	var body string
+	client := setupOllamaClientTest(t, func(w http.ResponseWriter, r *http.Request) {
+		raw, _ := io.ReadAll(r.Body)
+		body = string(raw)
+		json.NewEncoder(w).Encode(generateResponse{Response: "ok", Done: true})
+	})
+
+	if _, err := client.ollamaRequest("system", "if a < b && b > c {}"); err != nil {
+		t.Fatalf("ollamaRequest() returned an error: %v", err)
+	}
+	if !strings.Contains(body, `"prompt":"if a < b && b > c {}"`) {
+		t.Errorf("expected the prompt to be sent without HTML escaping, got %s", body)
+	}
+}
+
+func TestNewGenerateRequestLimitsTokens(t *testing.T) {
+	client := setupOllamaClientTest(t, func(w http.ResponseWriter, r *http.Request) {})
+
+	req := client.newGenerateRequest("system", "prompt", 0)
+	if req.Options == nil || req.Options.NumPredict != 0 || req.Options.NumCtx != 4096 {
+		t.Errorf("expected only num_ctx without a token limit, got %+v", req.Options)
+	}
+	req = client.newGenerateRequest("system", "prompt", 64)
+	if req.Options == nil || req.Options.NumPredict != 64 || req.Options.NumCtx != 4096 {
+		t.Errorf("expected num_predict 64 and num_ctx 4096, got %+v", req.Options)
+	}
+
+	// Dernier recours: la coupe ne sépare pas un caractère UTF-8
+	req = client.newGenerateRequest("system", "x"+strings.Repeat("é", maxPromptChars()), 0)
+	if len(req.Prompt) > maxPromptChars() || !utf8.ValidString(req.Prompt) {
+		t.Errorf("expected a valid prompt of at most %d bytes, got %d bytes", maxPromptChars(), len(req.Prompt))
+	}
+}
+
+func TestOllamaClientsShareTheRequestLimit(t *testing.T) {
+	first := setupOllamaClientTest(t, func(w http.ResponseWriter, r *http.Request) {})
+	second, err := NewOllamaClient()
+	if err != nil {
+		t.Fatalf("Failed to create Ollama client: %v", err)
+	}
+	if first.inFlight != second.inFlight {
+		t.Error("expected concurrent analyses to share max_parallel_requests")
+	}
+}
+
+func TestSummarizeReadFilesSendsBatchesConcurrently(t *testing.T) {
+	var inFlight, maxInFlight atomic.Int32
+	client := setupOllamaClientTest(t, func(w http.ResponseWriter, r *http.Request) {
+		current := inFlight.Add(1)
+		defer inFlight.Add(-1)
+		for {
+			seen := maxInFlight.Load()
+			if current <= seen || maxInFlight.CompareAndSwap(seen, current) {
+				break
+			}
+		}
+		time.Sleep(20 * time.Millisecond)
+
+		var req generateRequest
+		json.NewDecoder(r.Body).Decode(&req)
+		summaries := make([]string, strings.Count(req.Prompt, "--- FILE "))
+		for i := range summaries {
+			summaries[i] = "A source file."
+		}
+		response, _ := json.Marshal(summaries)
+		json.NewEncoder(w).Encode(generateResponse{Response: string(response), Done: true})
+	})
+	client.inFlight = make(chan struct{}, 2)
+
+	kb := NewKnowledgeBase(t.TempDir())
+	for i := 0; i < 2*maxFilesPerSummaryBatch; i++ {
+		kb.AddFileContent(filepath.Join(kb.ProjectPath, fmt.Sprintf("file%d.go", i)), fmt.Sprintf("package file%d", i))
+	}
+
+	summarizeReadFiles(kb, client)
+	if len(kb.FileSummaries) != 2*maxFilesPerSummaryBatch {
+		t.Errorf("expected %d file summaries, got %d", 2*maxFilesPerSummaryBatch, len(kb.FileSummaries))
+	}
+	if maxInFlight.Load() != 2 {
+		t.Errorf("expected both batches to be sent at once, got at most %d in flight", maxInFlight.Load())
+	}
+}
+
+func TestOllamaRequestIsCachedOnDisk(t *testing.T) {
+	t.Setenv("XDG_CACHE_HOME", t.TempDir())
+	t.Setenv("HOME", t.TempDir())
+	var requests atomic.Int32
+	client := setupOllamaClientTest(t, func(w http.ResponseWriter, r *http.Request) {
+		requests.Add(1)
+		json.NewEncoder(w).Encode(generateResponse{Response: `{"project_type": "Go backend"}`, Done: true})
+	})
+	if client.cacheDir != "" {
+		t.Fatal("expected the disk cache to be disabled unless configured")
+	}
+	client.cacheDir = responseCacheDir()
+
+	first := <-requestProjectOverview(client, "structure of the project")
+	// A restart loses the in-memory responses: the overview must come from the disk cache
+	ollamaResponses = newResponseCache()
+	second := <-requestProjectOverview(client, "structure of the project")
+	if first.Err != nil || second.Err != nil || second.Response != first.Response {
+		t.Fatalf("expected the same overview twice, got %+v and %+v", first, second)
+	}
+	if requests.Load() != 1 {
+		t.Errorf("expected a single request to Ollama, got %d", requests.Load())
+	}
+
+	if _, err := client.ollamaRequest("system", "structure of the project"); err != nil {
+		t.Fatalf("ollamaRequest() returned an error: %v", err)
+	}
+	if requests.Load() != 2 {
+		t.Errorf("expected a new request for a different system prompt, got %d requests", requests.Load())
+	}
+
+	// A response older than maxCachedResponseAge is requested again
+	cachePath := client.responseCachePath(responseCacheKey(client.model, "system", "structure of the project", 0, ""))
+	old := time.Now().Add(-maxCachedResponseAge - time.Minute)
+	if err := os.Chtimes(cachePath, old, old); err != nil {
+		t.Fatalf("Failed to age the cached response: %v", err)
+	}
+	ollamaResponses = newResponseCache()
+	if _, err := client.ollamaRequest("system", "structure of the project"); err != nil {
+		t.Fatalf("ollamaRequest() returned an error: %v", err)
+	}
+	if requests.Load() != 3 {
+		t.Errorf("expected an expired response to be requested again, got %d requests", requests.Load())
+	}
+}
+
+func TestSweepResponseCache(t *testing.T) {
+	dir := t.TempDir()
+	write := func(name string, size int, age time.Duration) string {
+		path := filepath.Join(dir, name[:2], name)
+		if err := os.MkdirAll(filepath.Dir(path), 0o755); err != nil {
+			t.Fatalf("Failed to create %s: %v", filepath.Dir(path), err)
+		}
+		if err := os.WriteFile(path, []byte(strings.Repeat("x", size)), 0o644); err != nil {
+			t.Fatalf("Failed to create %s: %v", path, err)
+		}
+		modTime := time.Now().Add(-age)
+		if err := os.Chtimes(path, modTime, modTime); err != nil {
+			t.Fatalf("Failed to age %s: %v", path, err)
+		}
+		return path
+	}
+	expired := write("aa01", 10, maxCachedResponseAge+time.Minute)
+	oldest := write("bb01", maxResponseCacheBytes/2, 3*time.Hour)
+	older := write("bb02", maxResponseCacheBytes/2, 2*time.Hour)
+	recent := write("cc01", 10, time.Hour)
+
+	sweepResponseCache(dir)
+
+	for path, kept := range map[string]bool{expired: false, oldest: false, older: true, recent: true} {
+		if _, err := os.Stat(path); (err == nil) != kept {
+			t.Errorf("%s: expected kept=%v, stat returned %v", filepath.Base(path), kept, err)
+		}
+	}
+}
@@ -0,0 +1,181 @@
+package main
+
+import (
+	"debugagent/config"
+	"fmt"
+	"strings"
+	"unicode/utf8"
+
+	"github.com/sirupsen/logrus"
+)
+
+// omittedContextMarker replaces the part of the context dropped by fitPrompt.
+const omittedContextMarker = "[... contexte ancien omis ...]\n"
+
+// planGuidelines is the instruction block appended to every planning prompt.
+const planGuidelines = `
+---
+IMPORTANT GUIDELINES:
+- DO NOT request files that are listed as "Non Disponibles" - they don't exist
+- Use available dependency files when looking for project information
+- If you need dependency info, use the files listed in "Fichiers de Dépendances Disponibles"
+- Avoid repeating failed operations from previous iterations
+
+Propose the next 3-5 logical steps. Use actions: READ_FILE <path>, SEARCH_CODE <term> [in <directory>], ANALYZE <subject>, FINISH.
+MANDATORY output format: Simple numbered list.
+Example:
+1. READ_FILE main.go
+2. SEARCH_CODE handleRequest
+3. ANALYZE the application entry point
+`
+
+// maxSummaryExcerpt is the number of bytes of each file sent for its one-sentence summary.
+const maxSummaryExcerpt = 1500
+
+// System prompts of the requests sent to the model. They are constants so every request of a
+// kind starts with the same bytes, which keeps the server's prompt cache and the response cache
+// effective.
+const (
+	projectOverviewSystemPrompt = "You are a software architecture expert. Respond ONLY with the requested JSON object."
+	planSystemPrompt            = "You are a code exploration planner. Respond ONLY with the numbered list of actions."
+	analyzeSystemPrompt         = "You are a code analysis assistant."
+	fileSummariesSystemPrompt   = "You summarize source files. Respond ONLY with the requested JSON array."
+	historySummarySystemPrompt  = "You summarize the progress of a code exploration agent."
+)
+
+// Token limits of the requests whose answer is short and structured. A model that keeps going
+// past the expected answer is stopped there instead of at its default generation limit.
+const (
+	maxOverviewTokens       = 256
+	maxPlanTokens           = 256
+	maxHistorySummaryTokens = 160
+	maxTokensPerFileSummary = 64
+)
+
+// maxHistoryEntryExcerpt is the number of bytes of each entry sent for the history summary.
+const maxHistoryEntryExcerpt = 200
+
+// finalAnswerSystemPrompt holds all the instructions of the final answer request. It never
+// changes, so the server can reuse the cached prefix of one final request for the next instead
+// of reprocessing it; the user prompt only carries the collected context and the question.
+const finalAnswerSystemPrompt = `You are an expert AI assistant who synthesizes technical information.
+You receive the context collected while exploring a project, followed by the user's initial question.
+Synthesize all this information to provide a complete and structured answer to that question.`
+
+// charsPerToken approximates the number of characters covered by one token, and
+// reservedReplyTokens the part of the context window kept for the system prompt and the reply.
+const (
+	charsPerToken       = 4
+	reservedReplyTokens = 2048
+)
+
+// maxPromptChars returns the length budget of a prompt: analysis.max_prompt_length, lowered when
+// the context window set by ollama.num_ctx could not hold such a prompt along with the reply.
+// Prompts are then trimmed here, where the question and instructions are kept, instead of being
+// cut blindly by the server.
+func maxPromptChars() int {
+	maxLen := config.AppConfig.Analysis.MaxPromptLength
+	if numCtx := config.AppConfig.Ollama.NumCtx; numCtx > 0 {
+		windowLen := max(numCtx-reservedReplyTokens, numCtx/2) * charsPerToken
+		if maxLen <= 0 || windowLen < maxLen {
+			maxLen = windowLen
+		}
+	}
+	return maxLen
+}
+
+// fitPrompt assembles a prompt from its header, context body and instruction tail. When the
+// result exceeds maxLen, the middle of the body is dropped: the header, the first paragraph of
+// the body (the question and project metadata of a context summary), the most recent context
+// and the instructions in the tail always reach the model intact.
+func fitPrompt(head, body, tail string, maxLen int) string {
+	if maxLen <= 0 || len(head)+len(body)+len(tail) <= maxLen {
+		return head + body + tail
+	}
+
+	budget := maxLen - len(head) - len(tail) - len(omittedContextMarker)
+	if budget <= 0 {
+		logrus.Warnf("Prompt instructions alone exceed %d characters, dropping the whole context.", maxLen)
+		return head + omittedContextMarker + tail
+	}
+
+	// Keep the leading paragraph as long as it leaves most of the budget to the recent context
+	lead := ""
+	if end := strings.Index(body, "\n\n"); end != -1 && end+1 <= budget/2 {
+		lead, body = body[:end+1], body[end+1:]
+		budget -= len(lead)
+	}
+
+	// Keep the end of the body, starting on a line boundary when possible and never mid-rune
+	cut := len(body) - budget
+	if newline := strings.IndexByte(body[cut:], '\n'); newline != -1 {
+		cut += newline + 1
+	} else {
+		for cut < len(body) && !utf8.RuneStart(body[cut]) {
+			cut++
+		}
+	}
+	logrus.Warnf("Prompt context is being trimmed by %d characters to fit %d characters.", cut, maxLen)
+	return head + lead + omittedContextMarker + body[cut:] + tail
+}
+
+// buildPlanPrompt builds the prompt asking the model for the next exploration steps.
+func buildPlanPrompt(question, contextSummary string, maxLen int) string {
+	head := fmt.Sprintf("\nObjective: Answer \"%s\"\nCurrent Context:\n", question)
+	return fitPrompt(head, contextSummary, planGuidelines, maxLen)
+}
+
+// buildAnalyzePrompt builds the prompt asking the model to analyze a subject.
+func buildAnalyzePrompt(subject, contextSummary string, maxLen int) string {
+	tail := fmt.Sprintf("\n---\nAnalyze the following question: \"%s\"", subject)
+	return fitPrompt("\nContext: ", contextSummary, tail, maxLen)
+}
+
+// buildFinalPrompt builds the prompt asking the model for the final answer.
+func buildFinalPrompt(question, finalContext string, maxLen int) string {
+	tail := fmt.Sprintf("\n---\nUser's initial question: \"%s\"", question)
+	return fitPrompt("\nFinal collected context:\n", finalContext, tail, maxLen)
+}
+
+// buildProjectOverviewPrompt builds the single request that classifies the project from its
+// structure and key files and suggests which files to read first.
+func buildProjectOverviewPrompt(kb *KnowledgeBase, files []keyFile, maxLen int) string {
+	// The project directory name is left out: an uploaded project lives in a randomly named
+	// temporary directory, which would make every prompt, and its cache key, unique
+	head := fmt.Sprintf("\nInitial project context:\nProject Structure (partial): %s\n", kb.structureForPrompt())
+	var body strings.Builder
+	if len(files) > 0 {
+		body.WriteString("\nKey project files:\n")
+		for i, file := range files {
+			fmt.Fprintf(&body, "--- FILE %d: %s ---\n%s\n", i+1, file.Path, file.Content)
+		}
+	}
+	return fitPrompt(head, body.String(), `---
+Based on the structure and these files, what is the type of this project (e.g., Go Backend, React Frontend)?
+Also list up to 3 other project files worth reading first to understand it.
+MANDATORY output format: {"project_type": "<1 sentence>", "files_to_read": ["<path>", ...]}`, maxLen)
+}
+
+// buildFileSummariesPrompt builds the single request that summarizes a batch of read files.
+func buildFileSummariesPrompt(files []keyFile, maxLen int) string {
+	var body strings.Builder
+	for i, file := range files {
+		fmt.Fprintf(&body, "--- FILE %d: %s ---\n%s\n", i+1, file.Path, file.Content[:min(maxSummaryExcerpt, len(file.Content))])
+	}
+	tail := fmt.Sprintf(`---
+Summarize each of the %d files above in one sentence.
+MANDATORY output format: a JSON array of %d strings, in the same order as the files.`, len(files), len(files))
+	return fitPrompt("", body.String(), tail, maxLen)
+}
+
+// buildHistorySummaryPrompt builds the request that folds older notes and history entries into
+// a short summary.
+func buildHistorySummaryPrompt(entries []string, maxLen int) string {
+	var body strings.Builder
+	for _, entry := range entries {
+		body.WriteString("- ")
+		body.WriteString(entry[:min(maxHistoryEntryExcerpt, len(entry))])
+		body.WriteByte('\n')
+	}
+	return fitPrompt("\nPast exploration steps and notes:\n", body.String(), "\n---\nSummarize these past steps and findings in 2 sentences.", maxLen)
+}
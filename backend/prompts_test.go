@@ -0,0 +1,102 @@
+package main
+
+import (
+	"debugagent/config"
+	"strings"
+	"testing"
+	"unicode/utf8"
+)
+
+func TestFitPrompt(t *testing.T) {
+	if got := fitPrompt("H:", "body", ":T", 100); got != "H:body:T" {
+		t.Errorf("fitPrompt() = %q, want the untouched prompt", got)
+	}
+
+	body := "oldest line\n" + strings.Repeat("older line\n", 20) + "recent line\n"
+	maxLen := len("H:") + len(":T") + len(omittedContextMarker) + len("recent line\n") + 3
+	got := fitPrompt("H:", body, ":T", maxLen)
+	if !strings.HasPrefix(got, "H:"+omittedContextMarker) || !strings.HasSuffix(got, ":T") {
+		t.Errorf("fitPrompt() should keep header and tail intact, got %q", got)
+	}
+	if strings.Contains(got, "oldest line") || !strings.Contains(got, "recent line") {
+		t.Errorf("fitPrompt() should drop the oldest context first, got %q", got)
+	}
+	if len(got) > maxLen {
+		t.Errorf("fitPrompt() returned %d characters, limit was %d", len(got), maxLen)
+	}
+}
+
+func TestBuildPlanPromptKeepsInstructions(t *testing.T) {
+	prompt := buildPlanPrompt("What does it do?", strings.Repeat("context\n", 1000), 2000)
+	if !strings.HasSuffix(prompt, planGuidelines) {
+		t.Error("buildPlanPrompt() lost the planning instructions when trimming")
+	}
+	if !strings.Contains(prompt, `Objective: Answer "What does it do?"`) {
+		t.Error("buildPlanPrompt() lost the objective when trimming")
+	}
+}
+
+func TestBuildFinalPromptKeepsInstructionsOutOfUserPrompt(t *testing.T) {
+	prompt := buildFinalPrompt("What does it do?", "context\n", 2000)
+	if strings.Contains(prompt, "Synthesize") {
+		t.Error("buildFinalPrompt() should leave the static instructions to finalAnswerSystemPrompt")
+	}
+	if !strings.HasSuffix(prompt, `User's initial question: "What does it do?"`) {
+		t.Errorf("buildFinalPrompt() should end with the question, got %q", prompt)
+	}
+}
+
+func TestFitPromptKeepsLeadingParagraph(t *testing.T) {
+	body := "Question\nProject\n\n" + strings.Repeat("older line\n", 20) + "recent line\n"
+	maxLen := len("H:") + len(":T") + len(omittedContextMarker) + len("Question\nProject\n") + len("recent line\n") + 20
+	got := fitPrompt("H:", body, ":T", maxLen)
+	if !strings.HasPrefix(got, "H:Question\nProject\n"+omittedContextMarker) {
+		t.Errorf("fitPrompt() should keep the leading paragraph of the body, got %q", got)
+	}
+	if !strings.HasSuffix(got, "recent line\n:T") || len(got) > maxLen {
+		t.Errorf("fitPrompt() should keep the recent context within %d characters, got %q", maxLen, got)
+	}
+}
+
+func TestMaxPromptChars(t *testing.T) {
+	config.AppConfig = &config.Config{
+		Ollama:   config.OllamaConfig{NumCtx: 16384},
+		Analysis: config.AnalysisConfig{MaxPromptLength: 50000},
+	}
+	if got := maxPromptChars(); got != 50000 {
+		t.Errorf("maxPromptChars() = %d, want max_prompt_length when it fits the context window", got)
+	}
+
+	config.AppConfig.Ollama.NumCtx = 4096
+	if got, want := maxPromptChars(), (4096-reservedReplyTokens)*charsPerToken; got != want {
+		t.Errorf("maxPromptChars() = %d, want %d for a small context window", got, want)
+	}
+}
+
+func TestBuildHistorySummaryPrompt(t *testing.T) {
+	prompt := buildHistorySummaryPrompt([]string{"Read main.go", strings.Repeat("x", 300)}, 0)
+	want := "\nPast exploration steps and notes:\n- Read main.go\n- " + strings.Repeat("x", maxHistoryEntryExcerpt) + "\n\n---\n"
+	if !strings.HasPrefix(prompt, want) {
+		t.Errorf("buildHistorySummaryPrompt() = %q, want prefix %q", prompt, want)
+	}
+}
+
+func TestSummaryPromptsKeepInstructions(t *testing.T) {
+	files := []keyFile{{Path: "a.go", Content: strings.Repeat("é", maxSummaryExcerpt)}, {Path: "b.go", Content: "package b"}}
+	prompt := buildFileSummariesPrompt(files, 1000)
+	if !strings.HasSuffix(prompt, "in the same order as the files.") || len(prompt) > 1000 {
+		t.Errorf("buildFileSummariesPrompt() should keep its instructions within 1000 characters, got %q", prompt)
+	}
+	if !utf8.ValidString(prompt) {
+		t.Error("buildFileSummariesPrompt() split a multi-byte character")
+	}
+
+	entries := make([]string, 100)
+	for i := range entries {
+		entries[i] = strings.Repeat("note ", 30)
+	}
+	prompt = buildHistorySummaryPrompt(entries, 1000)
+	if !strings.HasSuffix(prompt, "in 2 sentences.") || len(prompt) > 1000 {
+		t.Errorf("buildHistorySummaryPrompt() should keep its instructions within 1000 characters, got %q", prompt)
+	}
+}
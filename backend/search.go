@@ -0,0 +1,549 @@
+package main
+
+import (
+	"bufio"
+	"bytes"
+	"context"
+	"errors"
+	"fmt"
+	"io"
+	"io/fs"
+	"os"
+	"os/exec"
+	"path/filepath"
+	"regexp"
+	"runtime"
+	"sort"
+	"strings"
+	"sync"
+	"time"
+	"unicode/utf8"
+
+	"github.com/sirupsen/logrus"
+)
+
+const (
+	// maxSearchResults limite le nombre de fichiers retenus pour une recherche.
+	maxSearchResults = 20
+	// searchTimeout borne la durée d'une recherche ripgrep; au-delà, les meilleurs résultats déjà
+	// lus sont gardés.
+	searchTimeout = 60 * time.Second
+	// mmapThreshold est la taille à partir de laquelle un fichier est projeté en mémoire plutôt
+	// que lu: en dessous, le coût de mise en place du mmap dépasse celui de la copie.
+	mmapThreshold = 64 * 1024
+	// maxSearchWorkers limite le nombre de fichiers lus en parallèle par la recherche de repli.
+	maxSearchWorkers = 32
+)
+
+var (
+	ripgrepBin  string
+	ripgrepOnce sync.Once
+)
+
+// ripgrepPath renvoie le chemin de ripgrep, ou une chaîne vide s'il n'est pas installé. Le PATH
+// n'est parcouru qu'une fois, et non à chaque recherche.
+func ripgrepPath() string {
+	ripgrepOnce.Do(func() {
+		if path, err := exec.LookPath("rg"); err == nil {
+			ripgrepBin = path
+		} else {
+			logrus.Info("ripgrep introuvable, la recherche de code parcourra les fichiers directement")
+		}
+	})
+	return ripgrepBin
+}
+
+// searchMatch est un fichier contenant le terme recherché, avec son nombre de correspondances.
+type searchMatch struct {
+	Path  string
+	Count int
+}
+
+// searchCode cherche le terme dans le projet (insensible à la casse), avec ripgrep s'il est
+// installé et un parcours du projet sinon. dir restreint la recherche à un sous-dossier du projet;
+// s'il est vide ou invalide, tout le projet est parcouru. Les chemins renvoyés sont relatifs au
+// projet et triés par nombre de correspondances.
+func searchCode(projectPath, term, dir string) ([]searchMatch, error) {
+	term = strings.TrimSpace(term)
+	if term == "" {
+		return nil, errors.New("terme de recherche vide")
+	}
+	dir = resolveSearchDir(projectPath, dir)
+
+	var matches []searchMatch
+	var err error
+	if rgPath := ripgrepPath(); rgPath != "" {
+		matches, err = searchWithRipgrep(rgPath, projectPath, dir, term)
+	} else {
+		matches, err = searchWithWalk(projectPath, dir, term)
+	}
+	if err != nil {
+		return nil, err
+	}
+	return keepTopMatches(matches), nil
+}
+
+// keepTopMatches trie les correspondances par nombre d'occurrences décroissant, puis par chemin,
+// et ne garde que les maxSearchResults premières.
+func keepTopMatches(matches []searchMatch) []searchMatch {
+	sort.Slice(matches, func(i, j int) bool {
+		if matches[i].Count != matches[j].Count {
+			return matches[i].Count > matches[j].Count
+		}
+		return matches[i].Path < matches[j].Path
+	})
+	return matches[:min(len(matches), maxSearchResults)]
+}
+
+// resolveSearchDir renvoie dir nettoyé s'il désigne un dossier existant du projet, et une
+// chaîne vide sinon.
+func resolveSearchDir(projectPath, dir string) string {
+	dir = filepath.Clean(strings.Trim(strings.TrimSpace(dir), "/\\"))
+	if dir == "." || filepath.IsAbs(dir) || dir == ".." || strings.HasPrefix(dir, ".."+string(filepath.Separator)) {
+		return ""
+	}
+	if info, err := os.Stat(filepath.Join(projectPath, dir)); err != nil || !info.IsDir() {
+		return ""
+	}
+	return dir
+}
+
+// searchWithRipgrep lance `rg --count-matches --null` et lit sa sortie ligne par ligne au fil de
+// l'eau, sans attendre la fin du processus ni garder toute la sortie en mémoire: seules les
+// meilleures correspondances sont conservées pendant la lecture.
+func searchWithRipgrep(rgPath, projectPath, dir, term string) ([]searchMatch, error) {
+	if dir == "" {
+		dir = "."
+	}
+	ctx, cancel := context.WithTimeout(context.Background(), searchTimeout)
+	defer cancel()
+
+	cmd := exec.CommandContext(ctx, rgPath, "--count-matches", "--null", "--ignore-case", "--fixed-strings", "--no-messages", "--", term, dir)
+	cmd.Dir = projectPath
+	stdout, err := cmd.StdoutPipe()
+	if err != nil {
+		return nil, fmt.Errorf("impossible de lire la sortie de ripgrep: %w", err)
+	}
+	if err := cmd.Start(); err != nil {
+		return nil, fmt.Errorf("impossible de lancer ripgrep: %w", err)
+	}
+
+	matches := make([]searchMatch, 0, 2*maxSearchResults)
+	scanner := bufio.NewScanner(stdout)
+	for scanner.Scan() {
+		if match, ok := parseRipgrepCountLine(scanner.Bytes()); ok {
+			// Sur un grand projet, la liste est réduite dès qu'elle double au lieu de tout garder
+			if len(matches) == cap(matches) {
+				matches = keepTopMatches(matches)
+			}
+			matches = append(matches, match)
+		}
+	}
+	if err := scanner.Err(); err != nil {
+		// Plus rien ne lit la sortie: ripgrep est arrêté au lieu de rester bloqué jusqu'au délai
+		logrus.Warnf("Lecture interrompue de la sortie de ripgrep: %v", err)
+		cancel()
+	}
+
+	// ripgrep sort avec le code 1 quand rien ne correspond
+	if err := cmd.Wait(); err != nil {
+		var exitErr *exec.ExitError
+		if !errors.As(err, &exitErr) || exitErr.ExitCode() != 1 {
+			if errors.Is(ctx.Err(), context.DeadlineExceeded) {
+				logrus.Warnf("Recherche ripgrep de '%s' interrompue après %s, résultats partiels", term, searchTimeout)
+				return matches, nil
+			}
+			return matches, fmt.Errorf("échec de ripgrep: %w", err)
+		}
+	}
+	return matches, nil
+}
+
+// parseRipgrepCountLine lit une ligne `chemin\x00nombre` produite par `rg --count-matches --null`. Le
+// séparateur NUL ne peut pas apparaître dans un chemin, contrairement à ':' (C:\ sous Windows).
+// La ligne est lue directement dans le tampon du scanner: seul le chemin est copié en string.
+func parseRipgrepCountLine(line []byte) (searchMatch, bool) {
+	path, countBytes, found := bytes.Cut(line, []byte{0})
+	if !found || len(path) == 0 || len(countBytes) == 0 {
+		return searchMatch{}, false
+	}
+	count := 0
+	for _, c := range countBytes {
+		if c < '0' || c > '9' {
+			return searchMatch{}, false
+		}
+		count = count*10 + int(c-'0')
+	}
+	return searchMatch{Path: string(trimCurrentDirPrefix(path)), Count: count}, true
+}
+
+// trimCurrentDirPrefix retire le "./" que ripgrep ajoute quand il cherche dans ".". Les chemins
+// de ripgrep sont déjà relatifs au projet: aucun autre calcul de chemin n'est nécessaire.
+func trimCurrentDirPrefix(path []byte) []byte {
+	if len(path) > 2 && path[0] == '.' && (path[1] == '/' || path[1] == filepath.Separator) {
+		return path[2:]
+	}
+	return path
+}
+
+// searchWithWalk est la recherche de repli quand ripgrep n'est pas installé. Elle respecte les
+// mêmes exclusions que l'exploration et compte les occurrences du terme dans chaque fichier.
+func searchWithWalk(projectPath, dir, term string) ([]searchMatch, error) {
+	explorerConfigOnce.Do(initializeExplorerConfig)
+	// Préparé une seule fois pour toute la recherche: évite de recopier chaque fichier en minuscules
+	matcher := newTermMatcher(term)
+
+	paths, err := cachedSearchCandidates(filepath.Join(projectPath, dir))
+	if err != nil {
+		return nil, err
+	}
+
+	// Les lectures sont réparties sur plusieurs goroutines: le temps total suit le fichier le plus
+	// lent plutôt que la somme des lectures
+	counts := make([]int, len(paths))
+	jobs := make(chan int)
+	var wg sync.WaitGroup
+	for w := 0; w < min(maxSearchWorkers, runtime.NumCPU()*4, len(paths)); w++ {
+		wg.Add(1)
+		go func() {
+			defer wg.Done()
+			for i := range jobs {
+				counts[i] = countInFile(paths[i], matcher)
+			}
+		}()
+	}
+	for i := range paths {
+		jobs <- i
+	}
+	close(jobs)
+	wg.Wait()
+
+	// Les chemins du parcours sont tous construits sous projectPath: un simple retrait de préfixe
+	// suffit, sans passer par filepath.Rel pour chaque résultat
+	projectPrefix := filepath.Clean(projectPath) + string(filepath.Separator)
+	matches := make([]searchMatch, 0)
+	for i, count := range counts {
+		if count > 0 {
+			matches = append(matches, searchMatch{Path: strings.TrimPrefix(paths[i], projectPrefix), Count: count})
+		}
+	}
+	return matches, nil
+}
+
+// maxCachedCandidateRoots borne le nombre de dossiers dont la liste de fichiers est gardée en cache.
+const maxCachedCandidateRoots = 16
+
+// candidateList est une liste de fichiers à parcourir, valable tant que le dossier racine n'a pas changé.
+type candidateList struct {
+	modTime time.Time
+	paths   []string
+}
+
+// candidateCache garde, pour tout le processus, la liste des fichiers de chaque dossier déjà
+// parcouru: une exploration lance souvent plusieurs SEARCH_CODE sur le même projet. Les listes
+// d'un projet sont retirées à la fin de son analyse (voir forgetSearchCandidates).
+var candidateCache = struct {
+	sync.Mutex
+	lists map[string]candidateList
+}{lists: make(map[string]candidateList)}
+
+// cachedSearchCandidates renvoie la liste des fichiers sous root, en réutilisant celle de la
+// recherche précédente si la date de modification de root n'a pas changé. Seuls les fichiers
+// ajoutés ou supprimés directement dans root changent cette date: ceux des sous-dossiers ne sont
+// vus qu'une fois la liste retirée, au plus tard à la fin de l'analyse.
+func cachedSearchCandidates(root string) ([]string, error) {
+	info, err := os.Stat(root)
+	if err != nil {
+		return nil, fmt.Errorf("échec du parcours de '%s': %w", root, err)
+	}
+
+	candidateCache.Lock()
+	cached, ok := candidateCache.lists[root]
+	candidateCache.Unlock()
+	if ok && cached.modTime.Equal(info.ModTime()) {
+		return cached.paths, nil
+	}
+
+	paths, err := listSearchCandidates(root)
+	if err != nil {
+		return nil, err
+	}
+	candidateCache.Lock()
+	if len(candidateCache.lists) >= maxCachedCandidateRoots {
+		clear(candidateCache.lists)
+	}
+	candidateCache.lists[root] = candidateList{modTime: info.ModTime(), paths: paths}
+	candidateCache.Unlock()
+	return paths, nil
+}
+
+// forgetSearchCandidates retire du cache les listes de fichiers de projectPath et de ses
+// sous-dossiers. Le dossier d'une analyse est supprimé à sa fin: sa liste ne resservira plus.
+func forgetSearchCandidates(projectPath string) {
+	prefix := projectPath + string(filepath.Separator)
+	candidateCache.Lock()
+	defer candidateCache.Unlock()
+	for root := range candidateCache.lists {
+		if root == projectPath || strings.HasPrefix(root, prefix) {
+			delete(candidateCache.lists, root)
+		}
+	}
+}
+
+// listSearchCandidates liste les fichiers à parcourir sous root, avec les exclusions de l'exploration.
+// Le type de chaque entrée vient de la lecture du dossier: aucun fichier n'est stat ni résolu. Les
+// liens symboliques sont ignorés, comme le fait ripgrep par défaut: ils peuvent désigner un dossier
+// ou sortir du projet.
+func listSearchCandidates(root string) ([]string, error) {
+	paths := make([]string, 0)
+	err := filepath.WalkDir(root, func(path string, entry fs.DirEntry, err error) error {
+		if err != nil {
+			return nil // Ignorer les dossiers illisibles
+		}
+		name := entry.Name()
+		if path != root && isIgnoredName(name) {
+			if entry.IsDir() {
+				return filepath.SkipDir
+			}
+			return nil
+		}
+		if entry.Type().IsRegular() && !isIgnoredExtension(name) {
+			paths = append(paths, path)
+		}
+		return nil
+	})
+	if err != nil {
+		return nil, fmt.Errorf("échec du parcours de '%s': %w", root, err)
+	}
+	return paths, nil
+}
+
+// termMatcher compte les occurrences d'un terme, sans tenir compte de la casse.
+type termMatcher struct {
+	literal  []byte         // Terme sans lettre à casse: compté directement avec bytes.Count
+	folded   []byte         // Terme ASCII avec lettres, en minuscules: compté par countFoldASCII
+	pattern  *regexp.Regexp // Sinon, motif littéral insensible à la casse
+	trigrams []uint32       // Trigrammes du terme pour trigramIndex; vide pour un motif
+}
+
+// maxTermMatcherCacheEntries borne termMatcherCache; le cache est simplement vidé quand il est plein.
+const maxTermMatcherCacheEntries = 256
+
+// termMatcherCache conserve les matchers déjà préparés: le plan relance souvent la même recherche
+// d'une itération à l'autre, et l'expression régulière n'est alors compilée qu'une fois.
+var termMatcherCache = struct {
+	sync.Mutex
+	entries map[string]*termMatcher
+}{entries: make(map[string]*termMatcher)}
+
+// newTermMatcher prépare le comptage d'un terme. Un terme que la casse ne change pas (chiffres,
+// symboles, identifiants comme "_123") ou un terme ASCII, le cas courant des identifiants, est
+// compté sans passer par le moteur d'expressions régulières.
+// Un termMatcher est immuable une fois créé: il peut être partagé entre recherches concurrentes.
+func newTermMatcher(term string) *termMatcher {
+	termMatcherCache.Lock()
+	defer termMatcherCache.Unlock()
+	if matcher, ok := termMatcherCache.entries[term]; ok {
+		return matcher
+	}
+
+	matcher := &termMatcher{literal: []byte(term), trigrams: termTrigrams(term)}
+	if strings.ToLower(term) != strings.ToUpper(term) {
+		if isASCII(term) {
+			matcher = &termMatcher{folded: []byte(strings.ToLower(term)), trigrams: termTrigrams(term)}
+		} else {
+			// Le repli de casse Unicode échappe aux trigrammes en minuscules ASCII
+			matcher = &termMatcher{pattern: regexp.MustCompile("(?i)" + regexp.QuoteMeta(term))}
+		}
+	}
+	if len(termMatcherCache.entries) >= maxTermMatcherCacheEntries {
+		clear(termMatcherCache.entries)
+	}
+	termMatcherCache.entries[term] = matcher
+	return matcher
+}
+
+// count renvoie le nombre d'occurrences du terme dans le contenu.
+func (m *termMatcher) count(content []byte) int {
+	switch {
+	case m.literal != nil:
+		return bytes.Count(content, m.literal)
+	case m.folded != nil:
+		return countFoldASCII(content, m.folded)
+	}
+	// Les correspondances sont comptées une à une, sans construire la liste de leurs positions:
+	// un fichier sans occurrence est écarté par la première recherche
+	count := 0
+	for {
+		loc := m.pattern.FindIndex(content)
+		if loc == nil {
+			return count
+		}
+		count++
+		content = content[loc[1]:]
+	}
+}
+
+// isASCII indique si une chaîne ne contient que des caractères ASCII.
+func isASCII(s string) bool {
+	for i := 0; i < len(s); i++ {
+		if s[i] >= utf8.RuneSelf {
+			return false
+		}
+	}
+	return true
+}
+
+// countFoldASCII compte les occurrences, sans chevauchement, d'un terme ASCII en minuscules, sans
+// tenir compte de la casse ASCII. Les candidats sont trouvés avec bytes.IndexByte sur la première
+// lettre du terme, dans ses deux casses, puis comparés octet par octet: aucune allocation, et le
+// contenu n'est parcouru qu'une fois par casse.
+func countFoldASCII(content, lower []byte) int {
+	n := len(content)
+	first, firstUpper := lower[0], lower[0]
+	if 'a' <= first && first <= 'z' {
+		firstUpper = first - ('a' - 'A')
+	}
+	// Prochaine position de chaque casse de la première lettre, recalculée une fois dépassée
+	indexFrom := func(from int, c byte) int {
+		if j := bytes.IndexByte(content[from:], c); j != -1 {
+			return from + j
+		}
+		return n
+	}
+	nextLower, nextUpper := -1, -1
+	if first == firstUpper {
+		nextUpper = n
+	}
+
+	count := 0
+	for i := 0; i <= n-len(lower); {
+		if nextLower < i {
+			nextLower = indexFrom(i, first)
+		}
+		if nextUpper < i {
+			nextUpper = indexFrom(i, firstUpper)
+		}
+		j := min(nextLower, nextUpper)
+		if j > n-len(lower) {
+			break
+		}
+		if equalFoldASCII(content[j:j+len(lower)], lower) {
+			count++
+			i = j + len(lower)
+		} else {
+			i = j + 1
+		}
+	}
+	return count
+}
+
+// equalFoldASCII compare un extrait du contenu à un terme ASCII en minuscules, sans tenir compte
+// de la casse ASCII.
+func equalFoldASCII(text, lower []byte) bool {
+	for i, c := range text {
+		if 'A' <= c && c <= 'Z' {
+			c += 'a' - 'A'
+		}
+		if c != lower[i] {
+			return false
+		}
+	}
+	return true
+}
+
+// countInFile compte les occurrences du terme dans un fichier texte. Les fichiers illisibles ou
+// binaires comptent pour zéro. Un fichier inchangé depuis sa dernière lecture n'est relu que si
+// son filtre de trigrammes (voir trigramIndex) ne permet pas d'écarter le terme.
+func countInFile(path string, matcher *termMatcher) int {
+	file, err := os.Open(path)
+	if err != nil {
+		return 0
+	}
+	defer file.Close()
+	info, err := file.Stat()
+	if err != nil {
+		return 0
+	}
+	filter := cachedTrigramFilter(path, info)
+	if filter != nil && !filter.mayContain(matcher.trigrams) {
+		return 0
+	}
+
+	content, release, err := readForSearch(file, info.Size(), !isKnownTextFile(path))
+	if errors.Is(err, errBinaryFile) {
+		storeTrigramFilter(path, &trigramFilter{size: info.Size(), modTime: info.ModTime(), binary: true})
+	}
+	if err != nil {
+		return 0
+	}
+	defer release()
+	if filter == nil {
+		storeTrigramFilter(path, newTrigramFilter(content, info))
+	}
+	return matcher.count(content)
+}
+
+// maxPooledSearchBuffer est la capacité au-delà de laquelle un tampon de lecture n'est pas
+// conservé: un fichier exceptionnellement gros ne doit pas rester en mémoire dans le pool.
+const maxPooledSearchBuffer = 4 * mmapThreshold
+
+// searchBuffers réutilise les tampons de lecture entre les fichiers d'une recherche et d'une
+// recherche à l'autre: chaque worker lit ses petits fichiers sans allocation par fichier.
+var searchBuffers = sync.Pool{New: func() interface{} {
+	buf := make([]byte, 0, mmapThreshold)
+	return &buf
+}}
+
+// readPooled lit un fichier ouvert de la taille donnée dans un tampon de searchBuffers. release
+// rend le tampon au pool: le contenu ne doit plus être utilisé ensuite. Avec rejectBinary, le
+// début du fichier est lu et vérifié d'abord: un fichier binaire n'est pas lu en entier.
+func readPooled(file *os.File, size int64, rejectBinary bool) ([]byte, func(), error) {
+	bufPtr := searchBuffers.Get().(*[]byte)
+	buf := *bufPtr
+	if int64(cap(buf)) < size {
+		buf = make([]byte, size)
+	}
+	release := func() {
+		if cap(buf) <= maxPooledSearchBuffer {
+			*bufPtr = buf[:0]
+			searchBuffers.Put(bufPtr)
+		}
+	}
+
+	// Le fichier a pu raccourcir depuis le stat: seuls les octets lus sont renvoyés
+	n := 0
+	if rejectBinary {
+		head, err := io.ReadFull(file, buf[:min(size, binarySniffLength)])
+		if err != nil && err != io.ErrUnexpectedEOF {
+			release()
+			return nil, nil, err
+		}
+		if looksBinary(buf[:head]) {
+			release()
+			return nil, nil, errBinaryFile
+		}
+		if n = head; int64(n) < min(size, binarySniffLength) {
+			return buf[:n], release, nil
+		}
+	}
+	rest, err := io.ReadFull(file, buf[n:size])
+	if err != nil && err != io.ErrUnexpectedEOF {
+		release()
+		return nil, nil, err
+	}
+	return buf[:n+rest], release, nil
+}
+
+// formatSearchResults résume les résultats d'une recherche pour la base de connaissances.
+func formatSearchResults(term string, matches []searchMatch) string {
+	if len(matches) == 0 {
+		return fmt.Sprintf("Search for '%s': no match", term)
+	}
+	var result strings.Builder
+	fmt.Fprintf(&result, "Search for '%s' found matches in:", term)
+	for _, match := range matches {
+		fmt.Fprintf(&result, " %s (%d),", match.Path, match.Count)
+	}
+	return strings.TrimSuffix(result.String(), ",")
+}
@@ -0,0 +1,180 @@
+package main
+
+import (
+	"math"
+	"math/bits"
+	"os"
+	"sync"
+	"time"
+)
+
+const (
+	// minTrigramFilterBits et maxTrigramFilterBits bornent la taille d'un filtre de trigrammes.
+	// Entre les deux, elle suit la taille du fichier: deux bits par octet de contenu.
+	minTrigramFilterBits = 1 << 9
+	maxTrigramFilterBits = 1 << 15
+
+	// maxIndexedFileSize est la taille au-delà de laquelle un fichier n'est pas résumé: ses
+	// trigrammes rempliraient le filtre, qui n'écarterait plus rien.
+	maxIndexedFileSize = 1 << 20
+
+	// maxIndexedFiles borne trigramIndex; l'index est simplement vidé quand il est plein.
+	maxIndexedFiles = 1 << 16
+
+	// maxTrigramHashes est le nombre maximal de bits positionnés par trigramme.
+	maxTrigramHashes = 4
+)
+
+// trigramFilter résume les trigrammes d'un fichier, en minuscules ASCII, dans un filtre de Bloom.
+// Si l'un des trigrammes d'un terme n'y est pas, le terme n'apparaît pas dans le fichier et la
+// recherche le saute sans le relire. Un filtre n'est valable que pour la taille et la date de
+// modification du fichier résumé.
+type trigramFilter struct {
+	size    int64
+	modTime time.Time
+	binary  bool     // Fichier binaire: aucune recherche ne le lit
+	bits    []uint64 // nil si le fichier n'est pas résumé: tout terme peut y apparaître
+	hashes  int      // Nombre de bits positionnés par trigramme
+}
+
+// trigramIndex garde le filtre de chaque fichier déjà lu par la recherche de repli: une
+// exploration lance souvent plusieurs SEARCH_CODE sur le même projet, et seuls les fichiers
+// pouvant contenir le terme sont relus.
+var trigramIndex = struct {
+	sync.Mutex
+	filters map[string]*trigramFilter
+}{filters: make(map[string]*trigramFilter)}
+
+// cachedTrigramFilter renvoie le filtre d'un fichier s'il correspond encore à son état actuel.
+func cachedTrigramFilter(path string, info os.FileInfo) *trigramFilter {
+	trigramIndex.Lock()
+	filter, ok := trigramIndex.filters[path]
+	trigramIndex.Unlock()
+	if !ok || filter.size != info.Size() || !filter.modTime.Equal(info.ModTime()) {
+		return nil
+	}
+	return filter
+}
+
+// storeTrigramFilter enregistre le filtre d'un fichier. Un filtre est immuable une fois
+// enregistré: il peut être lu sans verrou par les recherches concurrentes.
+func storeTrigramFilter(path string, filter *trigramFilter) {
+	trigramIndex.Lock()
+	if len(trigramIndex.filters) >= maxIndexedFiles {
+		clear(trigramIndex.filters)
+	}
+	trigramIndex.filters[path] = filter
+	trigramIndex.Unlock()
+}
+
+// newTrigramFilter résume le contenu d'un fichier de la taille et de la date données. Un premier
+// passage avec un seul bit par trigramme mesure le remplissage du filtre, d'où est estimé le
+// nombre de trigrammes distincts; s'il reste de la place, le contenu est résumé à nouveau avec le
+// nombre de bits par trigramme qui minimise les faux positifs, au plus maxTrigramHashes.
+func newTrigramFilter(content []byte, info os.FileInfo) *trigramFilter {
+	filter := &trigramFilter{size: info.Size(), modTime: info.ModTime()}
+	if len(content) > maxIndexedFileSize {
+		return filter
+	}
+
+	nbits := minTrigramFilterBits
+	for nbits < maxTrigramFilterBits && nbits < 2*len(content) {
+		nbits <<= 1
+	}
+	filter.bits = make([]uint64, nbits/64)
+	filter.hashes = 1
+	filter.addTrigrams(content)
+
+	set := 0
+	for _, word := range filter.bits {
+		set += bits.OnesCount64(word)
+	}
+	if set == 0 || set == nbits {
+		return filter
+	}
+	// Pour n éléments dans m bits, k = m/n·ln 2 bits par élément minimisent les faux positifs,
+	// et un seul bit par élément laisse une fraction e^(-n/m) des bits à zéro
+	distinct := -float64(nbits) * math.Log(1-float64(set)/float64(nbits))
+	hashes := min(int(float64(nbits)/distinct*math.Ln2+0.5), maxTrigramHashes)
+	if hashes > 1 {
+		clear(filter.bits)
+		filter.hashes = hashes
+		filter.addTrigrams(content)
+	}
+	return filter
+}
+
+// addTrigrams ajoute au filtre chaque trigramme du contenu.
+func (f *trigramFilter) addTrigrams(content []byte) {
+	if len(content) < 3 {
+		return
+	}
+	mask := uint32(len(f.bits)*64 - 1)
+	tri := uint32(lowerASCII(content[0]))<<8 | uint32(lowerASCII(content[1]))
+	for _, c := range content[2:] {
+		tri = (tri<<8 | uint32(lowerASCII(c))) & 0xFFFFFF
+		h, step := trigramHashes(tri)
+		for i := 0; i < f.hashes; i++ {
+			pos := h & mask
+			f.bits[pos/64] |= 1 << (pos % 64)
+			h += step
+		}
+	}
+}
+
+// mayContain indique si un terme, donné par ses trigrammes (voir termTrigrams), peut apparaître
+// dans le fichier résumé.
+func (f *trigramFilter) mayContain(trigrams []uint32) bool {
+	if f.binary {
+		return false
+	}
+	if f.bits == nil {
+		return true
+	}
+	mask := uint32(len(f.bits)*64 - 1)
+	for _, tri := range trigrams {
+		h, step := trigramHashes(tri)
+		for i := 0; i < f.hashes; i++ {
+			pos := h & mask
+			if f.bits[pos/64]&(1<<(pos%64)) == 0 {
+				return false
+			}
+			h += step
+		}
+	}
+	return true
+}
+
+// termTrigrams renvoie les trigrammes distincts d'un terme ASCII, en minuscules. Un terme plus
+// court que trois octets n'en a aucun: aucun fichier n'est alors écarté.
+func termTrigrams(term string) []uint32 {
+	var trigrams []uint32
+	seen := make(map[uint32]bool)
+	for i := 0; i+3 <= len(term); i++ {
+		tri := uint32(lowerASCII(term[i]))<<16 | uint32(lowerASCII(term[i+1]))<<8 | uint32(lowerASCII(term[i+2]))
+		if !seen[tri] {
+			seen[tri] = true
+			trigrams = append(trigrams, tri)
+		}
+	}
+	return trigrams
+}
+
+// trigramHashes disperse un trigramme sur 32 bits avant qu'il soit ramené à la taille d'un
+// filtre. Le i-ème bit d'un trigramme est h + i·step (double hachage); step est impair pour que
+// les positions restent distinctes dans un filtre dont la taille est une puissance de deux.
+func trigramHashes(tri uint32) (h, step uint32) {
+	h = tri * 0x9E3779B1
+	h ^= h >> 15
+	step = tri * 0x85EBCA6B
+	step ^= step >> 13
+	return h, step | 1
+}
+
+// lowerASCII met une lettre ASCII en minuscule et laisse tout autre octet inchangé.
+func lowerASCII(c byte) byte {
+	if 'A' <= c && c <= 'Z' {
+		return c + 'a' - 'A'
+	}
+	return c
+}
@@ -0,0 +1,65 @@
+package main
+
+import (
+	"os"
+	"path/filepath"
+	"testing"
+	"time"
+)
+
+func TestTrigramFilter(t *testing.T) {
+	path := filepath.Join(t.TempDir(), "main.go")
+	if err := os.WriteFile(path, []byte("func HandleRequest() {}"), 0644); err != nil {
+		t.Fatalf("Failed to create test file: %v", err)
+	}
+	info, err := os.Stat(path)
+	if err != nil {
+		t.Fatalf("Failed to stat test file: %v", err)
+	}
+
+	filter := newTrigramFilter([]byte("func HandleRequest() {}"), info)
+	if filter.hashes != maxTrigramHashes {
+		t.Errorf("expected a sparse filter to use %d bits per trigram, got %d", maxTrigramHashes, filter.hashes)
+	}
+	for _, term := range []string{"handlerequest", "REQUEST", "c Ha", "fu"} {
+		if !filter.mayContain(termTrigrams(term)) {
+			t.Errorf("expected %q to possibly appear in the file", term)
+		}
+	}
+	if filter.mayContain(termTrigrams("zzzqqq")) {
+		t.Error("expected a term absent from the file to be ruled out")
+	}
+}
+
+func TestCountInFileUsesTrigramIndex(t *testing.T) {
+	path := filepath.Join(t.TempDir(), "main.go")
+	if err := os.WriteFile(path, []byte("func HandleRequest() {}"), 0644); err != nil {
+		t.Fatalf("Failed to create test file: %v", err)
+	}
+
+	if count := countInFile(path, newTermMatcher("missing")); count != 0 {
+		t.Fatalf("expected no match, got %d", count)
+	}
+	info, err := os.Stat(path)
+	if err != nil {
+		t.Fatalf("Failed to stat test file: %v", err)
+	}
+	if cachedTrigramFilter(path, info) == nil {
+		t.Fatal("expected the first read to index the file")
+	}
+	if count := countInFile(path, newTermMatcher("handlerequest")); count != 1 {
+		t.Errorf("expected 1 match, got %d", count)
+	}
+
+	// Une modification invalide le filtre: le nouveau contenu est relu
+	if err := os.WriteFile(path, []byte("func Missing() {}"), 0644); err != nil {
+		t.Fatalf("Failed to update test file: %v", err)
+	}
+	later := time.Now().Add(time.Minute)
+	if err := os.Chtimes(path, later, later); err != nil {
+		t.Fatalf("Failed to update test file time: %v", err)
+	}
+	if count := countInFile(path, newTermMatcher("missing")); count != 1 {
+		t.Errorf("expected the updated file to be read again, got %d matches", count)
+	}
+}
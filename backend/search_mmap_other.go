@@ -0,0 +1,13 @@
+//go:build !unix
+
+package main
+
+import "os"
+
+// readForSearch renvoie le contenu d'un fichier ouvert de la taille donnée pour la recherche.
+// Sans mmap sur cette plateforme, le fichier est lu dans un tampon réutilisable; release doit
+// être appelée après usage. Avec rejectBinary, un fichier binaire (voir looksBinary) renvoie
+// errBinaryFile.
+func readForSearch(file *os.File, size int64, rejectBinary bool) (content []byte, release func(), err error) {
+	return readPooled(file, size, rejectBinary)
+}
@@ -0,0 +1,26 @@
+//go:build unix
+
+package main
+
+import (
+	"os"
+	"syscall"
+)
+
+// readForSearch renvoie le contenu d'un fichier ouvert de la taille donnée pour la recherche.
+// Au-delà de mmapThreshold, le fichier est projeté en mémoire au lieu d'être recopié; release
+// doit être appelée après usage. Avec rejectBinary, un fichier binaire (voir looksBinary) renvoie
+// errBinaryFile; projeté, seule sa première page est alors lue.
+func readForSearch(file *os.File, size int64, rejectBinary bool) (content []byte, release func(), err error) {
+	if size >= mmapThreshold && int64(int(size)) == size {
+		if data, err := syscall.Mmap(int(file.Fd()), 0, int(size), syscall.PROT_READ, syscall.MAP_SHARED); err == nil {
+			if rejectBinary && looksBinary(data) {
+				syscall.Munmap(data)
+				return nil, nil, errBinaryFile
+			}
+			return data, func() { syscall.Munmap(data) }, nil
+		}
+	}
+
+	return readPooled(file, size, rejectBinary)
+}
@@ -0,0 +1,315 @@
+package main
+
+import (
+	"errors"
+	"fmt"
+	"os"
+	"path/filepath"
+	"reflect"
+	"regexp"
+	"slices"
+	"strings"
+	"testing"
+	"time"
+)
+
+func TestSearchCode(t *testing.T) {
+	projectPath := setupExplorerTest(t)
+
+	matches, err := searchCode(projectPath, "CONSOLE", "")
+	if err != nil {
+		t.Fatalf("searchCode() returned an error: %v", err)
+	}
+	expected := []searchMatch{{Path: filepath.Join("src", "app.js"), Count: 1}}
+	if !reflect.DeepEqual(matches, expected) {
+		t.Errorf("expected %v, got %v", expected, matches)
+	}
+
+	if _, err := searchCode(projectPath, "  ", ""); err == nil {
+		t.Error("expected an error for an empty search term")
+	}
+}
+
+func TestSearchWithWalkSkipsIgnoredFiles(t *testing.T) {
+	projectPath := setupExplorerTest(t)
+
+	matches, err := searchWithWalk(projectPath, "", "ignored")
+	if err != nil {
+		t.Fatalf("searchWithWalk() returned an error: %v", err)
+	}
+	if len(matches) != 0 {
+		t.Errorf("expected ignored files to be skipped, got %v", matches)
+	}
+}
+
+func TestSearchWithWalkSkipsSymlinks(t *testing.T) {
+	projectPath := t.TempDir()
+	outside := filepath.Join(t.TempDir(), "secret.txt")
+	if err := os.WriteFile(outside, []byte("needle"), 0644); err != nil {
+		t.Fatalf("Failed to create test file: %v", err)
+	}
+	if err := os.WriteFile(filepath.Join(projectPath, "main.go"), []byte("needle"), 0644); err != nil {
+		t.Fatalf("Failed to create test file: %v", err)
+	}
+	if err := os.Symlink(outside, filepath.Join(projectPath, "link.txt")); err != nil {
+		t.Skipf("symlinks not supported: %v", err)
+	}
+
+	matches, err := searchWithWalk(projectPath, "", "needle")
+	if err != nil {
+		t.Fatalf("searchWithWalk() returned an error: %v", err)
+	}
+	if len(matches) != 1 || matches[0].Path != "main.go" {
+		t.Errorf("expected only main.go to match, got %v", matches)
+	}
+}
+
+func TestParseRipgrepCountLine(t *testing.T) {
+	testCases := []struct {
+		line     string
+		expected searchMatch
+		ok       bool
+	}{
+		{"./src/app.js\x003", searchMatch{Path: "src/app.js", Count: 3}, true},
+		{"src/app.js\x001", searchMatch{Path: "src/app.js", Count: 1}, true},
+		{".env\x001", searchMatch{Path: ".env", Count: 1}, true},
+		{"C:\\dir:with:colons\\file.go\x0012", searchMatch{Path: "C:\\dir:with:colons\\file.go", Count: 12}, true},
+		{"file.go:3", searchMatch{}, false},
+		{"file.go\x00abc", searchMatch{}, false},
+		{"file.go\x00", searchMatch{}, false},
+	}
+	for _, tc := range testCases {
+		actual, ok := parseRipgrepCountLine([]byte(tc.line))
+		if ok != tc.ok || actual != tc.expected {
+			t.Errorf("parseRipgrepCountLine(%q): expected (%v, %v), got (%v, %v)", tc.line, tc.expected, tc.ok, actual, ok)
+		}
+	}
+}
+
+func TestCountInFile(t *testing.T) {
+	path := filepath.Join(t.TempDir(), "notes.txt")
+	if err := os.WriteFile(path, []byte("Foo foo FOO f.o"), 0644); err != nil {
+		t.Fatalf("Failed to create test file: %v", err)
+	}
+	if count := countInFile(path, newTermMatcher("foo")); count != 3 {
+		t.Errorf("expected 3 matches, got %d", count)
+	}
+	if count := countInFile(path, newTermMatcher("f.o")); count != 1 {
+		t.Errorf("expected the term to be matched literally once, got %d", count)
+	}
+}
+
+func TestCountInFileLargeFile(t *testing.T) {
+	path := filepath.Join(t.TempDir(), "large.txt")
+	content := strings.Repeat("filler line\n", mmapThreshold/12+1) + "Needle at the end"
+	if err := os.WriteFile(path, []byte(content), 0644); err != nil {
+		t.Fatalf("Failed to create test file: %v", err)
+	}
+	if count := countInFile(path, newTermMatcher("needle")); count != 1 {
+		t.Errorf("expected 1 match, got %d", count)
+	}
+}
+
+// readTestFile ouvre un fichier et le lit avec readForSearch.
+func readTestFile(t *testing.T, path string, rejectBinary bool) ([]byte, func(), error) {
+	t.Helper()
+	file, err := os.Open(path)
+	if err != nil {
+		t.Fatalf("Failed to open %s: %v", path, err)
+	}
+	t.Cleanup(func() { file.Close() })
+	info, err := file.Stat()
+	if err != nil {
+		t.Fatalf("Failed to stat %s: %v", path, err)
+	}
+	return readForSearch(file, info.Size(), rejectBinary)
+}
+
+func TestReadForSearchReusesBuffers(t *testing.T) {
+	dir := t.TempDir()
+	long := filepath.Join(dir, "long.txt")
+	short := filepath.Join(dir, "short.txt")
+	if err := os.WriteFile(long, []byte("a much longer first file"), 0644); err != nil {
+		t.Fatalf("Failed to create test file: %v", err)
+	}
+	if err := os.WriteFile(short, []byte("short"), 0644); err != nil {
+		t.Fatalf("Failed to create test file: %v", err)
+	}
+
+	for _, want := range []struct{ path, content string }{{long, "a much longer first file"}, {short, "short"}, {long, "a much longer first file"}} {
+		content, release, err := readTestFile(t, want.path, true)
+		if err != nil {
+			t.Fatalf("readForSearch(%q) failed: %v", want.path, err)
+		}
+		if string(content) != want.content {
+			t.Errorf("readForSearch(%q) = %q, want %q", want.path, content, want.content)
+		}
+		release()
+	}
+}
+
+func TestReadForSearchRejectsBinaryFiles(t *testing.T) {
+	dir := t.TempDir()
+	small := filepath.Join(dir, "data.bin")
+	large := filepath.Join(dir, "large.bin")
+	if err := os.WriteFile(small, []byte("needle\x00needle"), 0644); err != nil {
+		t.Fatalf("Failed to create test file: %v", err)
+	}
+	if err := os.WriteFile(large, append([]byte("\x00"), strings.Repeat("needle", mmapThreshold)...), 0644); err != nil {
+		t.Fatalf("Failed to create test file: %v", err)
+	}
+
+	for _, path := range []string{small, large} {
+		if _, _, err := readTestFile(t, path, true); !errors.Is(err, errBinaryFile) {
+			t.Errorf("readForSearch(%q) error = %v, want errBinaryFile", path, err)
+		}
+		if count := countInFile(path, newTermMatcher("needle")); count != 0 {
+			t.Errorf("expected binary file %q to be skipped, got %d matches", path, count)
+		}
+	}
+	if content, release, err := readTestFile(t, small, false); err != nil || len(content) != 13 {
+		t.Errorf("readForSearch(%q, false) = %q, %v; want the whole file", small, content, err)
+	} else {
+		release()
+	}
+}
+
+func TestSearchWithWalkRelativePaths(t *testing.T) {
+	projectPath := setupExplorerTest(t)
+
+	for _, root := range []string{projectPath, projectPath + string(filepath.Separator)} {
+		matches, err := searchWithWalk(root, "", "package")
+		if err != nil {
+			t.Fatalf("searchWithWalk(%q) returned an error: %v", root, err)
+		}
+		expected := []searchMatch{{Path: "main.go", Count: 1}}
+		if !reflect.DeepEqual(matches, expected) {
+			t.Errorf("searchWithWalk(%q): expected %v, got %v", root, expected, matches)
+		}
+	}
+}
+
+func TestCountFoldASCII(t *testing.T) {
+	contents := []string{"", "Foo foo FOO fOo", "foofoo", "ffoo fofoo", "xF", "aaaa", "_Init _init INIT", "Ab-aB-AB-ab"}
+	terms := []string{"foo", "aa", "_init", "ab-ab", "f", "1a"}
+	for _, term := range terms {
+		reference := regexp.MustCompile("(?i)" + regexp.QuoteMeta(term))
+		for _, content := range contents {
+			want := len(reference.FindAllIndex([]byte(content), -1))
+			if got := countFoldASCII([]byte(content), []byte(term)); got != want {
+				t.Errorf("countFoldASCII(%q, %q) = %d, want %d", content, term, got, want)
+			}
+		}
+	}
+}
+
+func TestKeepTopMatches(t *testing.T) {
+	var matches []searchMatch
+	for i := 0; i < 3*maxSearchResults; i++ {
+		matches = append(matches, searchMatch{Path: fmt.Sprintf("file%02d.go", i), Count: i % (maxSearchResults + 5)})
+	}
+
+	top := keepTopMatches(matches)
+	if len(top) != maxSearchResults {
+		t.Fatalf("expected %d matches, got %d", maxSearchResults, len(top))
+	}
+	if top[0].Count != maxSearchResults+4 || top[0].Path != "file24.go" || top[1].Path != "file49.go" {
+		t.Errorf("expected the most frequent matches first, ordered by path, got %v", top[:2])
+	}
+}
+
+func TestTermMatcher(t *testing.T) {
+	testCases := []struct {
+		term     string
+		content  string
+		literal  bool
+		expected int
+	}{
+		{"foo", "Foo foo FOO", false, 3},
+		{"_123", "x_123 y_123", true, 2},
+		{"a.b", "a.b axb", false, 1},
+		{"()", "f() g()", true, 2},
+		{"éTé", "été ÉTÉ etE", false, 2},
+		{"ÉtÉ", "rien ici", false, 0},
+	}
+	for _, tc := range testCases {
+		matcher := newTermMatcher(tc.term)
+		if (matcher.literal != nil) != tc.literal {
+			t.Errorf("newTermMatcher(%q): expected literal=%v", tc.term, tc.literal)
+		}
+		if count := matcher.count([]byte(tc.content)); count != tc.expected {
+			t.Errorf("count(%q) in %q: expected %d, got %d", tc.term, tc.content, tc.expected, count)
+		}
+		if newTermMatcher(tc.term) != matcher {
+			t.Errorf("newTermMatcher(%q): expected the cached matcher to be reused", tc.term)
+		}
+	}
+}
+
+func TestSearchCodeInDirectory(t *testing.T) {
+	projectPath := setupExplorerTest(t)
+
+	matches, err := searchCode(projectPath, "main", "src")
+	if err != nil {
+		t.Fatalf("searchCode() returned an error: %v", err)
+	}
+	if len(matches) != 0 {
+		t.Errorf("expected no match under src/, got %v", matches)
+	}
+
+	for _, dir := range []string{"", "..", "missing", "/etc"} {
+		if got := resolveSearchDir(projectPath, dir); got != "" {
+			t.Errorf("resolveSearchDir(%q): expected the whole project, got %q", dir, got)
+		}
+	}
+	if got := resolveSearchDir(projectPath, "src/"); got != "src" {
+		t.Errorf("resolveSearchDir(\"src/\"): expected \"src\", got %q", got)
+	}
+}
+
+func TestCachedSearchCandidates(t *testing.T) {
+	projectPath := setupExplorerTest(t)
+
+	first, err := cachedSearchCandidates(projectPath)
+	if err != nil {
+		t.Fatalf("cachedSearchCandidates() returned an error: %v", err)
+	}
+	second, err := cachedSearchCandidates(projectPath)
+	if err != nil {
+		t.Fatalf("cachedSearchCandidates() returned an error: %v", err)
+	}
+	if len(first) == 0 || &first[0] != &second[0] {
+		t.Error("expected the second call to reuse the cached list")
+	}
+
+	// Un nouveau fichier à la racine change la date de modification du dossier
+	newFile := filepath.Join(projectPath, "new.go")
+	if err := os.WriteFile(newFile, []byte("package main"), 0644); err != nil {
+		t.Fatalf("Failed to create test file: %v", err)
+	}
+	future := time.Now().Add(time.Hour)
+	if err := os.Chtimes(projectPath, future, future); err != nil {
+		t.Fatalf("Failed to touch project dir: %v", err)
+	}
+	third, err := cachedSearchCandidates(projectPath)
+	if err != nil {
+		t.Fatalf("cachedSearchCandidates() returned an error: %v", err)
+	}
+	if !slices.Contains(third, newFile) {
+		t.Errorf("expected the list to be rebuilt with %s, got %v", newFile, third)
+	}
+
+	if _, err := cachedSearchCandidates(filepath.Join(projectPath, "src")); err != nil {
+		t.Fatalf("cachedSearchCandidates() returned an error: %v", err)
+	}
+	other := t.TempDir()
+	if _, err := cachedSearchCandidates(other); err != nil {
+		t.Fatalf("cachedSearchCandidates() returned an error: %v", err)
+	}
+	forgetSearchCandidates(projectPath)
+	for root, forgotten := range map[string]bool{projectPath: true, filepath.Join(projectPath, "src"): true, other: false} {
+		if _, ok := candidateCache.lists[root]; ok == forgotten {
+			t.Errorf("%s: expected forgotten=%v after forgetSearchCandidates()", root, forgotten)
+		}
+	}
+}
@@ -174,6 +174,13 @@ function App() {
   };
 
   const handleStreamEvent = (eventData) => {
+    // Answer chunks are shown in the result area as they arrive, not in the progress log
+    if (eventData.type === 'answer') {
+      setAnswer(prev => prev + eventData.data);
+      setShowAnalysisModal(false);
+      return;
+    }
+
     console.log('Stream event:', eventData);
     
     setStreamingProgress(prev => [...prev, eventData]);